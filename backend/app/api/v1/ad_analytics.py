@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.video import Video
 from app.models.view import View
 from app.models.ad_click import AdClick
+from app.services.unique_counts import AD_CLICKERS, AD_USERS, unique_counter
 
 router = APIRouter()
 
@@ -95,17 +96,21 @@ async def get_ad_analytics(
     )
     total_views = total_views_result.scalar() or 0
     
-    # Unique clickers
-    unique_clickers_result = await db.execute(
-        select(func.count(distinct(AdClick.clicker_session_id))).where(*click_filters)
-    )
-    unique_clickers = unique_clickers_result.scalar() or 0
+    # Unique clickers (HyperLogLog estimate; COUNT(DISTINCT) if the sketches can't answer)
+    unique_clickers = await unique_counter.count(AD_CLICKERS, start_date, end_date, video_id=video_id)
+    if unique_clickers is None:
+        unique_clickers_result = await db.execute(
+            select(func.count(distinct(AdClick.clicker_session_id))).where(*click_filters)
+        )
+        unique_clickers = unique_clickers_result.scalar() or 0
     
     # Unique authenticated clickers
-    unique_auth_clickers_result = await db.execute(
-        select(func.count(distinct(AdClick.user_id))).where(*click_filters, AdClick.user_id.isnot(None))
-    )
-    unique_auth_clickers = unique_auth_clickers_result.scalar() or 0
+    unique_auth_clickers = await unique_counter.count(AD_USERS, start_date, end_date, video_id=video_id)
+    if unique_auth_clickers is None:
+        unique_auth_clickers_result = await db.execute(
+            select(func.count(distinct(AdClick.user_id))).where(*click_filters, AdClick.user_id.isnot(None))
+        )
+        unique_auth_clickers = unique_auth_clickers_result.scalar() or 0
     
     # Calculate metrics
     click_through_rate = (total_clicks / total_views * 100) if total_views > 0 else 0
@@ -161,22 +166,35 @@ async def get_ad_analytics(
         for row in views_over_time_result.fetchall()
     ]
     
-    # Top performing ad videos (by clicks)
+    # Top performing ad videos (by clicks in the period)
+    # Clicks and views are counted separately over the period, so both scans are
+    # partition-pruned and clicks are not multiplied by the video's views
+    clicks_per_video = (
+        select(AdClick.video_id, func.count(AdClick.id).label('clicks'))
+        .where(*click_filters)
+        .group_by(AdClick.video_id)
+        .subquery()
+    )
+    views_per_video = (
+        select(View.video_id, func.count(View.id).label('views'))
+        .where(*view_filters)
+        .group_by(View.video_id)
+        .subquery()
+    )
     top_videos_query = (
         select(
             Video.id,
             Video.title,
             User.id.label('user_id'),
             User.username,
-            func.count(AdClick.id).label('clicks'),
-            func.count(distinct(View.id)).label('views')
+            func.coalesce(clicks_per_video.c.clicks, 0).label('clicks'),
+            func.coalesce(views_per_video.c.views, 0).label('views')
         )
         .join(User, Video.user_id == User.id)
-        .outerjoin(AdClick, AdClick.video_id == Video.id)
-        .outerjoin(View, View.video_id == Video.id)
+        .outerjoin(clicks_per_video, clicks_per_video.c.video_id == Video.id)
+        .outerjoin(views_per_video, views_per_video.c.video_id == Video.id)
         .where(Video.ad_link.isnot(None))
-        .group_by(Video.id, Video.title, User.id, User.username)
-        .order_by(func.count(AdClick.id).desc())
+        .order_by(func.coalesce(clicks_per_video.c.clicks, 0).desc())
         .limit(10)
     )
     
@@ -4,6 +4,7 @@ Admin Endpoints
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, cast, String, and_, or_
+from sqlalchemy.orm import aliased
 from typing import Optional
 from pydantic import BaseModel
 
@@ -16,7 +17,9 @@ from app.models.vote import Vote, VoteDirection
 from app.models.view import View
 from app.models.share import ShareLink
 from app.models.share_click import ShareClick
+from app.models.video_fingerprint import VideoFingerprint
 from app.schemas.video import VideoResponse, UserBasic, VideoStats
+from app.services.user_cache import user_cache
 
 router = APIRouter()
 
@@ -84,7 +87,10 @@ async def get_all_videos(
             "description": video.description,
             "status": video.status.value,
             "thumbnail": video.thumbnail,
+            "thumbnail_variants": video.thumbnail_variants,
+            "thumbnail_placeholder": video.thumbnail_placeholder,
             "url_mp4": video.url_mp4,
+            "url_hls": video.url_hls,
             "duration_seconds": video.duration_seconds,
             "error_reason": video.error_reason,
             "user": {
@@ -159,7 +165,10 @@ async def get_pending_videos(
             "description": video.description,
             "status": video.status.value,
             "thumbnail": video.thumbnail,
+            "thumbnail_variants": video.thumbnail_variants,
+            "thumbnail_placeholder": video.thumbnail_placeholder,
             "url_mp4": video.url_mp4,
+            "url_hls": video.url_hls,
             "duration_seconds": video.duration_seconds,
             "user": {
                 "id": str(user.id),
@@ -182,6 +191,66 @@ async def get_pending_videos(
     }
 
 
+@router.get("/videos/duplicates")
+async def get_duplicate_videos(
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    limit: int = 20,
+):
+    """Get uploads the worker flagged as near-duplicates of an earlier video"""
+    Original = aliased(Video)
+    query = (
+        select(VideoFingerprint, Video, Original)
+        .join(Video, VideoFingerprint.video_id == Video.id)
+        .join(Original, VideoFingerprint.duplicate_of == Original.id)
+        .where(VideoFingerprint.duplicate_of.isnot(None))
+        .order_by(VideoFingerprint.created_at.desc())
+    )
+    
+    if cursor:
+        try:
+            from datetime import datetime
+            cursor_time = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+            query = query.where(VideoFingerprint.created_at < cursor_time)
+        except Exception:
+            pass
+    
+    query = query.limit(min(limit, 100))
+    
+    result = await db.execute(query)
+    rows = result.all()
+    
+    def video_summary(video: Video) -> dict:
+        return {
+            "id": str(video.id),
+            "title": video.title,
+            "status": video.status.value,
+            "thumbnail": video.thumbnail,
+            "user_id": str(video.user_id),
+            "created_at": video.created_at,
+        }
+    
+    duplicates = [
+        {
+            "video": video_summary(video),
+            "duplicate_of": video_summary(original),
+            "distance": fingerprint.duplicate_distance,
+            "detected_at": fingerprint.created_at,
+        }
+        for fingerprint, video, original in rows
+    ]
+    
+    next_cursor = rows[-1][0].created_at.isoformat() if rows else None
+    has_more = len(rows) == limit
+    
+    return {
+        "duplicates": duplicates,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
+
+
 @router.post("/videos/{video_id}/approve")
 async def approve_video(
     video_id: str,
@@ -1015,6 +1084,8 @@ async def update_user(
     
     await db.commit()
     await db.refresh(user)
+    # Bans and role changes must not be served from the auth cache
+    await user_cache.invalidate(user.id)
     
     return {
         "message": "User updated",
@@ -3,25 +3,25 @@ Authentication Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, text
 from datetime import timedelta
 from typing import Optional
 import uuid
 import logging
 
 from app.core.database import get_db
-from app.api.v1.dependencies import get_current_user_required
+from app.api.v1.dependencies import get_current_user, get_current_user_required
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    PasswordHashingBusy,
+    password_hasher,
     create_access_token,
     create_refresh_token,
     decode_token,
 )
 from app.core.config import settings
 from app.models.user import User
-from app.models.vote import Vote, VoteDirection
-from app.models.user_liked_video import UserLikedVideo
+from app.models.vote import Vote
+from app.services.user_cache import CachedUser, user_cache
 from app.schemas.auth import (
     UserCreate,
     LoginRequest,
@@ -35,10 +35,23 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def hashing_busy_error() -> HTTPException:
+    """503 for a full password hashing queue (login bursts); clients retry shortly"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 async def merge_anonymous_votes(user_id: uuid.UUID, session_id: str, db: AsyncSession) -> int:
     """
     Merge anonymous votes (identified by session_id) into user's account.
     
+    Set-based: one UPDATE transfers the votes (and inserts the likes into
+    user_liked_videos), one DELETE drops those that conflict with the user's own
+    votes, so the cost doesn't grow with round trips per swipe.
+    
     Args:
         user_id: The authenticated user's ID
         session_id: The session ID from anonymous votes
@@ -53,59 +66,46 @@ async def merge_anonymous_votes(user_id: uuid.UUID, session_id: str, db: AsyncSe
         logger.warning(f"Invalid session_id format: {session_id}")
         return 0
     
-    # Find all anonymous votes with this session_id
-    result = await db.execute(
-        select(Vote).where(Vote.session_id == session_uuid)
-    )
-    anonymous_votes = result.scalars().all()
-    
-    if not anonymous_votes:
-        return 0
-    
-    merged_count = 0
-    
-    for anonymous_vote in anonymous_votes:
-        # Check if user already voted on this video
-        existing_vote_result = await db.execute(
-            select(Vote).where(
-                Vote.user_id == user_id,
-                Vote.video_id == anonymous_vote.video_id,
+    params = {"user_id": user_id, "session_id": session_uuid}
+    try:
+        # Transfer votes on videos the user hasn't voted on yet, and save the
+        # transferred likes, in one statement (the user's own vote always wins)
+        result = await db.execute(text("""
+            WITH moved AS (
+                UPDATE votes anonymous
+                SET user_id = :user_id, session_id = NULL
+                WHERE anonymous.session_id = :session_id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM votes existing
+                      WHERE existing.user_id = :user_id
+                        AND existing.video_id = anonymous.video_id
+                  )
+                RETURNING anonymous.video_id, anonymous.direction
+            ),
+            liked AS (
+                INSERT INTO user_liked_videos (id, user_id, video_id)
+                SELECT uuid_generate_v4(), CAST(:user_id AS uuid), video_id
+                FROM moved
+                WHERE direction = 'like'
+                ON CONFLICT (user_id, video_id) DO NOTHING
+                RETURNING 1
             )
+            SELECT (SELECT count(*) FROM moved), (SELECT count(*) FROM liked)
+        """), params)
+        merged_count, liked_count = result.one()
+        
+        # Whatever is left for the session conflicted with an authenticated vote
+        result = await db.execute(
+            delete(Vote).where(Vote.session_id == session_uuid)
         )
-        existing_vote = existing_vote_result.scalar_one_or_none()
+        discarded_count = result.rowcount
         
-        if existing_vote:
-            # User already voted - keep the authenticated vote, delete anonymous one
-            # If anonymous vote was a like and user's vote is different, we could update,
-            # but for simplicity, we keep the authenticated vote
-            delete_stmt = delete(Vote).where(Vote.id == anonymous_vote.id)
-            await db.execute(delete_stmt)
-        else:
-            # No existing vote - transfer anonymous vote to user
-            anonymous_vote.user_id = user_id
-            anonymous_vote.session_id = None
-            
-            # If it was a like, also add to UserLikedVideo
-            if anonymous_vote.direction == VoteDirection.LIKE:
-                # Check if already in liked videos
-                existing_liked_result = await db.execute(
-                    select(UserLikedVideo).where(
-                        UserLikedVideo.user_id == user_id,
-                        UserLikedVideo.video_id == anonymous_vote.video_id,
-                    )
-                )
-                if not existing_liked_result.scalar_one_or_none():
-                    liked_video = UserLikedVideo(
-                        user_id=user_id,
-                        video_id=anonymous_vote.video_id,
-                    )
-                    db.add(liked_video)
-            
-            merged_count += 1
-    
-    try:
         await db.commit()
-        logger.info(f"Merged {merged_count} anonymous votes for user {user_id}")
+        if merged_count or discarded_count:
+            logger.info(
+                f"Merged {merged_count} anonymous votes ({liked_count} new likes, "
+                f"{discarded_count} duplicates discarded) for user {user_id}"
+            )
         return merged_count
     except Exception as e:
         await db.rollback()
@@ -143,7 +143,7 @@ async def register(
         user = User(
             username=user_data.username,
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await password_hasher.hash(user_data.password),
         )
         db.add(user)
         await db.commit()
@@ -170,6 +170,8 @@ async def register(
         )
     except HTTPException:
         raise
+    except PasswordHashingBusy:
+        raise hashing_busy_error()
     except Exception as e:
         logger.error(f"Registration error: {e}", exc_info=True)
         raise HTTPException(
@@ -188,7 +190,12 @@ async def login(
     result = await db.execute(select(User).where(User.email == login_data.email))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    try:
+        password_valid = user is not None and await password_hasher.verify(login_data.password, user.password_hash)
+    except PasswordHashingBusy:
+        raise hashing_busy_error()
+    
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
@@ -252,7 +259,12 @@ async def refresh_token(
 
 
 @router.post("/logout")
-async def logout():
+async def logout(
+    current_user: Optional[CachedUser] = Depends(get_current_user),
+):
     """Logout (client should discard tokens)"""
+    if current_user is not None:
+        # Next login starts from a fresh users row (role or ban changes made meanwhile)
+        await user_cache.invalidate(current_user.id)
     return {"message": "Logged out successfully"}
 
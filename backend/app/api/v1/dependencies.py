@@ -6,10 +6,14 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import Optional
+import logging
 
 from app.core.database import get_db
 from app.core.security import decode_token
 from app.models.user import User
+from app.services.user_cache import CachedUser, user_cache
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer(auto_error=False)
 
@@ -17,28 +21,24 @@ security = HTTPBearer(auto_error=False)
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: AsyncSession = Depends(get_db),
-) -> Optional[User]:
-    """Get current authenticated user (optional)"""
-    import logging
-    logger = logging.getLogger(__name__)
+) -> Optional[CachedUser]:
+    """
+    Get current authenticated user (optional)
     
+    Returns the cached principal (id, username, is_active, is_admin); the users
+    table is only queried on a cache miss.
+    """
     if not credentials:
-        logger.warning("No credentials provided in request - HTTPBearer returned None")
         return None
     
-    token = credentials.credentials
-    logger.info(f"Received token: {token[:30]}... (length: {len(token)})")
-    
-    payload = decode_token(token)
+    payload = decode_token(credentials.credentials)
     
     if payload is None:
-        logger.warning(f"Token decode failed for token: {token[:30]}...")
+        logger.debug("Token decode failed")
         return None
     
-    logger.info(f"Token decoded successfully. Payload keys: {list(payload.keys())}, type: {payload.get('type')}")
-    
     if payload.get("type") != "access":
-        logger.warning(f"Token type mismatch. Expected 'access', got: {payload.get('type')}")
+        logger.debug(f"Token type mismatch. Expected 'access', got: {payload.get('type')}")
         return None
     
     user_id = payload.get("sub")
@@ -46,25 +46,27 @@ async def get_current_user(
         logger.warning("No user_id in token payload")
         return None
     
-    logger.info(f"Looking up user with ID: {user_id}")
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    
+    user = await user_cache.get(user_id)
     if user is None:
-        logger.warning(f"User not found for user_id: {user_id}")
-        return None
+        result = await db.execute(select(User).where(User.id == user_id))
+        db_user = result.scalar_one_or_none()
+        if db_user is None:
+            logger.warning(f"User not found for user_id: {user_id}")
+            return None
+        # Inactive users are cached too, so banned accounts don't hit the database either
+        user = CachedUser.from_user(db_user)
+        await user_cache.set(user)
     
     if not user.is_active:
         logger.warning(f"User {user_id} is inactive")
         return None
     
-    logger.info(f"User authenticated successfully: {user.username} (ID: {user.id})")
     return user
 
 
 def get_current_user_required(
-    current_user: Optional[User] = Depends(get_current_user),
-) -> User:
+    current_user: Optional[CachedUser] = Depends(get_current_user),
+) -> CachedUser:
     """Get current user (required, raises 401 if not authenticated)"""
     if current_user is None:
         raise HTTPException(
@@ -75,8 +77,8 @@ def get_current_user_required(
 
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_user_required),
-) -> User:
+    current_user: CachedUser = Depends(get_current_user_required),
+) -> CachedUser:
     """Get current user, ensuring they are an admin"""
     if not current_user.is_admin:
         raise HTTPException(
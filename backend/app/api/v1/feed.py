@@ -169,7 +169,10 @@ async def get_feed(
                         description=video.description,
                         status=video.status.value,
                         thumbnail=video.thumbnail,
+                        thumbnail_variants=video.thumbnail_variants,
+                        thumbnail_placeholder=video.thumbnail_placeholder,
                         url_mp4=video.url_mp4,
+                        url_hls=video.url_hls,
                         duration_seconds=video.duration_seconds,
                         error_reason=video.error_reason,
                         ad_link=video.ad_link,
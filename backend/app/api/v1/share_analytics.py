@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.video import Video
 from app.models.share import ShareLink
 from app.models.share_click import ShareClick
+from app.services.unique_counts import SHARE_CLICKERS, SHARE_LINKS_CLICKED, unique_counter
 
 router = APIRouter()
 
@@ -62,17 +63,21 @@ async def get_share_analytics(
     )
     total_clicks = total_clicks_result.scalar() or 0
     
-    # Unique clickers
-    unique_clickers_result = await db.execute(
-        select(func.count(distinct(ShareClick.clicker_session_id))).where(*click_filters)
-    )
-    unique_clickers = unique_clickers_result.scalar() or 0
+    # Unique clickers (HyperLogLog estimate; COUNT(DISTINCT) if the sketches can't answer)
+    unique_clickers = await unique_counter.count(SHARE_CLICKERS, start_date, end_date, video_id=video_id)
+    if unique_clickers is None:
+        unique_clickers_result = await db.execute(
+            select(func.count(distinct(ShareClick.clicker_session_id))).where(*click_filters)
+        )
+        unique_clickers = unique_clickers_result.scalar() or 0
     
     # Shares with at least one click
-    shares_with_clicks_result = await db.execute(
-        select(func.count(distinct(ShareClick.share_link_id))).where(*click_filters)
-    )
-    shares_with_clicks = shares_with_clicks_result.scalar() or 0
+    shares_with_clicks = await unique_counter.count(SHARE_LINKS_CLICKED, start_date, end_date, video_id=video_id)
+    if shares_with_clicks is None:
+        shares_with_clicks_result = await db.execute(
+            select(func.count(distinct(ShareClick.share_link_id))).where(*click_filters)
+        )
+        shares_with_clicks = shares_with_clicks_result.scalar() or 0
     
     # Calculate metrics
     click_through_rate = (total_clicks / total_shares * 100) if total_shares > 0 else 0
@@ -259,17 +264,21 @@ async def get_share_stats(
     total_clicks_result = await db.execute(select(func.count(ShareClick.id)))
     total_clicks = total_clicks_result.scalar() or 0
     
-    # Unique clickers
-    unique_clickers_result = await db.execute(
-        select(func.count(distinct(ShareClick.clicker_session_id)))
-    )
-    unique_clickers = unique_clickers_result.scalar() or 0
+    # Unique clickers (all-time HyperLogLog, COUNT(DISTINCT) fallback)
+    unique_clickers = await unique_counter.count(SHARE_CLICKERS)
+    if unique_clickers is None:
+        unique_clickers_result = await db.execute(
+            select(func.count(distinct(ShareClick.clicker_session_id)))
+        )
+        unique_clickers = unique_clickers_result.scalar() or 0
     
     # Shares with clicks
-    shares_with_clicks_result = await db.execute(
-        select(func.count(distinct(ShareClick.share_link_id)))
-    )
-    shares_with_clicks = shares_with_clicks_result.scalar() or 0
+    shares_with_clicks = await unique_counter.count(SHARE_LINKS_CLICKED)
+    if shares_with_clicks is None:
+        shares_with_clicks_result = await db.execute(
+            select(func.count(distinct(ShareClick.share_link_id)))
+        )
+        shares_with_clicks = shares_with_clicks_result.scalar() or 0
     
     # Calculate metrics
     click_through_rate = (total_clicks / total_shares * 100) if total_shares > 0 else 0
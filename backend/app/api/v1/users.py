@@ -61,18 +61,24 @@ async def get_current_user_profile(
         )
         total_views = views_result.scalar() or 0
         
+        # current_user is the cached auth principal; email and created_at come from the row
+        user_result = await db.execute(select(User).where(User.id == current_user.id))
+        user = user_result.scalar_one_or_none()
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+        
         # Format created_at
         created_at_str = None
-        if current_user.created_at:
-            if isinstance(current_user.created_at, str):
-                created_at_str = current_user.created_at
+        if user.created_at:
+            if isinstance(user.created_at, str):
+                created_at_str = user.created_at
             else:
-                created_at_str = current_user.created_at.isoformat()
+                created_at_str = user.created_at.isoformat()
         
         # Build response - ensure all required fields are present
         # User model has NOT NULL constraints, but we'll be defensive
-        username = current_user.username if current_user.username else ""
-        email = current_user.email if current_user.email else ""
+        username = user.username if user.username else ""
+        email = user.email if user.email else ""
         
         # Create stats object
         stats = UserStats(
@@ -87,7 +93,7 @@ async def get_current_user_profile(
                 id=str(current_user.id),
                 username=username,
                 email=email,
-                is_admin=current_user.is_admin,
+                is_admin=user.is_admin,
                 created_at=created_at_str,
                 stats=stats,
             )
@@ -245,7 +251,10 @@ async def get_liked_videos(
                     description=video.description,
                     status=video.status.value,
                     thumbnail=video.thumbnail,
+                    thumbnail_variants=video.thumbnail_variants,
+                    thumbnail_placeholder=video.thumbnail_placeholder,
                     url_mp4=video.url_mp4,
+                    url_hls=video.url_hls,
                     duration_seconds=video.duration_seconds,
                     error_reason=video.error_reason,  # Include error reason if video failed
                     ad_link=video.ad_link,
@@ -318,7 +327,10 @@ async def get_liked_videos(
                         description=video.description,
                         status=video.status.value,
                         thumbnail=video.thumbnail,
+                        thumbnail_variants=video.thumbnail_variants,
+                        thumbnail_placeholder=video.thumbnail_placeholder,
                         url_mp4=video.url_mp4,
+                        url_hls=video.url_hls,
                         duration_seconds=video.duration_seconds,
                         error_reason=video.error_reason,
                         ad_link=video.ad_link,
@@ -403,7 +415,10 @@ async def get_liked_videos(
                     description=video.description,
                     status=video.status.value,
                     thumbnail=video.thumbnail,
+                    thumbnail_variants=video.thumbnail_variants,
+                    thumbnail_placeholder=video.thumbnail_placeholder,
                     url_mp4=video.url_mp4,
+                    url_hls=video.url_hls,
                     duration_seconds=video.duration_seconds,
                     error_reason=video.error_reason,
                     user=UserBasic(id=str(user.id), username=user.username),
@@ -474,7 +489,10 @@ async def get_my_videos(
                 description=video.description,
                 status=video.status.value,
                 thumbnail=video.thumbnail,
+                thumbnail_variants=video.thumbnail_variants,
+                thumbnail_placeholder=video.thumbnail_placeholder,
                 url_mp4=video.url_mp4,
+                url_hls=video.url_hls,
                 duration_seconds=video.duration_seconds,
                 error_reason=video.error_reason,  # Include error reason if video failed
                 ad_link=video.ad_link,
@@ -6,12 +6,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, cast, String, delete
 from sqlalchemy.exc import IntegrityError
 from typing import Optional
+from datetime import datetime, timezone
+import io
+import json
 import uuid
 import logging
 from pathlib import Path
 
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.redis_client import get_redis
 from app.api.v1.dependencies import get_current_user_required, get_current_user
 from app.models.user import User
 from app.models.video import Video, VideoStatus
@@ -23,6 +27,7 @@ from app.models.ad_click import AdClick
 from app.models.user_liked_video import UserLikedVideo
 from app.schemas.video import (
     VideoResponse,
+    VideoProgressResponse,
     VideoStats,
     UserBasic,
     VoteRequest,
@@ -38,6 +43,8 @@ from app.schemas.video import (
 )
 from app.celery_app import celery_app
 from app.services.video_deletion import video_deletion_service
+from app.services.mp4_boxes import Mp4ParseError, parse_mp4
+from app.services.unique_counts import AD_CLICKERS, AD_USERS, SHARE_CLICKERS, SHARE_LINKS_CLICKED, unique_counter
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -82,7 +89,10 @@ async def get_video(
         description=video.description,
         status=video.status.value,
         thumbnail=video.thumbnail,
+        thumbnail_variants=video.thumbnail_variants,
+        thumbnail_placeholder=video.thumbnail_placeholder,
         url_mp4=video.url_mp4,
+        url_hls=video.url_hls,
         duration_seconds=video.duration_seconds,
         error_reason=video.error_reason,
         ad_link=video.ad_link,
@@ -96,6 +106,53 @@ async def get_video(
     )
 
 
+@router.get("/{video_id}/progress", response_model=VideoProgressResponse)
+async def get_video_progress(
+    video_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get live processing progress for a video (public endpoint)
+    
+    Progress is published by the video worker to Redis while FFmpeg runs
+    (throttled to one update every ~2s), so this is cheap to poll.
+    """
+    result = await db.execute(select(Video.status).where(Video.id == video_id))
+    video_status = result.scalar_one_or_none()
+    
+    if video_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found",
+        )
+    
+    progress = {}
+    try:
+        raw = await get_redis().get(f"video_progress:{video_id}")
+        if raw:
+            progress = json.loads(raw)
+    except Exception as e:
+        logger.warning(f"Could not read progress for video {video_id}: {e}")
+    
+    updated_at = None
+    if progress.get("updated_at"):
+        updated_at = datetime.fromtimestamp(progress["updated_at"], tz=timezone.utc)
+    
+    percent = progress.get("percent")
+    if video_status == VideoStatus.READY:
+        percent = 100.0
+    
+    return VideoProgressResponse(
+        video_id=video_id,
+        status=video_status.value,
+        stage=progress.get("stage") or video_status.value,
+        percent=percent,
+        out_time_seconds=progress.get("out_time_seconds"),
+        duration_seconds=progress.get("duration_seconds"),
+        speed=progress.get("speed"),
+        updated_at=updated_at,
+    )
+
+
 # Upload directories - clear structure
 UPLOAD_DIR = Path("/app/uploads")
 ORIGINALS_DIR = UPLOAD_DIR / "originals"  # Original uploaded files
@@ -158,6 +215,29 @@ async def upload_video(
             detail=f"File too large. Max size: {settings.MAX_UPLOAD_SIZE / (1024*1024)}MB",
         )
     
+    # MP4/MOV structure check (box walk in memory, no ffprobe): reject truncated or
+    # corrupt files and too-short ad videos before anything is stored or queued
+    if file_ext in (".mp4", ".mov"):
+        try:
+            mp4_info = parse_mp4(io.BytesIO(content))
+        except Mp4ParseError as e:
+            logger.info(f"Rejected upload {file.filename!r}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid video file. The file is not a valid MP4/MOV.",
+            )
+        if mp4_info["moov_size"] is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Video file is incomplete or corrupted. Please re-export and upload again.",
+            )
+        # Same rule the worker enforces (it re-checks files without a readable duration)
+        if ad_link and mp4_info["duration"] is not None and mp4_info["duration"] < 5.0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ad videos must be at least 5 seconds long. This video is {mp4_info['duration']:.1f} seconds.",
+            )
+    
     # Create video record
     video = Video(
         user_id=current_user.id,
@@ -265,6 +345,7 @@ async def upload_video(
             result = celery_app.send_task(
                 task_name,
                 args=[str(video.id), str(file_path)],
+                kwargs={"enqueued_at": time.time()},  # For worker queue wait metrics
                 queue="celery",  # Explicitly specify queue - video_worker listens to this
                 # Don't require result - task runs asynchronously
                 ignore_result=True,
@@ -285,6 +366,7 @@ async def upload_video(
                     result = celery_app.send_task(
                         task_name,
                         args=[str(video.id), str(file_path)],
+                        kwargs={"enqueued_at": time.time()},
                         queue="celery",
                         ignore_result=True,
                     )
@@ -786,6 +868,9 @@ async def record_share_click(
     db.add(share_click)
     await db.commit()
     
+    await unique_counter.add(SHARE_CLICKERS, clicker_uuid, video_id=video.id)
+    await unique_counter.add(SHARE_LINKS_CLICKED, share_link.id, video_id=video.id)
+    
     return ShareClickResponse(
         message="Share click recorded",
         video_id=str(video.id)
@@ -843,6 +928,9 @@ async def record_ad_click(
     db.add(ad_click)
     await db.commit()
     
+    await unique_counter.add(AD_CLICKERS, clicker_session_id, video_id=video.id)
+    await unique_counter.add(AD_USERS, current_user.id if current_user else None, video_id=video.id)
+    
     return AdClickResponse(
         message="Ad click recorded",
         video_id=str(video.id)
@@ -3,15 +3,22 @@ Visitor Analytics API Endpoints
 """
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from typing import List
-from datetime import datetime, timedelta
+from sqlalchemy import select
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
+import asyncio
+import uuid
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.uuid7 import uuid7_time
 from app.api.v1.dependencies import get_current_admin_user
-from app.models.visitor_log import VisitorLog
+from app.models.visitor_log import VisitorLog, VisitorUrl
 from app.models.user import User
+from app.services.hll import HyperLogLog
+from app.services.unique_counts import VISITORS, unique_counter
+from app.services.visitor_rollups import VisitorGroup, load_visitor_groups
 
 router = APIRouter()
 
@@ -36,6 +43,14 @@ class VisitorStatsResponse(BaseModel):
     visits_by_date: List[dict]
 
 
+def _union_count(groups: List[VisitorGroup]) -> int:
+    """Unique visitors across groups (merges their sketches)"""
+    sketch = HyperLogLog()
+    for group in groups:
+        sketch.merge(group.visitors)
+    return sketch.count()
+
+
 @router.get("/locations", response_model=List[VisitorLocationResponse])
 async def get_visitor_locations(
     days: int = Query(7, ge=1, le=365),
@@ -46,48 +61,31 @@ async def get_visitor_locations(
     """
     Get visitor locations for map visualization
     
-    Returns aggregated location data with visit counts
+    Returns aggregated location data with visit counts. Reads the daily and hourly
+    rollups (coordinates bucketed to VISITOR_ROLLUP_COORD_PRECISION) plus raw visitor
+    logs for the hours not rolled up yet.
     """
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    
-    query = select(
-        VisitorLog.latitude,
-        VisitorLog.longitude,
-        VisitorLog.country,
-        VisitorLog.country_name,
-        VisitorLog.city,
-        func.count(VisitorLog.id).label('visit_count'),
-        func.count(func.distinct(VisitorLog.session_id)).label('unique_visitors'),
-    ).where(
-        and_(
-            VisitorLog.visited_at >= cutoff_date,
-            VisitorLog.latitude.isnot(None),
-            VisitorLog.longitude.isnot(None),
-        )
-    ).group_by(
-        VisitorLog.latitude,
-        VisitorLog.longitude,
-        VisitorLog.country,
-        VisitorLog.country_name,
-        VisitorLog.city,
-    ).having(
-        func.count(VisitorLog.id) >= min_visits
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+    groups = await load_visitor_groups(
+        db,
+        cutoff_date,
+        settings.VISITOR_ROLLUP_COORD_PRECISION,
+        ("latitude", "longitude", "country", "country_name", "city"),
+        min_visits=min_visits,
+        located_only=True,
     )
-    
-    result = await db.execute(query)
-    rows = result.all()
-    
     return [
         VisitorLocationResponse(
-            latitude=float(row.latitude),
-            longitude=float(row.longitude),
-            country=row.country,
-            country_name=row.country_name,
-            city=row.city,
-            visit_count=row.visit_count,
-            unique_visitors=row.unique_visitors,
+            latitude=float(latitude),
+            longitude=float(longitude),
+            country=country,
+            country_name=country_name,
+            city=city,
+            visit_count=group.visits,
+            unique_visitors=group.unique_visitors,
         )
-        for row in rows
+        for group in groups
+        for latitude, longitude, country, country_name, city in [group.key]
     ]
 
 
@@ -99,174 +97,111 @@ async def get_visitor_stats(
 ):
     """
     Get aggregated visitor statistics
-    """
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Total visits
-    total_visits_result = await db.execute(
-        select(func.count(VisitorLog.id)).where(VisitorLog.visited_at >= cutoff_date)
-    )
-    total_visits = total_visits_result.scalar() or 0
-    
-    # Unique visitors
-    unique_visitors_result = await db.execute(
-        select(func.count(func.distinct(VisitorLog.session_id))).where(
-            VisitorLog.visited_at >= cutoff_date
-        )
-    )
-    unique_visitors = unique_visitors_result.scalar() or 0
-    
-    # Unique countries
-    unique_countries_result = await db.execute(
-        select(func.count(func.distinct(VisitorLog.country))).where(
-            and_(
-                VisitorLog.visited_at >= cutoff_date,
-                VisitorLog.country.isnot(None),
-            )
-        )
-    )
-    unique_countries = unique_countries_result.scalar() or 0
-    
-    # Top countries
-    top_countries_query = select(
-        VisitorLog.country,
-        VisitorLog.country_name,
-        func.count(VisitorLog.id).label('visits'),
-        func.count(func.distinct(VisitorLog.session_id)).label('visitors'),
-    ).where(
-        and_(
-            VisitorLog.visited_at >= cutoff_date,
-            VisitorLog.country.isnot(None),
-        )
-    ).group_by(
-        VisitorLog.country,
-        VisitorLog.country_name,
-    ).order_by(
-        func.count(VisitorLog.id).desc()
-    ).limit(10)
-    
-    top_countries_result = await db.execute(top_countries_query)
-    top_countries = [
-        {
-            'country': row.country,
-            'country_name': row.country_name,
-            'visits': row.visits,
-            'visitors': row.visitors,
-        }
-        for row in top_countries_result.all()
-    ]
     
-    # Top cities
-    top_cities_query = select(
-        VisitorLog.city,
-        VisitorLog.country,
-        VisitorLog.country_name,
-        func.count(VisitorLog.id).label('visits'),
-        func.count(func.distinct(VisitorLog.session_id)).label('visitors'),
-    ).where(
-        and_(
-            VisitorLog.visited_at >= cutoff_date,
-            VisitorLog.city.isnot(None),
+    Reads the daily and hourly rollups plus raw visitor logs for the hours not rolled
+    up yet. Grouping and top-N selection run in SQL. Unique visitor counts are
+    HyperLogLog estimates (~2% error).
+    """
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+    precision = settings.VISITOR_ROLLUP_COORD_PRECISION
+    
+    by_date = await load_visitor_groups(db, cutoff_date, precision, ("date",))
+    countries = await load_visitor_groups(db, cutoff_date, precision, ("country", "country_name"), limit=10)
+    cities = await load_visitor_groups(db, cutoff_date, precision, ("city", "country", "country_name"), limit=10)
+    urls = await load_visitor_groups(db, cutoff_date, precision, ("url_id",), limit=20)
+    all_countries = await load_visitor_groups(db, cutoff_date, precision, ("country",), with_visitors=False)
+    
+    # Site-wide unique visitors from the per-day Redis sketches when available,
+    # otherwise the union of the per-day sketches
+    unique_visitors = await unique_counter.count(VISITORS, cutoff_date)
+    if unique_visitors is None:
+        unique_visitors = await asyncio.to_thread(_union_count, by_date)
+    
+    paths = {}
+    if urls:
+        result = await db.execute(
+            select(VisitorUrl.id, VisitorUrl.path).where(VisitorUrl.id.in_([group.key[0] for group in urls]))
         )
-    ).group_by(
-        VisitorLog.city,
-        VisitorLog.country,
-        VisitorLog.country_name,
-    ).order_by(
-        func.count(VisitorLog.id).desc()
-    ).limit(10)
-    
-    top_cities_result = await db.execute(top_cities_query)
-    top_cities = [
-        {
-            'city': row.city,
-            'country': row.country,
-            'country_name': row.country_name,
-            'visits': row.visits,
-            'visitors': row.visitors,
-        }
-        for row in top_cities_result.all()
-    ]
-    
-    # Top URLs
-    top_urls_query = select(
-        VisitorLog.url,
-        func.count(VisitorLog.id).label('visits'),
-        func.count(func.distinct(VisitorLog.session_id)).label('visitors'),
-    ).where(
-        VisitorLog.visited_at >= cutoff_date
-    ).group_by(
-        VisitorLog.url
-    ).order_by(
-        func.count(VisitorLog.id).desc()
-    ).limit(20)
-    
-    top_urls_result = await db.execute(top_urls_query)
-    top_urls = [
-        {
-            'url': row.url,
-            'visits': row.visits,
-            'visitors': row.visitors,
-        }
-        for row in top_urls_result.all()
-    ]
-    
-    # Visits by date
-    visits_by_date_query = select(
-        func.date(VisitorLog.visited_at).label('date'),
-        func.count(VisitorLog.id).label('visits'),
-        func.count(func.distinct(VisitorLog.session_id)).label('visitors'),
-    ).where(
-        VisitorLog.visited_at >= cutoff_date
-    ).group_by(
-        func.date(VisitorLog.visited_at)
-    ).order_by(
-        func.date(VisitorLog.visited_at)
-    )
-    
-    visits_by_date_result = await db.execute(visits_by_date_query)
-    visits_by_date = [
-        {
-            'date': row.date.isoformat(),
-            'visits': row.visits,
-            'visitors': row.visitors,
-        }
-        for row in visits_by_date_result.all()
-    ]
+        paths = dict(result.all())
     
     return VisitorStatsResponse(
-        total_visits=total_visits,
+        total_visits=sum(group.visits for group in by_date),
         unique_visitors=unique_visitors,
-        unique_countries=unique_countries,
-        top_countries=top_countries,
-        top_cities=top_cities,
-        top_urls=top_urls,
-        visits_by_date=visits_by_date,
+        unique_countries=len(all_countries),
+        top_countries=[
+            {
+                'country': country,
+                'country_name': country_name,
+                'visits': group.visits,
+                'visitors': group.unique_visitors,
+            }
+            for group in countries
+            for country, country_name in [group.key]
+        ],
+        top_cities=[
+            {
+                'city': city,
+                'country': country,
+                'country_name': country_name,
+                'visits': group.visits,
+                'visitors': group.unique_visitors,
+            }
+            for group in cities
+            for city, country, country_name in [group.key]
+        ],
+        top_urls=[
+            {
+                'url': paths.get(group.key[0]),
+                'visits': group.visits,
+                'visitors': group.unique_visitors,
+            }
+            for group in urls
+        ],
+        visits_by_date=[
+            {
+                'date': group.key[0].isoformat(),
+                'visits': group.visits,
+                'visitors': group.unique_visitors,
+            }
+            for group in sorted(by_date, key=lambda group: group.key)
+        ],
     )
 
 
 @router.get("/recent")
 async def get_recent_visits(
     limit: int = Query(100, ge=1, le=1000),
+    before: Optional[uuid.UUID] = Query(None, description="Return visits older than this visit id (next page)"),
     current_user: User = Depends(get_current_admin_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get recent visitor logs with full details (MVP - minimal fields)
+    
+    Newest first, keyset-paged by id: ids are UUIDv7, so id order is time order.
+    Pass the last id of a page as `before` to get the next one.
     """
-    query = select(VisitorLog).order_by(
-        VisitorLog.visited_at.desc()
+    query = select(VisitorLog, VisitorUrl.path).join(
+        VisitorUrl, VisitorUrl.id == VisitorLog.url_id
+    ).order_by(
+        VisitorLog.id.desc()
     ).limit(limit)
+    if before is not None:
+        query = query.where(VisitorLog.id < before)
+        if before.version == 7:
+            # Bound the partition key too, so newer monthly partitions are pruned
+            # (an hour of slack for app/database clock skew)
+            query = query.where(VisitorLog.visited_at <= uuid7_time(before) + timedelta(hours=1))
     
     result = await db.execute(query)
-    visits = result.scalars().all()
+    visits = result.all()
     
     return [
         {
             'id': str(visit.id),
             'session_id': str(visit.session_id),
             'user_id': str(visit.user_id) if visit.user_id else None,
-            'url': visit.url,
+            'url': url,
             'country': visit.country,
             'country_name': visit.country_name,
             'city': visit.city,
@@ -274,6 +209,6 @@ async def get_recent_visits(
             'longitude': float(visit.longitude) if visit.longitude else None,
             'visited_at': visit.visited_at.isoformat(),
         }
-        for visit in visits
+        for visit, url in visits
     ]
 
@@ -43,11 +43,73 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
     
+    # Redis (video processing progress, caches)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # Password hashing pool (bcrypt_sha256 runs off the event loop)
+    # Requests beyond workers + queue limit get 503 instead of piling up
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    
+    # Authenticated-user cache (get_current_user): in-process LRU + shared Redis tier
+    # AUTH_USER_CACHE_TTL bounds how long another API process may serve a stale ban/role
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL: int = 15  # seconds, in-process
+    AUTH_USER_CACHE_REDIS_TTL: int = 300  # seconds, 0 disables the Redis tier
+    
+    # Processed media storage: "local" (shared uploads volume) or "s3" (any S3-compatible store)
+    # Must match the video worker's STORAGE_BACKEND / S3_* settings
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str | None = None
+    S3_ENDPOINT_URL: str | None = None  # e.g. http://minio:9000 (unset for AWS)
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: str | None = None
+    S3_SECRET_ACCESS_KEY: str | None = None
+    S3_PREFIX: str = "processed"
+    
+    # Media serving (/uploads)
+    # Offload file bytes to the front proxy: "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd)
+    MEDIA_OFFLOAD_MODE: str | None = None
+    # nginx `internal` location aliased to the uploads volume (x-accel-redirect mode)
+    MEDIA_ACCEL_REDIRECT_PREFIX: str = "/_protected_uploads"
+    MEDIA_CACHE_MAX_AGE: int = 3600  # processed/ files; reprocessed videos can be stale this long
+    
+    # Visitor log writer: bounded queue, bulk INSERT per batch (size or time trigger)
+    VISITOR_LOG_QUEUE_SIZE: int = 10000  # Visits beyond this are dropped (and counted)
+    VISITOR_LOG_BATCH_SIZE: int = 500
+    VISITOR_LOG_FLUSH_INTERVAL: float = 2.0  # seconds
+    VISITOR_INTERN_CACHE_SIZE: int = 10000  # Cached URL path / user agent -> id entries (each)
+    
+    # Visitor analytics rollups: hourly and daily aggregates of visitor_logs (app/services/visitor_rollups.py)
+    VISITOR_ROLLUP_INTERVAL: float = 300  # seconds between runs (0 disables the job)
+    VISITOR_ROLLUP_GRACE_SECONDS: float = 60  # An hour is rolled up this long after it ends
+    VISITOR_ROLLUP_MAX_HOURS_PER_RUN: int = 24  # Catch-up chunk per transaction
+    VISITOR_ROLLUP_COORD_PRECISION: int = 2  # Lat/long bucket: decimal places (2 = ~1km)
+    
+    # Unique counts: Redis HyperLogLogs per day (app/services/unique_counts.py)
+    UNIQUE_COUNT_RETENTION_DAYS: int = 400  # Day sketches expire after this; longer windows use SQL
+    
+    # Monthly-partitioned event tables (app/services/partition_maintenance.py)
+    PARTITION_MAINTENANCE_INTERVAL: float = 3600  # seconds between runs (0 disables the job)
+    PARTITION_MONTHS_AHEAD: int = 3  # Future monthly partitions kept pre-created
+    # Retention in months per table (0 = keep forever). Per-video view counts are
+    # computed from views, so views are kept by default.
+    VIEWS_RETENTION_MONTHS: int = 0
+    VISITOR_LOG_RETENTION_MONTHS: int = 13  # Hourly rollups keep the aggregates
+    SHARE_CLICK_RETENTION_MONTHS: int = 0
+    AD_CLICK_RETENTION_MONTHS: int = 0
+    PARTITION_RETENTION_DETACH_ONLY: bool = False  # True: detach expired partitions (to archive) instead of dropping
+    
     # GeoIP (Visitor Analytics)
     # Supports both MaxMind GeoLite2-City.mmdb and DB-IP dbip-city-lite databases
     # Both use the same .mmdb format and are compatible with geoip2 library
     # REQUIRED: Set via GEOIP_DB_PATH environment variable for geographic tracking
     GEOIP_DB_PATH: str | None = None  # Path to GeoIP database file (.mmdb format)
+    # Resolved locations are cached per network (LRU + TTL); 32/128 caches per address
+    GEOIP_CACHE_SIZE: int = 50000
+    GEOIP_CACHE_TTL: int = 3600  # seconds
+    GEOIP_CACHE_IPV4_PREFIX: int = 24
+    GEOIP_CACHE_IPV6_PREFIX: int = 48
     
     # Environment
     ENVIRONMENT: str = "development"
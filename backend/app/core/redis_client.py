@@ -0,0 +1,22 @@
+"""
+Shared async Redis client
+"""
+from typing import Optional
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+_redis: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """Get the shared async Redis client (created lazily, one connection pool per process)"""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+        )
+    return _redis
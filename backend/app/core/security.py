@@ -1,8 +1,12 @@
 """
 Security utilities: JWT, password hashing
 """
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
 from jose import JWTError, jwt
 from passlib.hash import bcrypt_sha256
 
@@ -44,6 +48,102 @@ def get_password_hash(password: str) -> str:
     return bcrypt_sha256.hash(password)
 
 
+class PasswordHashingBusy(Exception):
+    """The hashing pool's queue is full; the request should be retried later"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt_sha256 on a dedicated, bounded thread pool
+    
+    A bcrypt verify takes tens to hundreds of milliseconds of CPU. Called inline from an
+    async endpoint, it blocks the event loop and stalls every request on the process.
+    The bcrypt extension releases the GIL, so threads hash in parallel. A separate pool
+    (not the default executor) keeps a login burst from starving other to_thread work.
+    
+    At most `workers` hashes run at once and at most `queue_limit` more wait. Beyond
+    that, calls fail fast with PasswordHashingBusy instead of queueing without bound.
+    """
+    
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {
+            "completed": 0,
+            "rejected": 0,
+            "max_pending": 0,
+            "queue_wait_seconds": 0.0,
+            "hash_seconds": 0.0,
+        }
+    
+    async def _run(self, func: Callable, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self._counters["rejected"] += 1
+                raise PasswordHashingBusy(f"{self._pending} password hashes in flight")
+            self._pending += 1
+            self._counters["max_pending"] = max(self._counters["max_pending"], self._pending)
+        
+        submitted = time.perf_counter()
+        
+        def timed():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._counters["queue_wait_seconds"] += started - submitted
+                    self._counters["hash_seconds"] += finished - started
+        
+        try:
+            future = self._executor.submit(timed)
+        except BaseException:
+            self._release(None)
+            raise
+        # Released when the thread work ends (or a queued job is cancelled), not when the
+        # awaiting request goes away - a cancelled login still occupies the pool until then
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+    
+    def _release(self, future: Optional[Future]):
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled():
+                self._counters["completed"] += 1
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            pending = self._pending
+        completed = counters["completed"] or 1
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": pending,
+            "max_in_flight": counters["max_pending"],
+            "completed": counters["completed"],
+            "rejected": counters["rejected"],
+            "avg_queue_wait_ms": round(counters["queue_wait_seconds"] / completed * 1000, 2),
+            "avg_hash_ms": round(counters["hash_seconds"] / completed * 1000, 2),
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
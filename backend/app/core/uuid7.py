@@ -0,0 +1,51 @@
+"""
+Time-ordered UUIDs (RFC 9562 version 7)
+48-bit Unix timestamp in milliseconds, then a 12-bit counter and 62 random bits. New
+keys are always near the right edge of a B-tree index, so inserts into the high-volume
+event tables (views, votes, visitor_logs, share_clicks, ad_clicks) touch a few hot pages
+instead of random ones, and ids sort by creation time.
+
+The counter keeps ids from one process strictly increasing, even within a millisecond
+or when the clock steps back. Ids from different processes are ordered to the
+millisecond.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+_COUNTER_MAX = 0xFFF
+_RAND_B_MASK = (1 << 62) - 1
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    ms = time.time_ns() // 1_000_000
+    with _lock:
+        if ms > _last_ms:
+            # New millisecond: random counter start, leaving room to count up
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+            _last_ms = ms
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                # Counter exhausted: borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+            ms = _last_ms
+        counter = _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & _RAND_B_MASK
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+
+def uuid7_time(value: uuid.UUID) -> datetime:
+    """Creation time embedded in a UUIDv7 (millisecond precision)"""
+    if value.version != 7:
+        raise ValueError(f"Not a version 7 UUID: {value}")
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
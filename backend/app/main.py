@@ -3,16 +3,16 @@ FastAPI Main Application
 """
 import logging
 import traceback
-from pathlib import Path
+import uuid
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.media import MediaFiles, UPLOADS_DIR
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -36,72 +36,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Visitor Tracking Middleware (MVP - Simple async tracking)
+# Visitor Tracking Middleware
 @app.middleware("http")
 async def track_visitors_middleware(request: Request, call_next):
     """
     Track visitor visits in background (non-blocking)
     Only tracks GET requests to frontend pages (not API calls)
+    
+    The visit is captured from the request and queued; the visitor log writer
+    resolves GeoIP and bulk-inserts queued visits in batches.
     """
     response = await call_next(request)
     
-    # Only track GET requests to frontend routes (skip API routes)
-    if request.method == "GET" and not request.url.path.startswith("/api/"):
-        # Track in background (fire and forget)
-        import asyncio
-        from app.core.database import AsyncSessionLocal
-        from app.services.visitor_tracking import get_tracking_service
+    # Only track GET requests to frontend routes (skip API routes and media bytes)
+    if request.method == "GET" and not request.url.path.startswith(("/api/", "/uploads/")):
+        from app.services.visitor_tracking import get_tracking_service, get_visitor_log_writer
         from app.core.security import decode_token
-        from app.models.user import User
-        from sqlalchemy import select
-        
-        async def track_visit_async():
-            """Async tracking function"""
-            try:
-                async with AsyncSessionLocal() as db:
-                    # Try to get user if authenticated (non-blocking check)
-                    user_id = None
-                    try:
-                        # Check for auth token in headers
-                        auth_header = request.headers.get("authorization", "")
-                        if auth_header.startswith("Bearer "):
-                            token = auth_header.split(" ")[1]
-                            payload = decode_token(token)
-                            if payload and payload.get("type") == "access":
-                                user_id_str = payload.get("sub")
-                                if user_id_str:
-                                    result = await db.execute(
-                                        select(User).where(User.id == user_id_str)
-                                    )
-                                    user = result.scalar_one_or_none()
-                                    if user and user.is_active:
-                                        user_id = user.id
-                    except:
-                        pass  # Ignore auth errors for tracking
-                    
-                    tracking_service = get_tracking_service()
-                    await tracking_service.track_visit(request, db, user_id)
-            except Exception as e:
-                logger.debug(f"Background tracking failed: {e}")  # Don't log errors for tracking failures
         
-        # Fire and forget
-        asyncio.create_task(track_visit_async())
+        try:
+            # Authenticated visitor: user id from the access token (existence and
+            # is_active are checked per batch by the writer)
+            user_id = None
+            auth_header = request.headers.get("authorization", "")
+            if auth_header.startswith("Bearer "):
+                payload = decode_token(auth_header.split(" ")[1])
+                if payload and payload.get("type") == "access" and payload.get("sub"):
+                    user_id = uuid.UUID(payload["sub"])
+            
+            visit = get_tracking_service().capture_visit(request, user_id)
+            get_visitor_log_writer().enqueue(visit)
+        except Exception as e:
+            logger.debug(f"Visit tracking failed: {e}")  # Don't log errors for tracking failures
     
     return response
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
-# Serve static files for processed videos (development mode)
-# This serves both uploaded files and processed files (MP4s, thumbnails)
-# Use absolute path to ensure it works regardless of working directory
-uploads_dir = Path("/app/uploads")
-uploads_dir.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
-if uploads_dir.exists():
-    app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
-    logger.info(f"Serving static files from: {uploads_dir.absolute()}")
-else:
-    logger.warning(f"Uploads directory not found: {uploads_dir.absolute()}")
+# Serve uploaded and processed files (MP4s, HLS, thumbnails)
+# Range requests, strong ETags, short-lived caching for processed/ and optional
+# X-Accel-Redirect/X-Sendfile offload - see app/media.py
+UPLOADS_DIR.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
+app.mount("/uploads", MediaFiles(UPLOADS_DIR), name="uploads")
+logger.info(f"Serving media files from: {UPLOADS_DIR.absolute()}"
+            f"{f' (offload: {settings.MEDIA_OFFLOAD_MODE})' if settings.MEDIA_OFFLOAD_MODE else ''}")
 
 
 # Global exception handler
@@ -211,6 +189,27 @@ async def startup_event():
             logger.warning(f"Could not verify/add video_metadata_json column: {e}")
             # Don't fail startup if migration fails
         
+        # Ensure url_hls column exists (migration 005)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("ALTER TABLE videos ADD COLUMN IF NOT EXISTS url_hls TEXT;"))
+                await db.commit()
+                logger.info("✓ url_hls column verified")
+        except Exception as e:
+            logger.warning(f"Could not verify/add url_hls column: {e}")
+            # Don't fail startup if migration fails
+        
+        # Ensure thumbnail variant columns exist (migration 006)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("ALTER TABLE videos ADD COLUMN IF NOT EXISTS thumbnail_variants_json TEXT;"))
+                await db.execute(text("ALTER TABLE videos ADD COLUMN IF NOT EXISTS thumbnail_placeholder TEXT;"))
+                await db.commit()
+                logger.info("✓ thumbnail variant columns verified")
+        except Exception as e:
+            logger.warning(f"Could not verify/add thumbnail variant columns: {e}")
+            # Don't fail startup if migration fails
+        
         # Migrate votes table to support anonymous votes
         try:
             async with AsyncSessionLocal() as db:
@@ -296,11 +295,55 @@ async def startup_event():
         # Don't raise - allow app to start even if tables exist
 
 
+@app.on_event("startup")
+async def start_visitor_log_writer():
+    """Start the background writer that batches visitor log inserts"""
+    from app.services.visitor_tracking import get_visitor_log_writer
+    get_visitor_log_writer().start()
+
+
+@app.on_event("shutdown")
+async def stop_visitor_log_writer():
+    """Flush queued visits before the process exits"""
+    from app.services.visitor_tracking import get_visitor_log_writer
+    await get_visitor_log_writer().stop()
+
+
+@app.on_event("startup")
+async def start_visitor_rollup_job():
+    """Start the periodic job that rolls visitor_logs up into hourly aggregates"""
+    from app.services.visitor_rollups import get_visitor_rollup_job
+    get_visitor_rollup_job().start()
+
+
+@app.on_event("shutdown")
+async def stop_visitor_rollup_job():
+    from app.services.visitor_rollups import get_visitor_rollup_job
+    await get_visitor_rollup_job().stop()
+
+
+@app.on_event("startup")
+async def start_partition_maintenance():
+    """Pre-create monthly event partitions and expire old ones"""
+    from app.services.partition_maintenance import get_partition_maintenance_job
+    get_partition_maintenance_job().start()
+
+
+@app.on_event("shutdown")
+async def stop_partition_maintenance():
+    from app.services.partition_maintenance import get_partition_maintenance_job
+    await get_partition_maintenance_job().stop()
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     try:
         from app.core.database import AsyncSessionLocal
+        from app.core.security import password_hasher
+        from app.services.visitor_tracking import get_tracking_service, get_visitor_log_writer
+        from app.services.visitor_rollups import get_visitor_rollup_job
+        from app.services.partition_maintenance import get_partition_maintenance_job
         from sqlalchemy import text
         
         # Test database connection
@@ -312,6 +355,11 @@ async def health_check():
                 "status": "healthy",
                 "service": "short-video-platform-api",
                 "database": "connected",
+                "password_hashing": password_hasher.stats(),
+                "visitor_log_writer": get_visitor_log_writer().get_stats(),
+                "geoip_cache": get_tracking_service().geoip_service.stats(),
+                "visitor_rollups": get_visitor_rollup_job().get_stats(),
+                "partition_maintenance": get_partition_maintenance_job().get_stats(),
             }
         )
     except Exception as e:
@@ -0,0 +1,232 @@
+"""
+Media file serving for /uploads (processed MP4s, HLS, thumbnails, originals)
+
+A small ASGI app instead of StaticFiles:
+- Single byte ranges (206 / 416), If-Range, If-None-Match, If-Modified-Since, HEAD
+- Strong ETags from inode, size and mtime. Processed files are published by atomic
+  rename and never modified in place, so these identify the bytes exactly
+- processed/ files may be cached for MEDIA_CACHE_MAX_AGE, then revalidated by ETag
+- Bytes go out with sendfile when the server supports the ASGI zero-copy extension,
+  otherwise as pread() chunks in a worker thread, never as blocking reads on the event loop
+- MEDIA_OFFLOAD_MODE=x-accel-redirect (nginx) or x-sendfile (Apache/lighttpd)
+  returns headers only and lets the front proxy send the bytes
+
+It is mounted at /uploads in main.py. It can also run as its own process so video
+traffic does not share an event loop with the API:
+    uvicorn app.media:media_app --port 8001   (proxy /uploads/ to it)
+"""
+import email.utils
+import logging
+import mimetypes
+import os
+import re
+import stat
+from pathlib import Path
+from typing import Optional
+
+import anyio
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path("/app/uploads")
+CHUNK_SIZE = 256 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$", re.IGNORECASE)
+
+# Types mimetypes does not know about
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".webp": "image/webp",
+}
+
+
+def _content_type(path: Path) -> str:
+    return CONTENT_TYPES.get(path.suffix.lower()) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def _etag(file_stat: os.stat_result) -> str:
+    """Strong validator: changes whenever the file is replaced (new inode) or rewritten"""
+    return f'"{file_stat.st_ino:x}-{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+
+
+def _cache_control(relative_path: str) -> str:
+    # Processed keys are stable per video but reprocessing rewrites them (not content-addressed),
+    # so no `immutable`: caches revalidate against the strong ETag once max-age has passed
+    if relative_path.startswith("processed/"):
+        return f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    return "public, no-cache"
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range into an inclusive (start, end)
+
+    Returns None if the header should be ignored (malformed or multiple ranges,
+    served as a full 200). Raises ValueError if the range is unsatisfiable.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start_str, end_str = match.groups()
+    if not start_str:
+        # Suffix range: last N bytes
+        suffix_length = int(end_str)
+        if suffix_length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - suffix_length, 0), size - 1
+    start = int(start_str)
+    end = min(int(end_str), size - 1) if end_str else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def _not_modified(request_headers: dict, etag: str, last_modified: float) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+class MediaFiles:
+    """ASGI app serving files from a directory with range, caching and offload support"""
+
+    def __init__(self, directory: Path = UPLOADS_DIR):
+        self.directory = directory.resolve()
+
+    def _resolve(self, scope) -> Optional[tuple[Path, str]]:
+        path = scope["path"]
+        # Newer Starlette keeps the full path on mounted apps; strip the mount prefix
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path + "/"):
+            path = path[len(root_path):]
+        relative = os.path.normpath(path.lstrip("/"))
+        if relative in (".", "") or relative.startswith("..") or os.path.isabs(relative):
+            return None
+        full_path = (self.directory / relative).resolve()
+        if self.directory not in full_path.parents:
+            return None
+        return full_path, relative.replace(os.sep, "/")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        resolved = self._resolve(scope)
+        if resolved is None:
+            await self._send_empty(send, 404)
+            return
+        full_path, relative = resolved
+
+        try:
+            file_stat = await anyio.to_thread.run_sync(os.stat, full_path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            await self._send_empty(send, 404)
+            return
+        if not stat.S_ISREG(file_stat.st_mode):
+            await self._send_empty(send, 404)
+            return
+
+        request_headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        size = file_stat.st_size
+        etag = _etag(file_stat)
+        headers = [
+            (b"content-type", _content_type(full_path).encode()),
+            (b"etag", etag.encode()),
+            (b"last-modified", email.utils.formatdate(file_stat.st_mtime, usegmt=True).encode()),
+            (b"cache-control", _cache_control(relative).encode()),
+            (b"accept-ranges", b"bytes"),
+        ]
+
+        if _not_modified(request_headers, etag, file_stat.st_mtime):
+            await self._send_empty(send, 304, headers)
+            return
+
+        # Front proxy sends the bytes (and handles Range itself)
+        offload_mode = (settings.MEDIA_OFFLOAD_MODE or "").lower()
+        if offload_mode == "x-accel-redirect":
+            location = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+            await self._send_empty(send, 200, headers + [(b"x-accel-redirect", location.encode())])
+            return
+        if offload_mode == "x-sendfile":
+            await self._send_empty(send, 200, headers + [(b"x-sendfile", str(full_path).encode())])
+            return
+
+        status_code, start, end = 200, 0, size - 1
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and size > 0 and (if_range is None or if_range == etag):
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                await self._send_empty(send, 416, headers + [(b"content-range", f"bytes */{size}".encode())])
+                return
+            if byte_range:
+                status_code, (start, end) = 206, byte_range
+                headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+
+        length = end - start + 1 if size else 0
+        headers.append((b"content-length", str(length).encode()))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await self._send_file(scope, send, full_path, start, length)
+
+    async def _send_file(self, scope, send, full_path: Path, offset: int, length: int):
+        fd = await anyio.to_thread.run_sync(os.open, full_path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                # Server does sendfile(2) directly from the descriptor
+                with os.fdopen(os.dup(fd), "rb") as file:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": file,
+                        "offset": offset,
+                        "count": length,
+                        "more_body": False,
+                    })
+                return
+
+            remaining = length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File was truncated underneath us; end the response
+                logger.warning(f"Media file shrank while sending: {full_path}")
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    async def _send_empty(send, status_code: int, headers: Optional[list] = None):
+        headers = [header for header in (headers or []) if header[0] != b"content-length"]
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": headers + [(b"content-length", b"0")],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+# Standalone app for running media serving in its own process (see module docstring)
+media_app = MediaFiles()
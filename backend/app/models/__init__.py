@@ -8,6 +8,8 @@ from app.models.report import Report
 from app.models.share import ShareLink
 from app.models.share_click import ShareClick
 from app.models.ad_click import AdClick
-from app.models.visitor_log import VisitorLog
+from app.models.visitor_log import VisitorLog, VisitorUrl, VisitorUserAgent
+from app.models.video_fingerprint import VideoFingerprint, VideoFingerprintBucket
+from app.models.visitor_rollup import VisitorHourlyRollup, VisitorDailyRollup, AnalyticsRollupWatermark
 
-__all__ = ["User", "Video", "Vote", "View", "UserLikedVideo", "Report", "ShareLink", "ShareClick", "AdClick", "VisitorLog"]
+__all__ = ["User", "Video", "Vote", "View", "UserLikedVideo", "Report", "ShareLink", "ShareClick", "AdClick", "VisitorLog", "VisitorUrl", "VisitorUserAgent", "VideoFingerprint", "VideoFingerprintBucket", "VisitorHourlyRollup", "VisitorDailyRollup", "AnalyticsRollupWatermark"]
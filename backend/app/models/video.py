@@ -4,6 +4,7 @@ Video Model
 from sqlalchemy import Column, String, Text, Integer, BigInteger, ForeignKey, DateTime, func, TypeDecorator
 from sqlalchemy.dialects.postgresql import UUID, ENUM as PG_ENUM
 from sqlalchemy.orm import relationship
+import json
 import uuid
 import enum
 
@@ -54,7 +55,10 @@ class Video(Base):
     description = Column(Text)
     status = Column(VideoStatusType(), default=VideoStatus.UPLOADING, index=True)
     url_mp4 = Column(Text)
+    url_hls = Column(Text, nullable=True)  # HLS master playlist (adaptive bitrate), NULL if not generated
     thumbnail = Column(Text)
+    thumbnail_variants_json = Column(Text, nullable=True)  # JSON: width (px) -> WebP URL
+    thumbnail_placeholder = Column(Text, nullable=True)  # LQIP data URI (tiny WebP)
     duration_seconds = Column(Integer)
     file_size_bytes = Column(BigInteger)
     original_filename = Column(String(255))
@@ -67,3 +71,13 @@ class Video(Base):
     # Relationships
     user = relationship("User", backref="videos")
 
+    @property
+    def thumbnail_variants(self) -> dict | None:
+        """Parsed thumbnail_variants_json (None if not generated or unreadable)"""
+        if not self.thumbnail_variants_json:
+            return None
+        try:
+            return json.loads(self.thumbnail_variants_json)
+        except ValueError:
+            return None
+
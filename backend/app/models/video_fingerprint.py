@@ -0,0 +1,40 @@
+"""
+VideoFingerprint Model - Perceptual fingerprints written by the video worker
+One 64-bit pHash per sampled frame, plus hash-prefix buckets for near-duplicate lookups
+(see video_worker/fingerprint.py)
+"""
+from sqlalchemy import Column, ForeignKey, DateTime, Integer, BigInteger, Float, func
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+
+
+class VideoFingerprint(Base):
+    __tablename__ = "video_fingerprints"
+
+    video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    frame_hashes = Column(ARRAY(BigInteger), nullable=False)  # Signed BIGINT per frame (unsigned 64-bit pHash)
+    duration_seconds = Column(Float, nullable=False)
+    duplicate_of = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="SET NULL"), nullable=True)  # Closest earlier near-duplicate
+    duplicate_distance = Column(Float, nullable=True)  # Mean Hamming distance to duplicate_of (0-64)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    video = relationship("Video", foreign_keys=[video_id])
+    duplicate_video = relationship("Video", foreign_keys=[duplicate_of])
+
+    __table_args__ = (
+        {"extend_existing": True},
+    )
+
+
+class VideoFingerprintBucket(Base):
+    __tablename__ = "video_fingerprint_buckets"
+
+    bucket = Column(Integer, primary_key=True)  # band << 16 | 16-bit slice of a frame hash
+    video_id = Column(UUID(as_uuid=True), ForeignKey("video_fingerprints.video_id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    __table_args__ = (
+        {"extend_existing": True},
+    )
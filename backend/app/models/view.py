@@ -4,7 +4,7 @@ View Model
 from sqlalchemy import Column, ForeignKey, Integer, DateTime, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-import uuid
+from app.core.uuid7 import uuid7
 
 from app.core.database import Base
 
@@ -12,11 +12,12 @@ from app.core.database import Base
 class View(Base):
     __tablename__ = "views"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     watched_seconds = Column(Integer, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Partition key (monthly partitions), so part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
@@ -1,10 +1,10 @@
 """
 Visitor Log Model (MVP - Minimal Implementation)
 """
-from sqlalchemy import Column, String, Text, ForeignKey, DateTime, func, DECIMAL
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Integer, func, DECIMAL
 from sqlalchemy.dialects.postgresql import UUID, INET
 from sqlalchemy.orm import relationship
-import uuid
+from app.core.uuid7 import uuid7
 
 from app.core.database import Base
 
@@ -12,16 +12,16 @@ from app.core.database import Base
 class VisitorLog(Base):
     __tablename__ = "visitor_logs"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     # Session/User
     session_id = Column(UUID(as_uuid=True), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     
-    # Request (Core)
-    url = Column(Text, nullable=False)
+    # Request (Core) - URL path and user agent are dictionary-encoded
+    url_id = Column(Integer, ForeignKey("visitor_urls.id"), nullable=False)
     ip_address = Column(INET)
-    user_agent = Column(Text)
+    user_agent_id = Column(Integer, ForeignKey("visitor_user_agents.id"), nullable=True)
     
     # Geographic (Core)
     country = Column(String(2))
@@ -31,8 +31,26 @@ class VisitorLog(Base):
     longitude = Column(DECIMAL(11, 8))
     
     # Timestamps
-    visited_at = Column(DateTime(timezone=True), server_default=func.now())
+    visited_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())  # Partition key (monthly partitions)
     
     # Relationships
     user = relationship("User", backref="visitor_logs")
 
+
+class VisitorUrl(Base):
+    """Distinct visited URL paths (query string dropped), referenced by visitor_logs.url_id"""
+    __tablename__ = "visitor_urls"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(Text, nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class VisitorUserAgent(Base):
+    """Distinct normalized user agents, referenced by visitor_logs.user_agent_id"""
+    __tablename__ = "visitor_user_agents"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_agent = Column(Text, nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
@@ -0,0 +1,66 @@
+"""
+Visitor Rollup Models - Hourly and daily aggregates of visitor_logs
+Maintained by the rollup job in app/services/visitor_rollups.py
+"""
+from sqlalchemy import Column, String, Date, DateTime, ForeignKey, Integer, BigInteger, LargeBinary, DECIMAL, func
+
+from app.core.database import Base
+
+
+class VisitorHourlyRollup(Base):
+    __tablename__ = "visitor_hourly_rollups"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    hour = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    # Dimensions
+    country = Column(String(2))
+    country_name = Column(String(100))
+    city = Column(String(100))
+    latitude = Column(DECIMAL(10, 8))  # Rounded to VISITOR_ROLLUP_COORD_PRECISION
+    longitude = Column(DECIMAL(11, 8))
+    url_id = Column(Integer, ForeignKey("visitor_urls.id"), nullable=False)
+
+    # Measures
+    visit_count = Column(Integer, nullable=False)
+    visitors = Column(LargeBinary, nullable=False)  # HyperLogLog sketch of session_id (app/services/hll.py)
+
+    __table_args__ = (
+        {"extend_existing": True},
+    )
+
+
+class VisitorDailyRollup(Base):
+    """Hourly rollups merged per UTC day (same dimensions)"""
+    __tablename__ = "visitor_daily_rollups"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False, index=True)
+
+    # Dimensions
+    country = Column(String(2))
+    country_name = Column(String(100))
+    city = Column(String(100))
+    latitude = Column(DECIMAL(10, 8))
+    longitude = Column(DECIMAL(11, 8))
+    url_id = Column(Integer, ForeignKey("visitor_urls.id"), nullable=False)
+
+    # Measures
+    visit_count = Column(Integer, nullable=False)
+    visitors = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        {"extend_existing": True},
+    )
+
+
+class AnalyticsRollupWatermark(Base):
+    __tablename__ = "analytics_rollup_watermarks"
+
+    name = Column(String(50), primary_key=True)
+    rolled_up_until = Column(DateTime(timezone=True), nullable=False)  # Every hour before this is rolled up
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        {"extend_existing": True},
+    )
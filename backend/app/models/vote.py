@@ -5,7 +5,7 @@ from sqlalchemy import Column, ForeignKey, DateTime, func, CheckConstraint
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID, ENUM
 from sqlalchemy.orm import relationship
-import uuid
+from app.core.uuid7 import uuid7
 import enum
 
 from app.core.database import Base
@@ -19,7 +19,7 @@ class VoteDirection(str, enum.Enum):
 class Vote(Base):
     __tablename__ = "votes"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
     session_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # For anonymous votes
     video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="CASCADE"), nullable=False, index=True)
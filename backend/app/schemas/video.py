@@ -46,7 +46,10 @@ class VideoResponse(VideoBase):
     id: str
     status: VideoStatus
     thumbnail: Optional[str] = None
+    thumbnail_variants: Optional[dict[str, str]] = None  # Width (px) -> WebP URL, for srcset
+    thumbnail_placeholder: Optional[str] = None  # Tiny inline preview (data URI) shown while loading
     url_mp4: Optional[str] = None  # MP4 format - works in all modern browsers
+    url_hls: Optional[str] = None  # HLS master playlist (adaptive bitrate), if generated
     duration_seconds: Optional[int] = None
     error_reason: Optional[str] = None  # Error message if video failed
     ad_link: Optional[str] = None  # External ad link (included from VideoBase)
@@ -58,6 +61,17 @@ class VideoResponse(VideoBase):
         from_attributes = True
 
 
+class VideoProgressResponse(BaseModel):
+    video_id: str
+    status: VideoStatus
+    stage: Optional[str] = None  # probing, transcoding, hls, thumbnail, storing, ready, failed
+    percent: Optional[float] = None  # 0-100 for transcoding stages
+    out_time_seconds: Optional[float] = None  # Position FFmpeg has encoded up to
+    duration_seconds: Optional[float] = None  # Probed source duration
+    speed: Optional[str] = None  # FFmpeg encode speed (e.g., "2.5" = 2.5x realtime)
+    updated_at: Optional[datetime] = None  # When the worker last reported progress
+
+
 class VoteRequest(BaseModel):
     direction: str = Field(..., pattern="^(like|not_like)$")
     session_id: Optional[str] = None  # For anonymous votes
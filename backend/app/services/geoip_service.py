@@ -2,11 +2,16 @@
 GeoIP Service for location lookups (Local Database Only)
 Modular design for reusability across projects
 """
+import ipaddress
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional, Dict
 import os
 import geoip2.database
 import geoip2.errors
+import maxminddb
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +23,14 @@ class GeoIPService:
     No external API calls - fully self-contained.
     """
     
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        cache_size: int = 50000,
+        cache_ttl: float = 3600,
+        ipv4_prefix: int = 24,
+        ipv6_prefix: int = 48,
+    ):
         """
         Initialize GeoIP service (lazy loading - database not loaded until first lookup)
         
@@ -26,10 +38,22 @@ class GeoIPService:
             db_path: Path to GeoIP database file (.mmdb format)
                     Supports both MaxMind GeoLite2-City.mmdb and DB-IP dbip-city-lite-*.mmdb
                     Must be provided via GEOIP_DB_PATH environment variable
+            cache_size: Max cached locations (LRU), 0 disables the cache
+            cache_ttl: Seconds a cached location stays valid
+            ipv4_prefix / ipv6_prefix: Cache key network size. City-level data is the
+                    same across a /24 in practice, so neighbouring addresses share an entry
+                    (use 32 / 128 to cache per address)
         """
         self.reader = None
         self._db_path = db_path
         self._initialized = False
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._ipv4_prefix = ipv4_prefix
+        self._ipv6_prefix = ipv6_prefix
+        self._cache: "OrderedDict[str, tuple[float, Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()  # Lookups also run in worker threads
+        self._stats = {"hits": 0, "misses": 0, "private": 0}
     
     def _ensure_initialized(self):
         """Lazy initialization - only load database when actually needed"""
@@ -51,8 +75,13 @@ class GeoIPService:
             return
         
         try:
-            self.reader = geoip2.database.Reader(db_path)
-            logger.info(f"GeoIP database loaded successfully from: {db_path}")
+            # Memory-mapped: API worker processes share the file's page cache instead of
+            # each holding a private copy (C extension if installed, else pure Python mmap)
+            try:
+                self.reader = geoip2.database.Reader(db_path, mode=maxminddb.MODE_MMAP_EXT)
+            except (ValueError, ImportError):
+                self.reader = geoip2.database.Reader(db_path, mode=maxminddb.MODE_MMAP)
+            logger.info(f"GeoIP database loaded successfully from: {db_path} (memory-mapped)")
             # Test with a known IP to verify it's working
             try:
                 test_response = self.reader.city("8.8.8.8")
@@ -62,24 +91,29 @@ class GeoIPService:
         except Exception as e:
             logger.error(f"Could not load GeoIP database from {db_path}: {e}", exc_info=True)
     
+    def _parse_ip(self, ip_address: str):
+        """Parse an address (IPv4-mapped IPv6 is unwrapped), None if invalid"""
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except (ValueError, TypeError):
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            return address.ipv4_mapped
+        return address
+    
     def _is_private_ip(self, ip_address: str) -> bool:
-        """Check if IP address is private/localhost"""
-        if not ip_address or ip_address in ('0.0.0.0', 'localhost'):
-            return True
-        
-        # Check for localhost
-        if ip_address in ('127.0.0.1', '::1', 'localhost'):
-            return True
-        
-        # Check for private IPv4 ranges
-        if ip_address.startswith('192.168.') or ip_address.startswith('10.') or ip_address.startswith('172.'):
-            return True
-        
-        # Check for IPv6 localhost/private
-        if ip_address.startswith('fe80:') or ip_address.startswith('fc00:') or ip_address.startswith('fd00:'):
-            return True
+        """
+        Check if IP address has no public location
         
-        return False
+        Private, loopback, link-local, CGNAT, reserved and unparseable addresses
+        (e.g. "localhost") all count as private. Only 172.16.0.0/12 is private in 172.*.
+        """
+        address = self._parse_ip(ip_address)
+        return address is None or not address.is_global
+    
+    def _cache_key(self, address) -> str:
+        prefix = self._ipv4_prefix if address.version == 4 else self._ipv6_prefix
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
     
     def _get_alaska_default(self) -> Dict:
         """Get default Alaska location for unknown/private IPs"""
@@ -102,6 +136,35 @@ class GeoIPService:
             Dict with country, city, coordinates, etc.
             Returns meaningful default values if lookup fails or IP is private.
         """
+        # Check if it's a private/localhost IP
+        if self._is_private_ip(ip_address):
+            with self._cache_lock:
+                self._stats["private"] += 1
+            logger.debug(f"Private/localhost IP detected: {ip_address} - setting Alaska default location")
+            return self._get_alaska_default()
+        
+        key = self._cache_key(self._parse_ip(ip_address))
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return dict(entry[1])
+            self._stats["misses"] += 1
+        
+        result = self._lookup_uncached(ip_address)
+        
+        if self._cache_size > 0:
+            with self._cache_lock:
+                self._cache[key] = (now + self._cache_ttl, dict(result))
+                self._cache.move_to_end(key)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return result
+    
+    def _lookup_uncached(self, ip_address: str) -> Dict:
+        """Resolve a public IP address in the GeoIP database"""
         # Lazy initialization - only load database when lookup is actually called
         self._ensure_initialized()
         
@@ -114,12 +177,6 @@ class GeoIPService:
             'longitude': None,
         }
         
-        # Check if it's a private/localhost IP
-        if self._is_private_ip(ip_address):
-            alaska_default = self._get_alaska_default()
-            logger.debug(f"Private/localhost IP detected: {ip_address} - setting Alaska default location")
-            return alaska_default
-        
         if not self.reader:
             # Database not available - set Alaska default
             alaska_default = self._get_alaska_default()
@@ -176,7 +233,7 @@ class GeoIPService:
             has_any_data = result['country'] or result['city'] or (result['latitude'] and result['longitude'])
             
             if has_any_data:
-                logger.info(f"GeoIP lookup successful for {ip_address}: country={result['country']}, city={result['city']}, coords=({result['latitude']}, {result['longitude']})")
+                logger.debug(f"GeoIP lookup successful for {ip_address}: country={result['country']}, city={result['city']}, coords=({result['latitude']}, {result['longitude']})")
             else:
                 # IP found in database but no data available
                 # Log detailed debug info before setting defaults
@@ -226,6 +283,15 @@ class GeoIPService:
         
         return result
     
+    def stats(self) -> Dict:
+        """Cache hit-rate statistics (private addresses are never looked up or cached)"""
+        with self._cache_lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+    
     def is_available(self) -> bool:
         """Check if GeoIP service is available (lazy check - doesn't load database)"""
         if not self._initialized:
@@ -0,0 +1,110 @@
+"""
+HyperLogLog sketches for approximate distinct counts
+A sketch summarises a set of ids (session ids, user ids, ...) in at most 4KB, and two
+sketches merge by taking the register-wise maximum. Analytics rollups store one sketch
+per row, so unique counts over any range of rows are a merge instead of a
+COUNT(DISTINCT ...) over raw events.
+
+Precision 12 (4096 registers): ~1.6% standard error. Sketches of small sets are
+serialised sparsely (3 bytes per non-zero register), so most rollup rows stay tiny.
+"""
+import hashlib
+import math
+import uuid
+from typing import Iterable, Optional, Union
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+_RANK_BITS = 64 - PRECISION
+
+_FORMAT_SPARSE = 1
+_FORMAT_DENSE = 2
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def _hash64(value: Union[uuid.UUID, str, bytes]) -> int:
+    if isinstance(value, uuid.UUID):
+        value = value.bytes
+    elif isinstance(value, str):
+        value = value.encode()
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Mutable HyperLogLog sketch (dense registers in memory)"""
+
+    __slots__ = ("registers",)
+
+    def __init__(self, values: Optional[Iterable] = None):
+        self.registers = bytearray(REGISTERS)
+        if values is not None:
+            self.update(values)
+
+    def add(self, value: Union[uuid.UUID, str, bytes]):
+        hashed = _hash64(value)
+        index = hashed >> _RANK_BITS
+        remainder = hashed & ((1 << _RANK_BITS) - 1)
+        rank = _RANK_BITS - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable):
+        for value in values:
+            if value is not None:
+                self.add(value)
+
+    def merge(self, other: Union["HyperLogLog", bytes, None]) -> "HyperLogLog":
+        """Merge another sketch (or its serialised form) into this one"""
+        if other is None:
+            return self
+        if isinstance(other, HyperLogLog):
+            self.registers = bytearray(map(max, self.registers, other.registers))
+            return self
+        data = bytes(other)
+        if not data:
+            return self
+        if data[0] == _FORMAT_DENSE:
+            self.registers = bytearray(map(max, self.registers, data[1:REGISTERS + 1]))
+        elif data[0] == _FORMAT_SPARSE:
+            registers = self.registers
+            for offset in range(1, len(data) - 2, 3):
+                index = (data[offset] << 8) | data[offset + 1]
+                if data[offset + 2] > registers[index]:
+                    registers[index] = data[offset + 2]
+        else:
+            raise ValueError(f"Unknown sketch format: {data[0]}")
+        return self
+
+    def count(self) -> int:
+        registers = self.registers
+        zeros = registers.count(0)
+        if zeros == REGISTERS:
+            return 0
+        estimate = _ALPHA * REGISTERS * REGISTERS / sum(2.0 ** -rank for rank in registers)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Small range correction (linear counting)
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        """Serialise: sparse (index, rank) triples while that is smaller than the dense form"""
+        non_zero = [(index, rank) for index, rank in enumerate(self.registers) if rank]
+        if len(non_zero) * 3 < REGISTERS:
+            data = bytearray([_FORMAT_SPARSE])
+            for index, rank in non_zero:
+                data += bytes((index >> 8, index & 0xFF, rank))
+            return bytes(data)
+        return bytes([_FORMAT_DENSE]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "HyperLogLog":
+        return cls().merge(data)
+
+
+def merge_count(sketches: Iterable[Optional[bytes]]) -> int:
+    """Distinct count of the union of serialised sketches"""
+    merged = HyperLogLog()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged.count()
@@ -0,0 +1,277 @@
+"""
+MP4/MOV box parser
+Walks top-level boxes by size (seeking, never reading mdat) and parses moov for
+duration, tracks and codecs, so most probes need no ffprobe subprocess.
+
+The same module is used by the video worker (video_worker/mp4_boxes.py); keep both in sync.
+"""
+import math
+import struct
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+MAX_TOP_LEVEL_BOXES = 4096
+MAX_MOOV_SIZE = 64 * 1024 * 1024  # moov of a short phone video is well under 10MB
+
+# Box types that can start an MP4/MOV file
+FIRST_BOX_TYPES = {b"ftyp", b"styp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot", b"uuid"}
+
+# Boxes walked into while looking for track headers and sample descriptions
+CONTAINER_BOXES = {b"trak", b"mdia", b"minf", b"stbl"}
+
+# Sample entry fourcc -> ffprobe codec_name
+CODEC_NAMES = {
+    "avc1": "h264", "avc3": "h264",
+    "hvc1": "hevc", "hev1": "hevc",
+    "av01": "av1",
+    "vp09": "vp9",
+    "mp4v": "mpeg4",
+    "jpeg": "mjpeg", "mjpa": "mjpeg",
+    "apch": "prores", "apcn": "prores", "apcs": "prores", "apco": "prores", "ap4h": "prores",
+    "mp4a": "aac",
+    ".mp3": "mp3",
+    "ac-3": "ac3",
+    "ec-3": "eac3",
+    "Opus": "opus",
+    "fLaC": "flac",
+    "alac": "alac",
+    "lpcm": "pcm", "sowt": "pcm_s16le", "twos": "pcm_s16be",
+}
+
+# esds objectTypeIndication values that are MPEG audio rather than AAC
+MP3_OBJECT_TYPES = {0x69, 0x6B}
+
+# H.264 profiles that are always 8-bit 4:2:0 (Baseline, Main, Extended, High)
+H264_YUV420P_PROFILES = {66, 77, 88, 100}
+
+HANDLER_TYPES = {"vide": "video", "soun": "audio"}
+
+
+class Mp4ParseError(ValueError):
+    """File is not a structurally valid MP4/MOV"""
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    """Yield (type, body_start, box_end) for the boxes in data[start:end]"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise Mp4ParseError(f"Truncated {box_type!r} box header at offset {offset}")
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise Mp4ParseError(f"Invalid {box_type!r} box size {size} at offset {offset}")
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _parse_time_header(data: bytes, start: int) -> tuple[int, int]:
+    """(timescale, duration) from an mvhd/mdhd full box"""
+    if data[start] == 1:
+        return struct.unpack_from(">IQ", data, start + 20)
+    return struct.unpack_from(">II", data, start + 12)
+
+
+def _parse_tkhd(data: bytes, start: int, track: dict):
+    matrix_offset = start + (52 if data[start] == 1 else 40)
+    a, b = struct.unpack_from(">ii", data, matrix_offset)
+    if a or b:
+        track["rotation"] = round(math.degrees(math.atan2(b, a))) % 360
+
+
+def _esds_object_type(data: bytes, start: int, end: int) -> Optional[int]:
+    """objectTypeIndication from an esds box (AAC vs MP3 in an mp4a sample entry)"""
+
+    def read_descriptor(pos: int) -> tuple[int, int]:
+        tag = data[pos]
+        pos += 1
+        for _ in range(4):  # Expandable length: up to 4 bytes, high bit = more
+            more = data[pos] & 0x80
+            pos += 1
+            if not more:
+                break
+        return tag, pos
+
+    try:
+        tag, pos = read_descriptor(start + 4)
+        if tag != 0x03:
+            return None
+        flags = data[pos + 2]
+        pos += 3
+        if flags & 0x80:  # streamDependenceFlag
+            pos += 2
+        if flags & 0x40:  # URL_Flag
+            pos += 1 + data[pos]
+        if flags & 0x20:  # OCRstreamFlag
+            pos += 2
+        tag, pos = read_descriptor(pos)
+        if tag != 0x04 or pos >= end:
+            return None
+        return data[pos]
+    except IndexError:
+        return None
+
+
+def _parse_stsd(data: bytes, start: int, end: int, track: dict):
+    """Codec, dimensions / audio format from the first sample entry"""
+    entry = start + 8
+    if entry + 8 > end:
+        return
+    entry_size, fourcc_bytes = struct.unpack_from(">I4s", data, entry)
+    entry_end = min(entry + entry_size, end)
+    body = entry + 8
+    fourcc = fourcc_bytes.decode("latin-1")
+    track["fourcc"] = fourcc
+    track["codec"] = CODEC_NAMES.get(fourcc)
+
+    if track["type"] == "video" and body + 78 <= entry_end:
+        track["width"], track["height"] = struct.unpack_from(">HH", data, body + 24)
+        for box_type, child_start, child_end in _iter_boxes(data, body + 78, entry_end):
+            if box_type == b"avcC" and child_start + 2 <= child_end:
+                track["profile"] = data[child_start + 1]
+                if track["profile"] in H264_YUV420P_PROFILES:
+                    track["pixel_format"] = "yuv420p"
+    elif track["type"] == "audio" and body + 28 <= entry_end:
+        version = struct.unpack_from(">H", data, body + 8)[0]
+        track["channels"] = struct.unpack_from(">H", data, body + 16)[0]
+        track["sample_rate"] = struct.unpack_from(">I", data, body + 24)[0] >> 16
+        children = body + {0: 28, 1: 44, 2: 64}.get(version, 28)
+        if fourcc == "mp4a" and children < entry_end:
+            for box_type, child_start, child_end in _iter_boxes(data, children, entry_end):
+                if box_type == b"esds" and _esds_object_type(data, child_start, child_end) in MP3_OBJECT_TYPES:
+                    track["codec"] = "mp3"
+
+
+def _parse_trak(data: bytes, start: int, end: int) -> dict:
+    track = {
+        "type": None, "codec": None, "fourcc": None, "duration": None, "width": None, "height": None,
+        "rotation": 0, "frame_rate": None, "sample_count": None, "pixel_format": None,
+        "profile": None, "sample_rate": None, "channels": None,
+    }
+    timescale = media_duration = None
+    stsd = None
+
+    stack = [(start, end)]
+    while stack:
+        for box_type, child_start, child_end in _iter_boxes(data, *stack.pop()):
+            if box_type in CONTAINER_BOXES:
+                stack.append((child_start, child_end))
+            elif box_type == b"tkhd":
+                _parse_tkhd(data, child_start, track)
+            elif box_type == b"mdhd":
+                timescale, media_duration = _parse_time_header(data, child_start)
+            elif box_type == b"hdlr":
+                handler = data[child_start + 8:child_start + 12].decode("latin-1")
+                track["type"] = HANDLER_TYPES.get(handler, handler)
+            elif box_type == b"stsd":
+                stsd = (child_start, child_end)  # Parsed once the handler type is known
+            elif box_type == b"stts":
+                entry_count = struct.unpack_from(">I", data, child_start + 4)[0]
+                entry_count = min(entry_count, (child_end - child_start - 8) // 8)
+                track["sample_count"] = sum(
+                    struct.unpack_from(">I", data, child_start + 8 + index * 8)[0]
+                    for index in range(entry_count)
+                )
+
+    if stsd:
+        _parse_stsd(data, *stsd, track)
+    if timescale and media_duration:
+        track["duration"] = media_duration / timescale
+        if track["type"] == "video" and track["sample_count"]:
+            track["frame_rate"] = track["sample_count"] / track["duration"]
+    return track
+
+
+def _parse_moov(data: bytes, info: dict):
+    for box_type, child_start, child_end in _iter_boxes(data, 0, len(data)):
+        if box_type == b"mvhd":
+            timescale, duration = _parse_time_header(data, child_start)
+            if timescale and duration:
+                info["duration"] = duration / timescale
+        elif box_type == b"trak":
+            info["tracks"].append(_parse_trak(data, child_start, child_end))
+        elif box_type == b"mvex":
+            info["fragmented"] = True
+
+
+def parse_mp4(source: Union[str, Path, BinaryIO]) -> dict:
+    """
+    Parse MP4/MOV structure from a path or a seekable binary file object
+
+    Returns:
+        Dict with brand, boxes (top-level box order), faststart (moov before mdat),
+        moov_size, truncated (last box runs past end of file), fragmented,
+        duration (seconds) and tracks (type, codec, width, height, rotation,
+        frame_rate, pixel_format, sample_rate, channels, ...)
+
+    Raises:
+        Mp4ParseError: Not an MP4/MOV, or a malformed moov
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return parse_mp4(f)
+
+    f = source
+    f.seek(0, 2)
+    file_size = f.tell()
+    info = {
+        "brand": None,
+        "boxes": [],
+        "faststart": False,
+        "moov_size": None,
+        "truncated": False,
+        "fragmented": False,
+        "duration": None,
+        "tracks": [],
+    }
+
+    offset = 0
+    while offset + 8 <= file_size and len(info["boxes"]) < MAX_TOP_LEVEL_BOXES:
+        f.seek(offset)
+        header = f.read(16)
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                info["truncated"] = True
+                break
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if offset == 0 and box_type not in FIRST_BOX_TYPES:
+            raise Mp4ParseError(f"Not an MP4/MOV file (first box {box_type!r})")
+        if size < header_size:
+            raise Mp4ParseError(f"Invalid {box_type!r} box size {size} at offset {offset}")
+
+        info["boxes"].append(box_type.decode("latin-1"))
+        if offset + size > file_size:
+            info["truncated"] = True
+
+        if box_type == b"ftyp" and header_size == 8 and len(header) >= 12:
+            info["brand"] = header[8:12].decode("latin-1").strip()
+        elif box_type == b"moov" and info["moov_size"] is None:
+            info["moov_size"] = size
+            info["faststart"] = "mdat" not in info["boxes"]
+            if info["truncated"]:
+                break
+            if size > MAX_MOOV_SIZE:
+                raise Mp4ParseError(f"moov box too large ({size} bytes)")
+            f.seek(offset + header_size)
+            try:
+                _parse_moov(f.read(size - header_size), info)
+            except (struct.error, IndexError) as e:
+                raise Mp4ParseError(f"Malformed moov box: {e}") from e
+        elif box_type == b"moof":
+            info["fragmented"] = True
+
+        if info["truncated"]:
+            break
+        offset += size
+
+    return info
@@ -0,0 +1,167 @@
+"""
+Partition maintenance for the monthly-partitioned event tables
+(views, visitor_logs, share_clicks, ad_clicks - see database/migrations/009_partition_event_tables.sql)
+
+A periodic job that, per table:
+- pre-creates the partitions for the current month and the next months_ahead months, so
+  inserts never land in the {table}_default partition
+- detaches (and by default drops) monthly partitions that lie entirely before the
+  table's retention window. Dropping a partition is a metadata operation: no DELETE,
+  no dead tuples, no VACUUM.
+
+Each table is handled in its own transaction under a transaction-scoped advisory lock,
+so every API process can run the job without stepping on each other. Tables that are
+not partitioned (migration 009 not applied) are skipped.
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+ADVISORY_LOCK_KEY = 7_048_001  # pg_try_advisory_xact_lock(key, hashtext(table))
+
+# Partitioned event tables -> partition key column
+PARTITIONED_TABLES = {
+    "views": "created_at",
+    "visitor_logs": "visited_at",
+    "share_clicks": "clicked_at",
+    "ad_clicks": "clicked_at",
+}
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class PartitionMaintenanceJob:
+    """Create future monthly partitions and expire old ones"""
+
+    def __init__(self, interval: float, months_ahead: int, retention_months: dict, detach_only: bool):
+        self.interval = interval
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months  # table -> months to keep (0 = forever)
+        self.detach_only = detach_only
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"runs": 0, "created": 0, "detached": 0, "dropped": 0, "failed": 0, "last_run": None}
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="partition-maintenance")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        today = datetime.now(timezone.utc).date()
+        for table in PARTITIONED_TABLES:
+            try:
+                await self.maintain_table(table, today)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"Partition maintenance for {table} failed: {e}")
+        self.stats["runs"] += 1
+        self.stats["last_run"] = datetime.now(timezone.utc).isoformat()
+
+    async def maintain_table(self, table: str, today: date):
+        from app.core.database import AsyncSessionLocal
+
+        current_month = today.replace(day=1)
+        async with AsyncSessionLocal() as db:
+            partitioned = await db.execute(
+                text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+                {"table": table},
+            )
+            if partitioned.scalar() is None:
+                return
+
+            locked = await db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key, hashtext(:table))"),
+                {"key": ADVISORY_LOCK_KEY, "table": table},
+            )
+            if not locked.scalar():
+                return
+
+            created = await db.execute(
+                text("SELECT create_monthly_partitions(:table, :from_month, :to_month)"),
+                {"table": table, "from_month": current_month, "to_month": add_months(current_month, self.months_ahead)},
+            )
+            created = created.scalar() or 0
+            if created:
+                logger.info(f"Created {created} partition(s) of {table}")
+            self.stats["created"] += created
+
+            retention = self.retention_months.get(table, 0)
+            if retention > 0:
+                # Keep every partition that overlaps [current month - retention + 1, ...)
+                oldest_kept = add_months(current_month, -(retention - 1))
+                for name in await self._expired_partitions(db, table, oldest_kept):
+                    await db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                    self.stats["detached"] += 1
+                    if not self.detach_only:
+                        await db.execute(text(f'DROP TABLE "{name}"'))
+                        self.stats["dropped"] += 1
+                    logger.info(f"{'Detached' if self.detach_only else 'Dropped'} expired partition {name}")
+
+            await db.commit()
+
+    async def _expired_partitions(self, db, table: str, oldest_kept: date) -> list[str]:
+        """Monthly partitions ({table}_pYYYYMM) of months before oldest_kept"""
+        result = await db.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(:table)"
+            ),
+            {"table": table},
+        )
+        pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+        expired = []
+        for name in result.scalars().all():
+            match = pattern.match(name)
+            if match and date(int(match.group(1)), int(match.group(2)), 1) < oldest_kept:
+                expired.append(name)
+        return sorted(expired)
+
+
+_partition_maintenance_job: Optional[PartitionMaintenanceJob] = None
+
+
+def get_partition_maintenance_job() -> PartitionMaintenanceJob:
+    """Get or create the global partition maintenance job (started on app startup)"""
+    global _partition_maintenance_job
+    if _partition_maintenance_job is None:
+        from app.core.config import settings
+        _partition_maintenance_job = PartitionMaintenanceJob(
+            interval=settings.PARTITION_MAINTENANCE_INTERVAL,
+            months_ahead=settings.PARTITION_MONTHS_AHEAD,
+            retention_months={
+                "views": settings.VIEWS_RETENTION_MONTHS,
+                "visitor_logs": settings.VISITOR_LOG_RETENTION_MONTHS,
+                "share_clicks": settings.SHARE_CLICK_RETENTION_MONTHS,
+                "ad_clicks": settings.AD_CLICK_RETENTION_MONTHS,
+            },
+            detach_only=settings.PARTITION_RETENTION_DETACH_ONLY,
+        )
+    return _partition_maintenance_job
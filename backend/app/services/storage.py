@@ -1,13 +1,65 @@
 """
-Storage service for handling local file operations
+Storage service for deleting video files
+Processed files live on the local uploads volume or in an S3-compatible bucket
+(STORAGE_BACKEND); originals and temp files are always local.
+
+Processed files are sharded by a hash of the video id: processed/ab/cd/{video_id}/.
+Deletion removes exactly those directories (derived from the id and the URLs stored
+on the video row) instead of scanning the processed tree.
 """
 from pathlib import Path
+from urllib.parse import urlparse
+import hashlib
+import re
 import shutil
 
+from app.core.config import settings
+
+PROCESSED_DIR = Path("/app/uploads/processed")
+
+# Must match the video worker (video_worker/storage.py)
+SHARD_LEVELS = 2
+SHARD_PATTERN = re.compile(r"^[0-9a-f]{2}$")
+
+
+def video_key_prefix(video_id: str) -> str:
+    """Storage key prefix for a video's processed files: "ab/cd/{video_id}" """
+    video_id = str(video_id).lower()
+    digest = hashlib.sha1(video_id.encode()).hexdigest()
+    shards = [digest[level * 2:level * 2 + 2] for level in range(SHARD_LEVELS)]
+    return "/".join([*shards, video_id])
+
+
+def resolve_video_key_prefixes(video_id: str, video_urls: dict) -> list[str]:
+    """
+    Key prefixes that may hold a video's processed files
+    
+    Always includes the sharded prefix for the id; stored URLs add the prefix they
+    actually point at (e.g. "{video_id}" for videos not yet migrated to the sharded layout).
+    """
+    video_id = str(video_id).lower()
+    prefixes = [video_key_prefix(video_id)]
+    for url in video_urls.values():
+        if not url:
+            continue
+        parts = urlparse(url).path.split("/")
+        if video_id not in parts:
+            continue
+        index = parts.index(video_id)
+        shards = parts[max(index - SHARD_LEVELS, 0):index]
+        if len(shards) != SHARD_LEVELS or not all(SHARD_PATTERN.match(shard) for shard in shards):
+            shards = []
+        prefix = "/".join([*shards, video_id])
+        if prefix not in prefixes:
+            prefixes.append(prefix)
+    return prefixes
+
 
 class StorageService:
     """Service for managing video files in local storage"""
     
+    mode = "local"
+    
     def delete_local_file(self, file_path: Path) -> bool:
         """Delete a local file"""
         try:
@@ -18,23 +70,16 @@ class StorageService:
             print(f"Error deleting local file {file_path}: {e}")
         return False
     
-    def delete_local_files_by_pattern(self, directory: Path, pattern: str) -> int:
-        """Delete all files matching a pattern in a directory"""
-        deleted_count = 0
-        try:
-            if not directory.exists():
-                return 0
-            
-            for file_path in directory.glob(pattern):
-                if file_path.is_file():
-                    try:
-                        file_path.unlink()
-                        deleted_count += 1
-                    except Exception as e:
-                        print(f"Error deleting {file_path}: {e}")
-        except Exception as e:
-            print(f"Error deleting local files by pattern: {e}")
-        return deleted_count
+    def delete_processed_files(self, video_id: str, video_urls: dict, results: dict):
+        """Delete a video's processed directories from the uploads volume"""
+        for key_prefix in resolve_video_key_prefixes(video_id, video_urls):
+            video_dir = PROCESSED_DIR / key_prefix
+            if video_dir.is_dir():
+                try:
+                    shutil.rmtree(video_dir)
+                    results["deleted_files"].append(f"processed/{key_prefix}/")
+                except Exception as e:
+                    results["failed_files"].append(f"processed/{key_prefix}/: {e}")
     
     def delete_video_files(self, video_id: str, video_urls: dict) -> dict:
         """
@@ -42,7 +87,7 @@ class StorageService:
         
         Args:
             video_id: UUID of the video
-            video_urls: Dict with keys like 'url_mp4', 'thumbnail'
+            video_urls: Dict with keys like 'url_mp4', 'thumbnail', 'url_hls' (from the video row)
         
         Returns:
             Dict with deletion results
@@ -50,26 +95,11 @@ class StorageService:
         results = {
             "deleted_files": [],
             "failed_files": [],
-            "mode": "local"
+            "mode": self.mode
         }
         
-        # Delete processed files (MP4, thumbnails)
-        processed_dir = Path("/app/uploads/processed")
-        if processed_dir.exists():
-            # Delete entire video directory if it exists
-            video_dir = processed_dir / video_id
-            if video_dir.exists() and video_dir.is_dir():
-                try:
-                    shutil.rmtree(video_dir, ignore_errors=True)
-                    results["deleted_files"].append(f"processed/{video_id}/")
-                except Exception as e:
-                    results["failed_files"].append(f"processed/{video_id}/: {e}")
-            
-            # Also try pattern matching as fallback
-            pattern = f"*{video_id}*"
-            deleted_count = self.delete_local_files_by_pattern(processed_dir, pattern)
-            if deleted_count > 0:
-                results["deleted_files"].append(f"{pattern} ({deleted_count} files)")
+        # Delete processed files (MP4, thumbnails, HLS)
+        self.delete_processed_files(video_id, video_urls, results)
         
         # Delete original uploaded file
         originals_dir = Path("/app/uploads/originals")
@@ -94,5 +124,65 @@ class StorageService:
         return results
 
 
+class S3StorageService(StorageService):
+    """Service for managing video files with processed files in an S3-compatible bucket"""
+    
+    mode = "s3"
+    
+    def __init__(self):
+        import boto3
+        from botocore.config import Config
+        
+        if not settings.S3_BUCKET:
+            raise ValueError("S3_BUCKET is required when STORAGE_BACKEND=s3")
+        
+        self.bucket = settings.S3_BUCKET
+        self.prefix = settings.S3_PREFIX.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": "path" if settings.S3_ENDPOINT_URL else "auto"},
+                retries={"max_attempts": 5, "mode": "standard"},
+            ),
+        )
+    
+    def delete_processed_files(self, video_id: str, video_urls: dict, results: dict):
+        """Delete every object under {S3_PREFIX}/ab/cd/{video_id}/ (and any prefix the stored URLs point at)"""
+        for video_prefix in resolve_video_key_prefixes(video_id, video_urls):
+            key_prefix = f"{self.prefix}/{video_prefix}/" if self.prefix else f"{video_prefix}/"
+            try:
+                deleted_count = 0
+                paginator = self.client.get_paginator("list_objects_v2")
+                for page in paginator.paginate(Bucket=self.bucket, Prefix=key_prefix):
+                    # Pages hold at most 1000 keys, the delete_objects limit
+                    objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+                    if objects:
+                        response = self.client.delete_objects(
+                            Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True}
+                        )
+                        deleted_count += len(objects) - len(response.get("Errors", []))
+                        for error in response.get("Errors", []):
+                            results["failed_files"].append(f"s3://{self.bucket}/{error.get('Key')}: {error.get('Message')}")
+                if deleted_count > 0:
+                    results["deleted_files"].append(f"s3://{self.bucket}/{key_prefix} ({deleted_count} objects)")
+            except Exception as e:
+                results["failed_files"].append(f"s3://{self.bucket}/{key_prefix}: {e}")
+
+
+def create_storage_service() -> StorageService:
+    """Create the storage service for the configured STORAGE_BACKEND"""
+    backend = settings.STORAGE_BACKEND.lower()
+    if backend == "s3":
+        return S3StorageService()
+    if backend == "local":
+        return StorageService()
+    raise ValueError(f"Invalid STORAGE_BACKEND: {settings.STORAGE_BACKEND} (expected 'local' or 's3')")
+
+
 # Global instance
-storage_service = StorageService()
+storage_service = create_storage_service()
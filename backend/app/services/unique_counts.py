@@ -0,0 +1,148 @@
+"""
+Unique counts (visitors, clickers) as Redis HyperLogLogs, updated at ingest
+Every event PFADDs its id (session id, user id, ...) into one sketch per UTC day and
+one all-time sketch, for the whole site and for the event's video. A distinct count
+over any window is then a single PFCOUNT over the day keys (at most one key per day)
+instead of a COUNT(DISTINCT ...) over the raw event table. Estimates have ~0.8% error.
+
+Windows are day-granular: a window starting mid-day counts the whole first day.
+
+Sketches only know about events ingested since they were introduced. A metric is served
+from Redis once scripts/backfill_unique_counts.py has loaded its history and set the
+ready marker; until then (or if Redis is down or was flushed, or the window is older
+than the retention) count() returns None and callers fall back to SQL.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional, Union
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Metrics
+VISITORS = "visitors"  # visitor_logs.session_id
+SHARE_CLICKERS = "share_clickers"  # share_clicks.clicker_session_id
+SHARE_LINKS_CLICKED = "share_links_clicked"  # share_clicks.share_link_id
+AD_CLICKERS = "ad_clickers"  # ad_clicks.clicker_session_id
+AD_USERS = "ad_users"  # ad_clicks.user_id
+
+KEY_PREFIX = "hll:"
+ALL_TIME = "all"
+SITE_SCOPE = "site"
+
+Member = Union[uuid.UUID, str]
+VideoId = Optional[Union[uuid.UUID, str]]
+
+
+def _key(metric: str, scope: str, day: str) -> str:
+    return f"{KEY_PREFIX}{metric}:{scope}:{day}"
+
+
+def _ready_key(metric: str) -> str:
+    return f"{KEY_PREFIX}{metric}:ready"
+
+
+def _video_scope(video_id: Union[uuid.UUID, str]) -> str:
+    try:
+        return f"video:{uuid.UUID(str(video_id))}"
+    except ValueError:
+        return f"video:{video_id}"
+
+
+def _scopes(video_id: VideoId) -> tuple:
+    return (SITE_SCOPE, _video_scope(video_id)) if video_id else (SITE_SCOPE,)
+
+
+def _day(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%d")
+
+
+class UniqueCounter:
+    """Per-day and all-time HyperLogLog sketches in Redis"""
+
+    def __init__(self, retention_days: int):
+        self.retention_days = retention_days
+
+    async def add(self, metric: str, member: Optional[Member], video_id: VideoId = None, at: Optional[datetime] = None):
+        await self.add_many(metric, [(member, video_id, at)])
+
+    async def add_many(self, metric: str, events: Iterable[tuple]):
+        """
+        Add (member, video_id, at) events; at=None means now. Events without a member are
+        skipped (like COUNT(DISTINCT) skips NULLs). Never raises: a lost update only makes
+        the estimate slightly low.
+        """
+        now = datetime.now(timezone.utc)
+        members_by_key = defaultdict(set)
+        for member, video_id, at in events:
+            if member is None:
+                continue
+            day = _day(at or now)
+            for scope in _scopes(video_id):
+                members_by_key[_key(metric, scope, day)].add(str(member))
+                members_by_key[_key(metric, scope, ALL_TIME)].add(str(member))
+        if not members_by_key:
+            return
+
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            ttl = int(timedelta(days=self.retention_days + 1).total_seconds())
+            for key, members in members_by_key.items():
+                pipe.pfadd(key, *members)
+                if not key.endswith(ALL_TIME):
+                    pipe.expire(key, ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Unique count update for {metric} failed: {e}")
+
+    async def count(
+        self,
+        metric: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        video_id: VideoId = None,
+    ) -> Optional[int]:
+        """
+        Estimated distinct members between start and end (all time if start is None)
+
+        Returns None if the sketches cannot answer; fall back to COUNT(DISTINCT ...).
+        """
+        scope = _video_scope(video_id) if video_id else SITE_SCOPE
+        if start is None:
+            keys = [_key(metric, scope, ALL_TIME)]
+        else:
+            now = datetime.now(timezone.utc)
+            end = end or now
+            if now - start > timedelta(days=self.retention_days):
+                # Older day sketches have expired
+                return None
+            day = start.astimezone(timezone.utc).date() if start.tzinfo else start.date()
+            last = end.astimezone(timezone.utc).date() if end.tzinfo else end.date()
+            keys = []
+            while day <= last:
+                keys.append(_key(metric, scope, day.strftime("%Y%m%d")))
+                day += timedelta(days=1)
+
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.exists(_ready_key(metric))
+            pipe.pfcount(*keys)
+            ready, estimate = await pipe.execute()
+        except Exception as e:
+            logger.debug(f"Unique count for {metric} unavailable: {e}")
+            return None
+        return estimate if ready else None
+
+    async def mark_ready(self, metric: str):
+        """Called once a metric's history has been backfilled"""
+        await get_redis().set(_ready_key(metric), datetime.now(timezone.utc).isoformat())
+
+
+# Global instance
+unique_counter = UniqueCounter(retention_days=settings.UNIQUE_COUNT_RETENTION_DAYS)
@@ -0,0 +1,133 @@
+"""
+Authenticated-user cache
+Keeps the fields auth checks need (id, username, is_active, is_admin) so get_current_user
+does not query the users table on every request.
+
+Two tiers:
+- In-process LRU with a short TTL (no network hop, bounded staleness per process)
+- Shared Redis tier with a longer TTL (one DB lookup per user across all API processes)
+
+Writes that change these fields (admin PATCH /users/{id}, logout) call invalidate(),
+which clears this process and Redis; other processes pick the change up within
+AUTH_USER_CACHE_TTL seconds.
+"""
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional, Union
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "auth_user:"
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Authenticated principal returned by get_current_user
+
+    Has the User attributes endpoints read from current_user. Endpoints that need
+    other columns (email, created_at, ...) load the User row themselves.
+    """
+    id: uuid.UUID
+    username: str
+    is_active: bool
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user) -> "CachedUser":
+        return cls(id=user.id, username=user.username, is_active=bool(user.is_active), is_admin=bool(user.is_admin))
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "id": str(self.id)})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedUser":
+        data = json.loads(raw)
+        return cls(
+            id=uuid.UUID(data["id"]),
+            username=data["username"],
+            is_active=data["is_active"],
+            is_admin=data["is_admin"],
+        )
+
+
+class UserCache:
+    """LRU + TTL cache of CachedUser by user id, backed by Redis"""
+
+    def __init__(self, max_size: int, ttl: float, redis_ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self._entries: "OrderedDict[str, tuple[float, CachedUser]]" = OrderedDict()
+        self.stats = {"hits": 0, "redis_hits": 0, "misses": 0}
+
+    async def get(self, user_id: str) -> Optional[CachedUser]:
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, cached = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
+            del self._entries[key]
+
+        if self.redis_ttl > 0:
+            try:
+                raw = await get_redis().get(REDIS_KEY_PREFIX + key)
+            except Exception as e:
+                # Redis down: fall through to the database
+                logger.debug(f"User cache Redis get failed: {e}")
+                raw = None
+            if raw:
+                try:
+                    cached = CachedUser.from_json(raw)
+                except (ValueError, KeyError, TypeError):
+                    cached = None
+                if cached is not None:
+                    self._store_local(key, cached)
+                    self.stats["redis_hits"] += 1
+                    return cached
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, cached: CachedUser):
+        key = str(cached.id)
+        self._store_local(key, cached)
+        if self.redis_ttl > 0:
+            try:
+                await get_redis().set(REDIS_KEY_PREFIX + key, cached.to_json(), ex=self.redis_ttl)
+            except Exception as e:
+                logger.debug(f"User cache Redis set failed: {e}")
+
+    async def invalidate(self, user_id: Union[str, uuid.UUID]):
+        key = str(user_id)
+        self._entries.pop(key, None)
+        try:
+            await get_redis().delete(REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"Could not invalidate cached user {key} in Redis: {e}")
+
+    def _store_local(self, key: str, cached: CachedUser):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, cached)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+# Global instance
+user_cache = UserCache(
+    max_size=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL,
+    redis_ttl=settings.AUTH_USER_CACHE_REDIS_TTL,
+)
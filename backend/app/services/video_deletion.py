@@ -3,6 +3,7 @@ Comprehensive video deletion service
 """
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import delete
+import asyncio
 import logging
 
 from app.models.video import Video
@@ -48,6 +49,7 @@ class VideoDeletionService:
         video_urls = {
             "url_mp4": video.url_mp4,
             "thumbnail": video.thumbnail,
+            "url_hls": video.url_hls,
         }
         
         # 2. Handle reports (mark as resolved)
@@ -61,9 +63,9 @@ class VideoDeletionService:
         if cancel_tasks:
             result["tasks_cancelled"] = True
         
-        # 4. Delete storage files
+        # 4. Delete storage files (blocking filesystem/S3 calls - run off the event loop)
         try:
-            storage_results = storage_service.delete_video_files(video_id, video_urls)
+            storage_results = await asyncio.to_thread(storage_service.delete_video_files, video_id, video_urls)
             result["storage_deleted"] = True
             result["storage_details"] = storage_results
         except Exception as e:
@@ -0,0 +1,429 @@
+"""
+Hourly and daily visitor analytics rollups
+A background job folds completed hours of visitor_logs into visitor_hourly_rollups:
+one row per (hour, country, city, lat/long bucket, url) with the visit count and a
+HyperLogLog sketch of the session ids. Once a UTC day is fully rolled up, its hourly
+rows are merged into visitor_daily_rollups (same dimensions, one row per day).
+
+Analytics read whole days from the daily rollups, the remaining rolled-up hours from
+the hourly rollups and only aggregate raw visitor_logs after the hourly watermark
+(normally the current partial hour). Visit counts are grouped, ranked and limited in
+SQL; sketches are fetched and merged only for the groups that are returned.
+
+Every API process runs the job; a transaction-scoped advisory lock makes sure only one
+of them rolls up at a time. Each run replaces the rollup rows of the hours (and days)
+it covers and moves the watermarks in the same transaction, so a crashed run is simply
+redone.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy import LargeBinary, and_, delete, func, insert, null, or_, select, text, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.visitor_log import VisitorLog
+from app.models.visitor_rollup import AnalyticsRollupWatermark, VisitorDailyRollup, VisitorHourlyRollup
+from app.services.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "visitor_hourly"
+DAILY_WATERMARK_NAME = "visitor_daily"
+ADVISORY_LOCK_KEY = 7_046_001  # pg_try_advisory_xact_lock key for the visitor rollup job
+INSERT_CHUNK_SIZE = 1000
+
+# Rollup dimensions (columns shared by visitor_hourly_rollups and visitor_daily_rollups)
+DIMENSIONS = ("country", "country_name", "city", "latitude", "longitude", "url_id")
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_day(value: datetime) -> datetime:
+    day = floor_day(value)
+    return day if day == value else day + timedelta(days=1)
+
+
+@dataclass
+class VisitorGroup:
+    """Visits of one group (key = values of the requested dimensions)"""
+    key: tuple
+    visits: int
+    unique_visitors: int
+    visitors: HyperLogLog  # Merged sketch of session_id
+
+
+async def get_watermark(db: AsyncSession, name: str = WATERMARK_NAME) -> Optional[datetime]:
+    result = await db.execute(
+        select(AnalyticsRollupWatermark.rolled_up_until).where(AnalyticsRollupWatermark.name == name)
+    )
+    return result.scalar()
+
+
+def _raw_aggregate_query(start: datetime, end: Optional[datetime], coord_precision: int, located_only: bool = False):
+    """visitor_logs grouped by the rollup dimensions, with the distinct session ids per group"""
+    hour = func.date_trunc('hour', VisitorLog.visited_at).label('hour')
+    latitude = func.round(VisitorLog.latitude, coord_precision).label('latitude')
+    longitude = func.round(VisitorLog.longitude, coord_precision).label('longitude')
+    conditions = [VisitorLog.visited_at >= start]
+    if end is not None:
+        conditions.append(VisitorLog.visited_at < end)
+    if located_only:
+        conditions += [VisitorLog.latitude.isnot(None), VisitorLog.longitude.isnot(None)]
+    return select(
+        hour,
+        VisitorLog.country,
+        VisitorLog.country_name,
+        VisitorLog.city,
+        latitude,
+        longitude,
+        VisitorLog.url_id,
+        func.count(VisitorLog.id).label('visit_count'),
+        func.array_agg(func.distinct(VisitorLog.session_id)).label('session_ids'),
+    ).where(and_(*conditions)).group_by(
+        hour,
+        VisitorLog.country,
+        VisitorLog.country_name,
+        VisitorLog.city,
+        latitude,
+        longitude,
+        VisitorLog.url_id,
+    )
+
+
+def _visit_source(
+    since: datetime,
+    hourly_watermark: Optional[datetime],
+    daily_watermark: Optional[datetime],
+    coord_precision: int,
+    located_only: bool,
+):
+    """
+    All visits since `since` as one subquery:
+    (date, *DIMENSIONS, visit_count, visitors sketch | NULL, session_ids | NULL)
+
+    Rolled-up hours are read at hour granularity, so the first hour is included whole.
+    """
+    start_hour = floor_hour(since)
+    no_sketch = null().cast(LargeBinary).label('visitors')
+    no_session_ids = null().cast(ARRAY(UUID(as_uuid=True))).label('session_ids')
+    parts = []
+    tail_start = since
+
+    if hourly_watermark is not None and hourly_watermark > start_hour:
+        tail_start = max(hourly_watermark, since)
+        days_start = ceil_day(start_hour)
+        days_end = days_start
+        if daily_watermark is not None:
+            days_end = max(days_start, min(daily_watermark, hourly_watermark))
+
+        hourly_conditions = [VisitorHourlyRollup.hour >= start_hour, VisitorHourlyRollup.hour < hourly_watermark]
+        if days_end > days_start:
+            daily_conditions = [VisitorDailyRollup.day >= days_start.date(), VisitorDailyRollup.day < days_end.date()]
+            if located_only:
+                daily_conditions += [VisitorDailyRollup.latitude.isnot(None), VisitorDailyRollup.longitude.isnot(None)]
+            parts.append(
+                select(
+                    VisitorDailyRollup.day.label('date'),
+                    *[getattr(VisitorDailyRollup, name) for name in DIMENSIONS],
+                    VisitorDailyRollup.visit_count,
+                    VisitorDailyRollup.visitors,
+                    no_session_ids,
+                ).where(and_(*daily_conditions))
+            )
+            hourly_conditions.append(or_(VisitorHourlyRollup.hour < days_start, VisitorHourlyRollup.hour >= days_end))
+        if located_only:
+            hourly_conditions += [VisitorHourlyRollup.latitude.isnot(None), VisitorHourlyRollup.longitude.isnot(None)]
+        parts.append(
+            select(
+                func.date(func.timezone('UTC', VisitorHourlyRollup.hour)).label('date'),
+                *[getattr(VisitorHourlyRollup, name) for name in DIMENSIONS],
+                VisitorHourlyRollup.visit_count,
+                VisitorHourlyRollup.visitors,
+                no_session_ids,
+            ).where(and_(*hourly_conditions))
+        )
+
+    raw = _raw_aggregate_query(tail_start, None, coord_precision, located_only).subquery()
+    parts.append(
+        select(
+            func.date(func.timezone('UTC', raw.c.hour)).label('date'),
+            *[raw.c[name] for name in DIMENSIONS],
+            raw.c.visit_count,
+            no_sketch,
+            raw.c.session_ids,
+        )
+    )
+    return union_all(*parts).subquery('visit_source')
+
+
+def _merge_group_sketches(groups: dict, rows: list, width: int) -> list[VisitorGroup]:
+    sketches = {key: HyperLogLog() for key in groups}
+    for row in rows:
+        sketch = sketches.get(tuple(row[:width]))
+        if sketch is None:
+            continue
+        if row.visitors is not None:
+            sketch.merge(row.visitors)
+        if row.session_ids:
+            sketch.update(row.session_ids)
+    return [
+        VisitorGroup(key=key, visits=visits, unique_visitors=sketches[key].count(), visitors=sketches[key])
+        for key, visits in groups.items()
+    ]
+
+
+async def load_visitor_groups(
+    db: AsyncSession,
+    since: datetime,
+    coord_precision: int,
+    dimensions: Sequence[str],
+    limit: Optional[int] = None,
+    min_visits: int = 1,
+    located_only: bool = False,
+    with_visitors: bool = True,
+) -> list[VisitorGroup]:
+    """
+    Visits since `since` grouped by `dimensions` ("date" and/or DIMENSIONS), busiest first
+
+    Visit counts are summed, filtered (min_visits) and ranked (limit) in SQL. Unique
+    visitor sketches are then fetched and merged only for the returned groups (skipped
+    with with_visitors=False; unique_visitors is 0). Groups whose first dimension is
+    NULL are skipped.
+    """
+    hourly_watermark = await get_watermark(db)
+    daily_watermark = await get_watermark(db, DAILY_WATERMARK_NAME)
+    source = _visit_source(since, hourly_watermark, daily_watermark, coord_precision, located_only)
+    columns = [source.c[name] for name in dimensions]
+    visits = func.sum(source.c.visit_count)
+
+    query = select(*columns, visits.label('visits')).where(columns[0].isnot(None)).group_by(
+        *columns
+    ).having(visits >= min_visits).order_by(visits.desc(), *columns)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    groups = {tuple(row[:-1]): int(row.visits) for row in result.all()}
+    if not groups:
+        return []
+    if not with_visitors:
+        return [VisitorGroup(key=key, visits=count, unique_visitors=0, visitors=HyperLogLog()) for key, count in groups.items()]
+
+    sketch_query = select(*columns, source.c.visitors, source.c.session_ids)
+    if limit is not None:
+        # Coarse filter on the first dimension; exact keys are matched while merging
+        sketch_query = sketch_query.where(columns[0].in_(list({key[0] for key in groups})))
+    else:
+        sketch_query = sketch_query.where(columns[0].isnot(None))
+    result = await db.execute(sketch_query)
+    # Sketch merging is CPU work; keep it off the event loop
+    return await asyncio.to_thread(_merge_group_sketches, groups, result.all(), len(columns))
+
+
+def _merge_daily_rows(rows: list) -> list[dict]:
+    """Merge hourly rollup rows into one row per (UTC day, dimensions)"""
+    visits = defaultdict(int)
+    sketches = defaultdict(HyperLogLog)
+    for row in rows:
+        key = (row.hour.astimezone(timezone.utc).date(), *(getattr(row, name) for name in DIMENSIONS))
+        visits[key] += row.visit_count
+        sketches[key].merge(row.visitors)
+    return [
+        {
+            "day": key[0],
+            **dict(zip(DIMENSIONS, key[1:])),
+            "visit_count": count,
+            "visitors": sketches[key].to_bytes(),
+        }
+        for key, count in visits.items()
+    ]
+
+
+class VisitorRollupJob:
+    """
+    Periodic, incremental visitor_logs -> visitor_hourly_rollups -> visitor_daily_rollups job
+
+    Only hours that ended more than grace_seconds ago are rolled up, so visits still
+    queued in the VisitorLogWriter land before their hour is closed. Catch-up (first run,
+    downtime) proceeds max_hours_per_run hours and one day per transaction.
+    """
+
+    def __init__(self, interval: float, grace_seconds: float, max_hours_per_run: int, coord_precision: int):
+        self.interval = interval
+        self.grace_seconds = grace_seconds
+        self.max_hours_per_run = max_hours_per_run
+        self.coord_precision = coord_precision
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "runs": 0,
+            "hours_rolled_up": 0,
+            "days_rolled_up": 0,
+            "rows_written": 0,
+            "failed": 0,
+            "rolled_up_until": None,
+        }
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="visitor-rollup-job")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+    async def _run(self):
+        while True:
+            try:
+                # Keep going while catching up; each call is one transaction
+                while await self.refresh():
+                    pass
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"Visitor rollup failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> int:
+        """
+        Roll up the next completed hours after the watermark, then the next completed day
+
+        Returns:
+            Number of hours and days rolled up (0 if up to date or another process holds the lock)
+        """
+        from app.core.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            locked = await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            if not locked.scalar():
+                return 0
+
+            now = datetime.now(timezone.utc)
+            watermark = await get_watermark(db)
+            if watermark is None:
+                first_visit = (await db.execute(select(func.min(VisitorLog.visited_at)))).scalar()
+                watermark = floor_hour(first_visit if first_visit is not None else now)
+
+            end = min(floor_hour(now - timedelta(seconds=self.grace_seconds)), watermark + timedelta(hours=self.max_hours_per_run))
+            if end <= watermark:
+                await self._set_watermark(db, watermark)
+                days = await self._roll_up_day(db, watermark)
+                await db.commit()
+                self._save_stats(watermark, 0, 0, days)
+                return days
+
+            result = await db.execute(_raw_aggregate_query(watermark, end, self.coord_precision))
+            rows = [
+                {
+                    "hour": row.hour,
+                    "country": row.country,
+                    "country_name": row.country_name,
+                    "city": row.city,
+                    "latitude": row.latitude,
+                    "longitude": row.longitude,
+                    "url_id": row.url_id,
+                    "visit_count": row.visit_count,
+                    "visitors": HyperLogLog(row.session_ids).to_bytes(),
+                }
+                for row in result.all()
+            ]
+
+            await db.execute(
+                delete(VisitorHourlyRollup).where(
+                    and_(VisitorHourlyRollup.hour >= watermark, VisitorHourlyRollup.hour < end)
+                )
+            )
+            for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                await db.execute(insert(VisitorHourlyRollup), rows[start:start + INSERT_CHUNK_SIZE])
+            await self._set_watermark(db, end)
+            days = await self._roll_up_day(db, end)
+            await db.commit()
+
+        hours = int((end - watermark).total_seconds() // 3600)
+        self._save_stats(end, hours, len(rows), days)
+        logger.debug(f"Rolled up {hours} hour(s) of visitor logs into {len(rows)} row(s), until {end.isoformat()}")
+        return hours + days
+
+    async def _roll_up_day(self, db: AsyncSession, hourly_watermark: datetime) -> int:
+        """
+        Merge the next fully rolled-up UTC day of hourly rollups into visitor_daily_rollups
+
+        Returns:
+            1 if a day was rolled up, 0 if the daily rollups are up to date
+        """
+        watermark = await get_watermark(db, DAILY_WATERMARK_NAME)
+        if watermark is None:
+            first_hour = (await db.execute(select(func.min(VisitorHourlyRollup.hour)))).scalar()
+            watermark = floor_day(first_hour if first_hour is not None else hourly_watermark)
+        end = watermark + timedelta(days=1)
+        if end > hourly_watermark:
+            await self._set_watermark(db, watermark, DAILY_WATERMARK_NAME)
+            return 0
+
+        result = await db.execute(
+            select(
+                VisitorHourlyRollup.hour,
+                *[getattr(VisitorHourlyRollup, name) for name in DIMENSIONS],
+                VisitorHourlyRollup.visit_count,
+                VisitorHourlyRollup.visitors,
+            ).where(and_(VisitorHourlyRollup.hour >= watermark, VisitorHourlyRollup.hour < end))
+        )
+        rows = await asyncio.to_thread(_merge_daily_rows, result.all())
+
+        await db.execute(delete(VisitorDailyRollup).where(VisitorDailyRollup.day == watermark.date()))
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            await db.execute(insert(VisitorDailyRollup), rows[start:start + INSERT_CHUNK_SIZE])
+        await self._set_watermark(db, end, DAILY_WATERMARK_NAME)
+        logger.debug(f"Rolled up visitor day {watermark.date().isoformat()} into {len(rows)} row(s)")
+        return 1
+
+    async def _set_watermark(self, db: AsyncSession, rolled_up_until: datetime, name: str = WATERMARK_NAME):
+        statement = pg_insert(AnalyticsRollupWatermark).values(name=name, rolled_up_until=rolled_up_until)
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[AnalyticsRollupWatermark.name],
+                set_={"rolled_up_until": statement.excluded.rolled_up_until, "updated_at": func.now()},
+            )
+        )
+
+    def _save_stats(self, rolled_up_until: datetime, hours: int, rows: int, days: int = 0):
+        self.stats["runs"] += 1
+        self.stats["hours_rolled_up"] += hours
+        self.stats["days_rolled_up"] += days
+        self.stats["rows_written"] += rows
+        self.stats["rolled_up_until"] = rolled_up_until.isoformat()
+
+
+_visitor_rollup_job: Optional[VisitorRollupJob] = None
+
+
+def get_visitor_rollup_job() -> VisitorRollupJob:
+    """Get or create the global visitor rollup job (started on app startup)"""
+    global _visitor_rollup_job
+    if _visitor_rollup_job is None:
+        from app.core.config import settings
+        _visitor_rollup_job = VisitorRollupJob(
+            interval=settings.VISITOR_ROLLUP_INTERVAL,
+            grace_seconds=settings.VISITOR_ROLLUP_GRACE_SECONDS,
+            max_hours_per_run=settings.VISITOR_ROLLUP_MAX_HOURS_PER_RUN,
+            coord_precision=settings.VISITOR_ROLLUP_COORD_PRECISION,
+        )
+    return _visitor_rollup_job
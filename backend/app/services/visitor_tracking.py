@@ -3,16 +3,78 @@ Visitor Tracking Service (Modular, Reusable)
 Can be extracted and reused in other projects
 """
 from fastapi import Request
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+import asyncio
+import time
 import uuid
 import logging
 
+from app.core.uuid7 import uuid7
 from app.services.geoip_service import GeoIPService
-from app.models.visitor_log import VisitorLog
+from app.services.unique_counts import VISITORS, unique_counter
+from app.models.visitor_log import VisitorLog, VisitorUrl, VisitorUserAgent
 
 logger = logging.getLogger(__name__)
 
+URL_MAX_LENGTH = 512
+USER_AGENT_MAX_LENGTH = 512
+
+
+class InternTable:
+    """
+    Value -> integer id dictionary backed by a lookup table (visitor_urls, visitor_user_agents)
+    
+    Ids are kept in an in-process LRU cache, so repeat values resolve without a query.
+    Misses are inserted (ON CONFLICT DO NOTHING, sorted so concurrent processes lock in
+    the same order) and committed in their own transaction before they are cached, so a
+    failed visitor log insert can never leave a cached id without its row.
+    """
+    
+    def __init__(self, column, max_size: int):
+        self.column = column  # Unique text column of the lookup model, e.g. VisitorUrl.path
+        self.model = column.class_
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+    
+    async def ids_for(self, values: Iterable[str]) -> dict[str, int]:
+        ids: dict[str, int] = {}
+        missing = set()
+        for value in values:
+            if value in ids or value in missing:
+                continue
+            cached = self._cache.get(value)
+            if cached is None:
+                missing.add(value)
+            else:
+                self._cache.move_to_end(value)
+                ids[value] = cached
+        
+        if missing:
+            from app.core.database import AsyncSessionLocal
+            
+            ordered = sorted(missing)
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    pg_insert(self.model)
+                    .values([{self.column.key: value} for value in ordered])
+                    .on_conflict_do_nothing(index_elements=[self.column.key])
+                )
+                result = await db.execute(select(self.column, self.model.id).where(self.column.in_(ordered)))
+                rows = result.all()
+                await db.commit()
+            for value, value_id in rows:
+                ids[value] = value_id
+                self._cache[value] = value_id
+                if len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+        
+        return ids
+
 
 class VisitorTrackingService:
     """
@@ -20,14 +82,17 @@ class VisitorTrackingService:
     Modular design - can be easily extracted to separate module.
     """
     
-    def __init__(self, geoip_service: Optional[GeoIPService] = None):
+    def __init__(self, geoip_service: Optional[GeoIPService] = None, intern_cache_size: int = 10000):
         """
         Initialize tracking service
         
         Args:
             geoip_service: GeoIP service instance (optional, will create if not provided)
+            intern_cache_size: Cached URL path / user agent ids (each)
         """
         self.geoip_service = geoip_service or GeoIPService()
+        self.urls = InternTable(VisitorUrl.path, intern_cache_size)
+        self.user_agents = InternTable(VisitorUserAgent.user_agent, intern_cache_size)
     
     def _get_ip_address(self, request: Request) -> str:
         """Extract IP address from request, handling proxy headers"""
@@ -40,7 +105,7 @@ class VisitorTrackingService:
                 ip_address = forwarded
         
         # Log if it's a localhost/private IP (won't have geo data)
-        if ip_address in ('127.0.0.1', '::1', 'localhost') or ip_address.startswith('192.168.') or ip_address.startswith('10.') or ip_address.startswith('172.'):
+        if self.geoip_service._is_private_ip(ip_address):
             logger.debug(f"Tracking localhost/private IP: {ip_address} (will not have geo data)")
         
         return ip_address
@@ -52,6 +117,62 @@ class VisitorTrackingService:
             session_id = str(uuid.uuid4())
         return session_id
     
+    @staticmethod
+    def normalize_url(path: str) -> str:
+        """URL as stored: the path only (query strings would make every URL distinct)"""
+        return path[:URL_MAX_LENGTH] or "/"
+    
+    @staticmethod
+    def normalize_user_agent(user_agent: Optional[str]) -> Optional[str]:
+        """User agent as stored: whitespace collapsed, truncated; None if empty"""
+        return " ".join((user_agent or "").split())[:USER_AGENT_MAX_LENGTH] or None
+    
+    def capture_visit(self, request: Request, user_id: Optional[uuid.UUID] = None) -> dict:
+        """
+        Capture the request fields of a visit (cheap, no I/O - safe on the request path)
+        
+        Returns:
+            Visit fields without the geographic fields; URL and user agent are still text
+            (see encode_visits)
+        """
+        return {
+            # Identity and time are fixed at request time, not when a batch is written:
+            # visits land in the right rollup hour, and a re-sent batch hits the primary key
+            "id": uuid7(),
+            "visited_at": datetime.now(timezone.utc),
+            "session_id": uuid.UUID(self._get_session_id(request)),
+            "user_id": user_id,
+            "url": self.normalize_url(str(request.url.path)),
+            "ip_address": self._get_ip_address(request),
+            "user_agent": self.normalize_user_agent(request.headers.get('user-agent')),
+        }
+    
+    async def encode_visits(self, visits: list[dict]) -> list[dict]:
+        """Replace the URL and user agent text of captured visits with their lookup table ids"""
+        url_ids = await self.urls.ids_for(visit["url"] for visit in visits)
+        user_agent_ids = await self.user_agents.ids_for(
+            visit["user_agent"] for visit in visits if visit["user_agent"] is not None
+        )
+        for visit in visits:
+            visit["url_id"] = url_ids[visit.pop("url")]
+            user_agent = visit.pop("user_agent")
+            visit["user_agent_id"] = user_agent_ids[user_agent] if user_agent is not None else None
+        return visits
+    
+    def add_location(self, visit: dict) -> dict:
+        """Copy of a captured visit with the GeoIP fields added (lazy-loads the GeoIP database)"""
+        geo_data = self.geoip_service.lookup(visit["ip_address"])
+        if not geo_data.get('country') and not geo_data.get('city'):
+            logger.debug(f"No geo data found for IP: {visit['ip_address']} (normal for localhost/private IPs)")
+        return {
+            **visit,
+            "country": geo_data.get('country'),
+            "country_name": geo_data.get('country_name'),
+            "city": geo_data.get('city'),
+            "latitude": geo_data.get('latitude'),
+            "longitude": geo_data.get('longitude'),
+        }
+    
     async def track_visit(
         self,
         request: Request,
@@ -59,7 +180,9 @@ class VisitorTrackingService:
         user_id: Optional[uuid.UUID] = None,
     ) -> Optional[VisitorLog]:
         """
-        Track a visitor visit
+        Track a visitor visit immediately (one row, one commit)
+        
+        The HTTP middleware uses VisitorLogWriter instead, which batches inserts.
         
         Args:
             request: FastAPI request object
@@ -70,44 +193,9 @@ class VisitorTrackingService:
             VisitorLog instance if successful, None if failed
         """
         try:
-            # Get session ID
-            session_id_str = self._get_session_id(request)
-            session_id = uuid.UUID(session_id_str)
-            
-            # Get IP address
-            ip_address = self._get_ip_address(request)
-            
-            # Get URL (path + query string)
-            url = str(request.url.path)
-            if request.url.query:
-                url += f"?{request.url.query}"
-            
-            # Get user agent
-            user_agent = request.headers.get('user-agent', '')
-            
-            # GeoIP lookup (lazy-loaded, only loads database when lookup is actually called)
-            # Skip availability check to avoid loading database unnecessarily
-            # The lookup method itself handles lazy loading
-            geo_data = self.geoip_service.lookup(ip_address)
-            
-            # Log for debugging
-            if not geo_data.get('country') and not geo_data.get('city'):
-                logger.warning(f"No geo data found for IP: {ip_address}. GeoIP service available: {self.geoip_service.is_available()}. "
-                             f"This is normal for localhost (127.0.0.1) or private IP addresses.")
-            
-            # Create visitor log entry
-            visitor_log = VisitorLog(
-                session_id=session_id,
-                user_id=user_id,
-                url=url,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                country=geo_data.get('country'),
-                country_name=geo_data.get('country_name'),
-                city=geo_data.get('city'),
-                latitude=geo_data.get('latitude'),
-                longitude=geo_data.get('longitude'),
-            )
+            visit = self.add_location(self.capture_visit(request, user_id))
+            await self.encode_visits([visit])
+            visitor_log = VisitorLog(**visit)
             
             db.add(visitor_log)
             await db.commit()
@@ -122,6 +210,116 @@ class VisitorTrackingService:
             return None
 
 
+class VisitorLogWriter:
+    """
+    Batched, bounded visitor log writer
+    
+    The middleware enqueues captured visits without waiting. A single background task
+    drains the queue and writes each batch with one bulk INSERT on one pooled
+    connection. A batch is written when it reaches batch_size or flush_interval seconds
+    after its first visit. If the queue is full, visits are dropped and counted instead
+    of growing memory or competing with API requests for database connections.
+    """
+    
+    def __init__(
+        self,
+        tracking_service: VisitorTrackingService,
+        queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+    ):
+        self.tracking_service = tracking_service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+    
+    def enqueue(self, visit: dict):
+        """Queue a captured visit (never blocks; drops the visit if the queue is full)"""
+        try:
+            self._queue.put_nowait(visit)
+            self.stats["enqueued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                logger.warning(f"Visitor log queue full, dropped {self.stats['dropped']} visit(s) so far")
+    
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="visitor-log-writer")
+    
+    async def stop(self):
+        """Stop the writer and flush what is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[start:start + self.batch_size])
+    
+    def get_stats(self) -> dict:
+        return {**self.stats, "queued": self._queue.qsize(), "queue_size": self._queue.maxsize}
+    
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(batch)
+    
+    async def _write(self, batch: list[dict]):
+        """Write one batch (queued visits are not modified, rows are built from copies)"""
+        from app.core.database import AsyncSessionLocal
+        from app.models.user import User
+        
+        committed = False
+        try:
+            # GeoIP lookups are CPU work; keep them off the event loop
+            rows = await asyncio.to_thread(lambda: [self.tracking_service.add_location(visit) for visit in batch])
+            await self.tracking_service.encode_visits(rows)
+            async with AsyncSessionLocal() as db:
+                # Keep user_id only for existing, active users (one query per batch)
+                user_ids = {row["user_id"] for row in rows if row["user_id"]}
+                if user_ids:
+                    result = await db.execute(
+                        select(User.id).where(User.id.in_(user_ids), User.is_active.is_(True))
+                    )
+                    active = set(result.scalars().all())
+                    for row in rows:
+                        if row["user_id"] not in active:
+                            row["user_id"] = None
+                await db.execute(insert(VisitorLog), rows)
+                await db.commit()
+            committed = True
+            self.stats["written"] += len(rows)
+            self.stats["batches"] += 1
+            await unique_counter.add_many(VISITORS, ((row["session_id"], None, row["visited_at"]) for row in rows))
+        except asyncio.CancelledError:
+            # Shutting down mid-write: put an unwritten batch back for stop() to flush
+            if not committed:
+                for visit in batch:
+                    if not self._queue.full():
+                        self._queue.put_nowait(visit)
+            raise
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.warning(f"Failed to write {len(batch)} visitor log(s): {e}")
+
+
 # Global instance (can be configured per app)
 _tracking_service: Optional[VisitorTrackingService] = None
 
@@ -131,7 +329,33 @@ def get_tracking_service() -> VisitorTrackingService:
     global _tracking_service
     if _tracking_service is None:
         from app.core.config import settings
-        geoip_service = GeoIPService(db_path=settings.GEOIP_DB_PATH)
-        _tracking_service = VisitorTrackingService(geoip_service=geoip_service)
+        geoip_service = GeoIPService(
+            db_path=settings.GEOIP_DB_PATH,
+            cache_size=settings.GEOIP_CACHE_SIZE,
+            cache_ttl=settings.GEOIP_CACHE_TTL,
+            ipv4_prefix=settings.GEOIP_CACHE_IPV4_PREFIX,
+            ipv6_prefix=settings.GEOIP_CACHE_IPV6_PREFIX,
+        )
+        _tracking_service = VisitorTrackingService(
+            geoip_service=geoip_service,
+            intern_cache_size=settings.VISITOR_INTERN_CACHE_SIZE,
+        )
     return _tracking_service
 
+
+
+_visitor_log_writer: Optional[VisitorLogWriter] = None
+
+
+def get_visitor_log_writer() -> VisitorLogWriter:
+    """Get or create the global visitor log writer (started on app startup)"""
+    global _visitor_log_writer
+    if _visitor_log_writer is None:
+        from app.core.config import settings
+        _visitor_log_writer = VisitorLogWriter(
+            get_tracking_service(),
+            queue_size=settings.VISITOR_LOG_QUEUE_SIZE,
+            batch_size=settings.VISITOR_LOG_BATCH_SIZE,
+            flush_interval=settings.VISITOR_LOG_FLUSH_INTERVAL,
+        )
+    return _visitor_log_writer
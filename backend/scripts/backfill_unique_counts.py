@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Backfill the Redis HyperLogLog unique-count sketches from the event tables.
+
+The API adds every new visit and click to the sketches at ingest time
+(app/services/unique_counts.py), but analytics keep using COUNT(DISTINCT ...) for a
+metric until its history has been loaded. This script:
+1. Streams visitor_logs, share_clicks and ad_clicks (server-side cursor)
+2. PFADDs each event into its day, all-time and per-video sketches
+3. Marks the metric ready, so the analytics endpoints switch to PFCOUNT
+
+Safe to re-run and to run while the API is ingesting: adding a member twice does not
+change a HyperLogLog. Run it again after Redis data has been lost.
+
+Usage:
+    python scripts/backfill_unique_counts.py
+    python scripts/backfill_unique_counts.py --only share_clicks
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.visitor_log import VisitorLog
+from app.models.share_click import ShareClick
+from app.models.ad_click import AdClick
+from app.services.unique_counts import (
+    AD_CLICKERS,
+    AD_USERS,
+    SHARE_CLICKERS,
+    SHARE_LINKS_CLICKED,
+    VISITORS,
+    unique_counter,
+)
+
+# table -> (query, {metric: row -> (member, video_id, at)})
+SOURCES = {
+    "visitor_logs": (
+        select(VisitorLog.session_id, VisitorLog.visited_at),
+        {VISITORS: lambda row: (row.session_id, None, row.visited_at)},
+    ),
+    "share_clicks": (
+        select(ShareClick.clicker_session_id, ShareClick.share_link_id, ShareClick.video_id, ShareClick.clicked_at),
+        {
+            SHARE_CLICKERS: lambda row: (row.clicker_session_id, row.video_id, row.clicked_at),
+            SHARE_LINKS_CLICKED: lambda row: (row.share_link_id, row.video_id, row.clicked_at),
+        },
+    ),
+    "ad_clicks": (
+        select(AdClick.clicker_session_id, AdClick.user_id, AdClick.video_id, AdClick.clicked_at),
+        {
+            AD_CLICKERS: lambda row: (row.clicker_session_id, row.video_id, row.clicked_at),
+            AD_USERS: lambda row: (row.user_id, row.video_id, row.clicked_at),
+        },
+    ),
+}
+
+
+async def backfill_table(table: str, batch_size: int):
+    query, metrics = SOURCES[table]
+    started = time.perf_counter()
+    total = 0
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            for metric, event in metrics.items():
+                await unique_counter.add_many(metric, (event(row) for row in rows))
+            total += len(rows)
+            print(f"  {table}: {total} rows", end="\r")
+
+    for metric in metrics:
+        await unique_counter.mark_ready(metric)
+    print(f"✓ {table}: {total} rows in {time.perf_counter() - started:.1f}s "
+          f"(ready: {', '.join(metrics)})")
+
+
+async def backfill_unique_counts(tables: list[str], batch_size: int):
+    print("=" * 60)
+    print("BACKFILL UNIQUE COUNTS")
+    print("=" * 60)
+    for table in tables:
+        await backfill_table(table, batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill Redis HyperLogLog unique counts")
+    parser.add_argument("--only", choices=sorted(SOURCES), action="append", help="Backfill only this table (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(backfill_unique_counts(args.only or list(SOURCES), args.batch_size))
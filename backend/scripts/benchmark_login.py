@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Login throughput benchmark
+
+Local mode (default, no database needed): runs a burst of bcrypt_sha256 verifies the
+way /auth/login does, once inline on the event loop (the old behaviour) and once through
+the bounded password hashing pool. For each run it reports logins/s and the event loop
+lag a concurrent request would see. The lag is measured by a 10ms ticker coroutine.
+
+HTTP mode (--url): fires concurrent POST /api/v1/auth/login requests at a running API
+and reports throughput, latency percentiles and status codes (503 = hashing queue full).
+
+Usage:
+    python scripts/benchmark_login.py --logins 200 --concurrency 50
+    python scripts/benchmark_login.py --url http://localhost:8000 --email a@b.c --password secret123
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.security import get_password_hash, password_hasher, verify_password
+
+TICK_SECONDS = 0.01
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    """Sleep in short ticks and record how late each wake-up is"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_local(name: str, verify, logins: int, concurrency: int, password: str, hashed: str) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    lags: list = []
+    failures = 0
+
+    async def one_login():
+        nonlocal failures
+        async with semaphore:
+            try:
+                if not await verify(password, hashed):
+                    failures += 1
+            except Exception:
+                failures += 1
+
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    return {
+        "mode": name,
+        "logins_per_s": logins / elapsed,
+        "elapsed_s": elapsed,
+        "failures": failures,
+        "max_lag_ms": max(lags, default=0.0) * 1000,
+        "p95_lag_ms": (statistics.quantiles(lags, n=20)[-1] if len(lags) >= 20 else max(lags, default=0.0)) * 1000,
+    }
+
+
+async def benchmark_local(logins: int, concurrency: int):
+    password = "benchmark-password-123"
+    hashed = get_password_hash(password)
+
+    async def inline_verify(plain: str, hashed_password: str) -> bool:
+        return verify_password(plain, hashed_password)
+
+    print(f"Local benchmark: {logins} logins, concurrency {concurrency}, "
+          f"pool {password_hasher.workers} workers / queue {password_hasher.queue_limit}")
+    results = [
+        await run_local("inline (event loop)", inline_verify, logins, concurrency, password, hashed),
+        await run_local("hashing pool", password_hasher.verify, logins, concurrency, password, hashed),
+    ]
+
+    print()
+    print(f"{'mode':<22} {'logins/s':>10} {'max lag ms':>12} {'p95 lag ms':>12} {'failures':>9}")
+    for result in results:
+        print(f"{result['mode']:<22} {result['logins_per_s']:>10.1f} {result['max_lag_ms']:>12.1f} "
+              f"{result['p95_lag_ms']:>12.1f} {result['failures']:>9}")
+    print()
+    print(f"Pool stats: {password_hasher.stats()}")
+
+
+async def benchmark_http(url: str, email: str, password: str, logins: int, concurrency: int):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list = []
+    status_codes: dict = {}
+
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        async def one_login():
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/api/v1/auth/login", json={"email": email, "password": password})
+                    code = response.status_code
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                status_codes[code] = status_codes.get(code, 0) + 1
+
+        print(f"HTTP benchmark: {logins} logins against {url}, concurrency {concurrency}")
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print()
+    print(f"  Throughput: {logins / elapsed:.1f} logins/s ({elapsed:.2f}s)")
+    print(f"  Latency p50: {latencies[len(latencies) // 2] * 1000:.0f}ms, "
+          f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms, "
+          f"max: {latencies[-1] * 1000:.0f}ms")
+    print(f"  Status codes: {status_codes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login (password hashing) throughput")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="Benchmark a running API instead of hashing locally")
+    parser.add_argument("--email", help="Login email (HTTP mode)")
+    parser.add_argument("--password", help="Login password (HTTP mode)")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.email or not args.password:
+            parser.error("--url requires --email and --password")
+        asyncio.run(benchmark_http(args.url, args.email, args.password, args.logins, args.concurrency))
+    else:
+        asyncio.run(benchmark_local(args.logins, args.concurrency))
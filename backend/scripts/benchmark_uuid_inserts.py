@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+UUIDv4 vs UUIDv7 primary key insert benchmark
+
+Creates two scratch tables shaped like the event tables (uuid primary key, timestamp,
+small payload) in the configured database, inserts the same number of rows into each
+in batches - one keyed by uuid.uuid4(), one by app.core.uuid7.uuid7() - and reports:
+- insert throughput (rows/s)
+- primary key index size (random keys leave half-empty pages after splits)
+- WAL generated (full-page writes for every freshly touched index page)
+
+The difference grows once the index no longer fits in shared_buffers, so use a row count
+well above that for realistic numbers. The scratch tables are dropped afterwards.
+
+Usage:
+    python scripts/benchmark_uuid_inserts.py --rows 1000000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from app.core.database import AsyncSessionLocal
+from app.core.uuid7 import uuid7
+
+GENERATORS = {
+    "uuid4": uuid.uuid4,
+    "uuid7": uuid7,
+}
+
+
+async def run_benchmark(name: str, generate, rows: int, batch_size: int) -> dict:
+    table = f"benchmark_ids_{name}"
+    async with AsyncSessionLocal() as db:
+        await db.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await db.execute(text(
+            f"CREATE TABLE {table} ("
+            "id UUID PRIMARY KEY, "
+            "created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "url TEXT NOT NULL)"
+        ))
+        await db.commit()
+
+        wal_start = (await db.execute(text("SELECT pg_current_wal_lsn()"))).scalar()
+        started = time.perf_counter()
+        inserted = 0
+        while inserted < rows:
+            count = min(batch_size, rows - inserted)
+            await db.execute(
+                text(f"INSERT INTO {table} (id, url) VALUES (:id, :url)"),
+                [{"id": generate(), "url": f"/video/{inserted + i}"} for i in range(count)],
+            )
+            await db.commit()
+            inserted += count
+            print(f"  {name}: {inserted}/{rows}", end="\r")
+        elapsed = time.perf_counter() - started
+
+        wal_bytes = (await db.execute(
+            text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:start AS pg_lsn))"),
+            {"start": str(wal_start)},
+        )).scalar()
+        index_bytes = (await db.execute(text(f"SELECT pg_relation_size('{table}_pkey')"))).scalar()
+
+        await db.execute(text(f"DROP TABLE {table}"))
+        await db.commit()
+
+    return {
+        "name": name,
+        "rows_per_s": rows / elapsed,
+        "elapsed_s": elapsed,
+        "index_mb": index_bytes / 1024 / 1024,
+        "wal_mb": float(wal_bytes) / 1024 / 1024,
+    }
+
+
+async def benchmark_uuid_inserts(rows: int, batch_size: int):
+    print(f"Insert benchmark: {rows} rows per key type, batches of {batch_size}")
+    results = [await run_benchmark(name, generate, rows, batch_size) for name, generate in GENERATORS.items()]
+
+    print()
+    print(f"{'key':<8} {'rows/s':>10} {'elapsed s':>10} {'pkey MB':>9} {'WAL MB':>9}")
+    for result in results:
+        print(f"{result['name']:<8} {result['rows_per_s']:>10.0f} {result['elapsed_s']:>10.1f} "
+              f"{result['index_mb']:>9.1f} {result['wal_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark UUIDv4 vs UUIDv7 primary key inserts")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark_uuid_inserts(args.rows, args.batch_size))
@@ -2,6 +2,7 @@
 Check videos stuck in processing status
 """
 import asyncio
+import json
 import sys
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
@@ -12,8 +13,22 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select, text
 from app.core.config import settings
+from app.core.redis_client import get_redis
 from app.models.video import Video, VideoStatus
 
+# A job is considered stalled if the worker has not reported progress for this long
+PROGRESS_STALL_SECONDS = 60
+
+
+async def get_progress(video_id) -> dict:
+    """Read the last progress published by the worker (empty dict if none)"""
+    try:
+        raw = await get_redis().get(f"video_progress:{video_id}")
+        return json.loads(raw) if raw else {}
+    except Exception as e:
+        print(f"  ⚠ Could not read progress for {video_id}: {e}")
+        return {}
+
 
 async def check_stuck_videos():
     """Check for videos stuck in processing"""
@@ -52,7 +67,14 @@ async def check_stuck_videos():
             )
             .order_by(Video.created_at.desc())
         )
-        stuck_videos = result.scalars().all()
+        stuck_videos = []
+        for video in result.scalars().all():
+            # Videos still reporting FFmpeg progress are slow, not stuck
+            progress = await get_progress(video.id)
+            last_report = progress.get("updated_at")
+            if last_report and datetime.now(timezone.utc).timestamp() - last_report < PROGRESS_STALL_SECONDS:
+                continue
+            stuck_videos.append((video, progress))
         
         print(f"\n{'='*60}")
         print(f"STUCK VIDEOS CHECK")
@@ -64,7 +86,7 @@ async def check_stuck_videos():
         else:
             print(f"⚠️  Found {len(stuck_videos)} video(s) stuck in PROCESSING:\n")
             
-            for video in stuck_videos:
+            for video, progress in stuck_videos:
                 age_minutes = (datetime.now(timezone.utc) - video.updated_at).total_seconds() / 60
                 print(f"  Video ID: {video.id}")
                 print(f"  Title: {video.title or 'Untitled'}")
@@ -73,6 +95,8 @@ async def check_stuck_videos():
                 print(f"  Last Updated: {video.updated_at} ({age_minutes:.1f} minutes ago)")
                 print(f"  Error Reason: {video.error_reason or 'None'}")
                 print(f"  File: {video.original_filename}")
+                if progress:
+                    print(f"  Last progress: stage={progress.get('stage')}, percent={progress.get('percent')}")
                 print()
         
         # Also check all processing videos
@@ -85,7 +109,13 @@ async def check_stuck_videos():
             print(f"\n📊 All videos in PROCESSING status: {len(all_processing_videos)}\n")
             for video in all_processing_videos:
                 age_minutes = (datetime.now(timezone.utc) - video.updated_at).total_seconds() / 60
-                print(f"  - {video.id} ({age_minutes:.1f} min ago)")
+                progress = await get_progress(video.id)
+                progress_info = ""
+                if progress:
+                    progress_info = f", {progress.get('stage')} {progress.get('percent') or 0:.0f}%"
+                    if progress.get("speed"):
+                        progress_info += f" @ {progress['speed']}x"
+                print(f"  - {video.id} ({age_minutes:.1f} min ago{progress_info})")
         
         await engine.dispose()
 
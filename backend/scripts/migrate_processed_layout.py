@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Migrate processed media to the sharded layout.
+
+Processed files used to live in one flat directory (processed/{video_id}/). New
+videos are stored sharded by a hash of the id (processed/ab/cd/{video_id}/).
+
+This script:
+1. Walks all videos in id order (keyset batches, no OFFSET scans)
+2. Moves processed/{video_id}/ to processed/ab/cd/{video_id}/
+   (local: one directory rename; s3: server-side copy + delete per object)
+3. Rewrites url_mp4, thumbnail and url_hls to the new location
+
+Safe to re-run: videos whose URLs already point at the sharded prefix are skipped,
+and a move that already happened is detected and only the URLs are updated.
+
+Usage:
+    python scripts/migrate_processed_layout.py            # Dry run
+    python scripts/migrate_processed_layout.py --apply
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.video import Video
+from app.services.storage import PROCESSED_DIR, storage_service, video_key_prefix
+
+URL_COLUMNS = ("url_mp4", "thumbnail", "url_hls")
+
+
+def legacy_url(url: str, video_id: str) -> bool:
+    """URL points at the flat processed/{video_id}/ layout"""
+    return bool(url) and f"/{video_id}/" in url and f"/{video_key_prefix(video_id)}/" not in url
+
+
+def move_local(video_id: str, new_prefix: str) -> str:
+    """Rename processed/{video_id}/ into its shard (same volume, no data copied)"""
+    src = PROCESSED_DIR / video_id
+    dest = PROCESSED_DIR / new_prefix
+    if not src.is_dir():
+        return "already moved" if dest.is_dir() else "missing"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.rename(src, dest)
+    return "moved"
+
+
+def move_s3(video_id: str, new_prefix: str) -> str:
+    """Copy every object under {S3_PREFIX}/{video_id}/ to the sharded prefix, then delete the originals"""
+    client, bucket = storage_service.client, storage_service.bucket
+    root = f"{storage_service.prefix}/" if storage_service.prefix else ""
+    old_key_prefix = f"{root}{video_id}/"
+    new_key_prefix = f"{root}{new_prefix}/"
+
+    moved = 0
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=old_key_prefix):
+        objects = page.get("Contents", [])
+        for obj in objects:
+            new_key = new_key_prefix + obj["Key"][len(old_key_prefix):]
+            client.copy_object(Bucket=bucket, Key=new_key, CopySource={"Bucket": bucket, "Key": obj["Key"]})
+        if objects:
+            client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": obj["Key"]} for obj in objects], "Quiet": True},
+            )
+            moved += len(objects)
+    return f"moved {moved} objects" if moved else "missing or already moved"
+
+
+async def migrate_processed_layout(apply: bool, batch_size: int):
+    """Move processed files into the sharded layout and rewrite stored URLs"""
+    print("=" * 60)
+    print(f"MIGRATE PROCESSED LAYOUT ({storage_service.mode}{'' if apply else ', dry run'})")
+    print("=" * 60)
+    print()
+
+    move = move_s3 if storage_service.mode == "s3" else move_local
+    stats = {"checked": 0, "migrated": 0, "missing": 0, "failed": 0}
+    last_id = None
+
+    async with AsyncSessionLocal() as db:
+        while True:
+            query = select(Video).order_by(Video.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Video.id > last_id)
+            videos = (await db.execute(query)).scalars().all()
+            if not videos:
+                break
+            last_id = videos[-1].id
+
+            for video in videos:
+                stats["checked"] += 1
+                video_id = str(video.id)
+                if not any(legacy_url(getattr(video, column), video_id) for column in URL_COLUMNS):
+                    continue
+
+                new_prefix = video_key_prefix(video_id)
+                if not apply:
+                    print(f"  → {video_id}: {video_id}/ → {new_prefix}/")
+                    stats["migrated"] += 1
+                    continue
+
+                try:
+                    outcome = await asyncio.to_thread(move, video_id, new_prefix)
+                except Exception as e:
+                    print(f"  ✗ {video_id}: {e}")
+                    stats["failed"] += 1
+                    continue
+                if outcome == "missing":
+                    # Nothing on disk - leave the row alone so it can be inspected
+                    print(f"  ⚠ {video_id}: processed/{video_id}/ not found, URLs left unchanged")
+                    stats["missing"] += 1
+                    continue
+
+                for column in URL_COLUMNS:
+                    url = getattr(video, column)
+                    if legacy_url(url, video_id):
+                        setattr(video, column, url.replace(f"/{video_id}/", f"/{new_prefix}/", 1))
+                print(f"  ✓ {video_id}: {outcome} → {new_prefix}/")
+                stats["migrated"] += 1
+
+            # One commit per batch keeps the DB in step with the moved files
+            if apply:
+                await db.commit()
+
+    print()
+    print(f"Checked: {stats['checked']}, {'migrated' if apply else 'to migrate'}: {stats['migrated']}, "
+          f"missing: {stats['missing']}, failed: {stats['failed']}")
+    if not apply and stats["migrated"]:
+        print("Run with --apply to migrate.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate processed media to the sharded layout")
+    parser.add_argument("--apply", action="store_true", help="Move files and update URLs (default: dry run)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(migrate_processed_layout(args.apply, args.batch_size))
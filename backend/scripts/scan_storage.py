@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Storage integrity scanner and orphan garbage collector.
+
+One pass over the whole library instead of walking videos one by one:
+1. Walks /app/uploads/processed (sharded and legacy flat layout) and
+   /app/uploads/originals with os.scandir, one thread per top-level directory
+2. Streams the videos table with a server-side cursor (rows are never all in memory)
+3. Checks each row's files on a thread pool: missing files, MP4 size vs the size
+   recorded by the worker, and MP4 structure (truncated, moov before mdat)
+4. Reports files on disk with no videos row (orphans) and files still kept for
+   failed videos
+
+Nothing is modified unless --gc is given. GC deletes orphans and failed-video files
+whose newest file is older than --min-age-hours, so in-flight uploads and
+deletions are never touched.
+
+Only local files are checked; with STORAGE_BACKEND=s3 processed URLs are skipped.
+
+Usage:
+    python scripts/scan_storage.py
+    python scripts/scan_storage.py --workers 32 --json report.json
+    python scripts/scan_storage.py --gc --min-age-hours 48
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.video import Video, VideoStatus
+from app.services.mp4_boxes import Mp4ParseError, parse_mp4
+
+UPLOADS_DIR = Path("/app/uploads")
+PROCESSED_DIR = UPLOADS_DIR / "processed"
+ORIGINALS_DIR = UPLOADS_DIR / "originals"
+
+STREAM_BATCH = 1000
+EXAMPLES_PER_CATEGORY = 20
+
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+SHARD_PATTERN = re.compile(r"^[0-9a-f]{2}$")
+
+
+def tree_usage(path: str) -> tuple[int, float]:
+    """Total bytes and newest mtime below a directory (os.scandir, no per-file Path objects)"""
+    total, newest = 0, 0.0
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    total += entry_stat.st_size
+                    newest = max(newest, entry_stat.st_mtime)
+    return total, newest
+
+
+def disk_entry(entry: os.DirEntry) -> dict:
+    if entry.is_dir(follow_symlinks=False):
+        size, mtime = tree_usage(entry.path)
+        return {"path": entry.path, "bytes": size, "mtime": mtime, "is_dir": True}
+    entry_stat = entry.stat(follow_symlinks=False)
+    return {"path": entry.path, "bytes": entry_stat.st_size, "mtime": entry_stat.st_mtime, "is_dir": False}
+
+
+def scan_processed_shard(shard_path: str) -> list[tuple[str, dict]]:
+    """Scan processed/ab/ -> cd/{video_id}/ directories"""
+    found = []
+    with os.scandir(shard_path) as subshards:
+        for subshard in subshards:
+            if not subshard.is_dir(follow_symlinks=False):
+                continue
+            with os.scandir(subshard.path) as video_dirs:
+                for video_dir in video_dirs:
+                    if UUID_PATTERN.fullmatch(video_dir.name):
+                        found.append((video_dir.name, disk_entry(video_dir)))
+    return found
+
+
+def scan_top_level(directory: Path) -> tuple[list[str], list[tuple[str, dict]]]:
+    """
+    Scan one top-level directory
+
+    Returns shard directories still to scan and entries attributed to a video id
+    (legacy processed/{video_id}/ directories, loose files named after a video).
+    """
+    shards, found = [], []
+    if not directory.is_dir():
+        return shards, found
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and SHARD_PATTERN.match(entry.name):
+                shards.append(entry.path)
+                continue
+            match = UUID_PATTERN.search(entry.name)
+            if match:
+                found.append((match.group(0), disk_entry(entry)))
+    return shards, found
+
+
+def walk_uploads(pool: ThreadPoolExecutor) -> dict[str, list[dict]]:
+    """Map video id -> files/directories on disk"""
+    disk: dict[str, list[dict]] = {}
+    shards, found = scan_top_level(PROCESSED_DIR)
+    _, originals = scan_top_level(ORIGINALS_DIR)
+    found += originals
+    for shard_found in pool.map(scan_processed_shard, shards):
+        found += shard_found
+    for video_id, entry in found:
+        disk.setdefault(video_id, []).append(entry)
+    return disk
+
+
+def local_path(url: str):
+    """Filesystem path for a /uploads/... URL (None for absolute/S3 URLs)"""
+    if url and url.startswith("/uploads/"):
+        return UPLOADS_DIR / url[len("/uploads/"):]
+    return None
+
+
+def check_row(row) -> list[dict]:
+    """Check one video row's files (runs on the thread pool)"""
+    video_id = str(row.id)
+    issues = []
+
+    def issue(kind: str, detail: str):
+        issues.append({"video_id": video_id, "kind": kind, "detail": detail})
+
+    if row.status == VideoStatus.READY and not row.url_mp4:
+        issue("missing_url", "ready video has no url_mp4")
+
+    for column in ("url_mp4", "thumbnail", "url_hls"):
+        path = local_path(getattr(row, column))
+        if path is None:
+            continue
+        try:
+            file_stat = path.stat()
+        except OSError:
+            if row.status == VideoStatus.READY:
+                issue("missing_file", f"{column}: {path}")
+            continue
+
+        if column != "url_mp4":
+            continue
+        try:
+            expected = json.loads(row.video_metadata_json or "{}").get("file_size_bytes")
+        except ValueError:
+            expected = None
+        if expected and int(expected) != file_stat.st_size:
+            issue("size_mismatch", f"{path}: {file_stat.st_size} bytes on disk, {expected} recorded")
+        try:
+            mp4_info = parse_mp4(path)
+            if mp4_info["truncated"] or mp4_info["moov_size"] is None:
+                issue("truncated", str(path))
+            elif not mp4_info["faststart"]:
+                issue("not_faststart", str(path))
+        except (OSError, Mp4ParseError) as e:
+            issue("unreadable", f"{path}: {e}")
+    return issues
+
+
+def delete_entry(entry: dict) -> int:
+    """Delete one orphaned file or directory, returns bytes reclaimed"""
+    try:
+        if entry["is_dir"]:
+            shutil.rmtree(entry["path"])
+        else:
+            os.unlink(entry["path"])
+        return entry["bytes"]
+    except FileNotFoundError:
+        return 0
+
+
+async def scan_storage(workers: int, gc: bool, min_age_hours: float, json_path: str = None):
+    """Scan uploads against the videos table and optionally reclaim orphans"""
+    print("=" * 60)
+    print(f"STORAGE SCAN{' + GC' if gc else ''} ({workers} threads)")
+    print("=" * 60)
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+        disk = await loop.run_in_executor(None, walk_uploads, pool)
+        disk_entries = sum(len(entries) for entries in disk.values())
+        print(f"  ✓ Disk walk: {disk_entries} entries for {len(disk)} video id(s) "
+              f"in {time.monotonic() - started:.1f}s")
+
+        issues: list[dict] = []
+        reclaimable: list[tuple[str, str, dict]] = []  # (reason, video_id, entry)
+        rows_scanned = 0
+
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(
+                    Video.id, Video.status, Video.url_mp4, Video.thumbnail,
+                    Video.url_hls, Video.video_metadata_json,
+                ).execution_options(yield_per=STREAM_BATCH)
+            )
+            async for rows in result.partitions(STREAM_BATCH):
+                for row in rows:
+                    entries = disk.pop(str(row.id), [])
+                    if row.status == VideoStatus.FAILED:
+                        reclaimable += [("failed", str(row.id), entry) for entry in entries]
+                checks = [loop.run_in_executor(pool, check_row, row) for row in rows]
+                for row_issues in await asyncio.gather(*checks):
+                    issues += row_issues
+                rows_scanned += len(rows)
+
+        # Whatever is left on disk has no videos row
+        for video_id, entries in disk.items():
+            reclaimable += [("orphan", video_id, entry) for entry in entries]
+
+        print(f"  ✓ Checked {rows_scanned} video row(s) in {time.monotonic() - started:.1f}s")
+
+        reclaimed_bytes = 0
+        if gc:
+            cutoff = time.time() - min_age_hours * 3600
+            eligible = [entry for _, _, entry in reclaimable if entry["mtime"] < cutoff]
+            reclaimed_bytes = sum(pool.map(delete_entry, eligible))
+            print(f"  🗑️ GC: deleted {len(eligible)} of {len(reclaimable)} reclaimable entries "
+                  f"({reclaimed_bytes / 1024 / 1024:.1f} MB, older than {min_age_hours:g}h)")
+
+    print(f"\n{'='*60}")
+    print("REPORT")
+    print(f"{'='*60}")
+    by_kind: dict[str, list[dict]] = {}
+    for item in issues:
+        by_kind.setdefault(item["kind"], []).append(item)
+    for kind, items in sorted(by_kind.items()):
+        print(f"\n⚠️  {kind}: {len(items)}")
+        for item in items[:EXAMPLES_PER_CATEGORY]:
+            print(f"  - {item['video_id']}: {item['detail']}")
+
+    for reason in ("orphan", "failed"):
+        entries = [(video_id, entry) for r, video_id, entry in reclaimable if r == reason]
+        if not entries:
+            continue
+        total = sum(entry["bytes"] for _, entry in entries)
+        print(f"\n🧹 {reason} files: {len(entries)} ({total / 1024 / 1024:.1f} MB)")
+        for video_id, entry in entries[:EXAMPLES_PER_CATEGORY]:
+            print(f"  - {video_id}: {entry['path']} ({entry['bytes'] / 1024 / 1024:.1f} MB)")
+
+    if not issues and not reclaimable:
+        print("\n✅ Storage and database are consistent")
+    elif reclaimable and not gc:
+        print("\nRun with --gc to delete orphaned and failed-video files.")
+
+    if json_path:
+        report = {
+            "rows_scanned": rows_scanned,
+            "issues": issues,
+            "reclaimable": [
+                {"reason": reason, "video_id": video_id, **entry}
+                for reason, video_id, entry in reclaimable
+            ],
+            "reclaimed_bytes": reclaimed_bytes,
+        }
+        Path(json_path).write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {json_path}")
+
+    print(f"\nDone in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan uploads for missing files and orphans")
+    parser.add_argument("--workers", type=int, default=16, help="Threads for stat/faststart checks and deletes")
+    parser.add_argument("--gc", action="store_true", help="Delete orphaned and failed-video files")
+    parser.add_argument("--min-age-hours", type=float, default=24, help="Only GC files older than this")
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this JSON file")
+    args = parser.parse_args()
+    asyncio.run(scan_storage(args.workers, args.gc, args.min_age_hours, args.json_path))
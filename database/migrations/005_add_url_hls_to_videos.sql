@@ -0,0 +1,11 @@
+-- Migration: 005_add_url_hls_to_videos.sql
+-- Description: Add url_hls field to videos table for adaptive-bitrate HLS playback
+
+BEGIN;
+
+-- Master playlist URL (e.g., /uploads/processed/{video_id}/hls/master.m3u8)
+-- NULL when HLS output is disabled in the worker or the ladder failed
+ALTER TABLE videos 
+ADD COLUMN IF NOT EXISTS url_hls TEXT;
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- Migration: 006_add_thumbnail_variants_to_videos.sql
+-- Description: Add sized WebP thumbnail variants and an inline LQIP placeholder to videos
+
+BEGIN;
+
+-- JSON object of width (px) -> WebP URL, e.g. {"160": ".../thumb_160.webp", "320": "...", "640": "..."}
+-- NULL for videos processed before variants existed (clients fall back to thumbnail)
+ALTER TABLE videos 
+ADD COLUMN IF NOT EXISTS thumbnail_variants_json TEXT;
+
+-- Tiny blurred preview as a data URI (data:image/webp;base64,...), a few hundred bytes
+ALTER TABLE videos 
+ADD COLUMN IF NOT EXISTS thumbnail_placeholder TEXT;
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- Migration: 007_add_video_fingerprints.sql
+-- Description: Perceptual fingerprints for near-duplicate detection of uploaded videos
+
+BEGIN;
+
+-- One row per fingerprinted video: a 64-bit pHash per sampled frame (10%, 30%, ... of the duration)
+CREATE TABLE IF NOT EXISTS video_fingerprints (
+    video_id UUID PRIMARY KEY REFERENCES videos(id) ON DELETE CASCADE,
+    frame_hashes BIGINT[] NOT NULL,
+    duration_seconds REAL NOT NULL,
+    duplicate_of UUID REFERENCES videos(id) ON DELETE SET NULL,  -- Closest earlier near-duplicate, if any
+    duplicate_distance REAL,  -- Mean Hamming distance to duplicate_of (0-64)
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_video_fingerprints_duplicate_of ON video_fingerprints(duplicate_of) WHERE duplicate_of IS NOT NULL;
+
+-- Hash-prefix buckets for Hamming-distance lookups (multi-index hashing):
+-- bucket = band << 16 | 16-bit slice of a frame hash, 4 bands per frame hash
+CREATE TABLE IF NOT EXISTS video_fingerprint_buckets (
+    bucket INTEGER NOT NULL,
+    video_id UUID NOT NULL REFERENCES video_fingerprints(video_id) ON DELETE CASCADE,
+    PRIMARY KEY (bucket, video_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_video_fingerprint_buckets_video_id ON video_fingerprint_buckets(video_id);
+
+COMMIT;
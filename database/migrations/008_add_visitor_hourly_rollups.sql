@@ -0,0 +1,31 @@
+-- Migration: 008_add_visitor_hourly_rollups.sql
+-- Description: Hourly visitor analytics rollups with HyperLogLog unique-visitor sketches
+
+BEGIN;
+
+-- One row per (hour, country, city, lat/long bucket, url) with a visit count and a
+-- serialised HyperLogLog sketch of the session ids (see backend/app/services/hll.py).
+-- Written by the rollup job for completed hours only; the current hour is read from visitor_logs.
+CREATE TABLE IF NOT EXISTS visitor_hourly_rollups (
+    id BIGSERIAL PRIMARY KEY,
+    hour TIMESTAMP WITH TIME ZONE NOT NULL,
+    country VARCHAR(2),
+    country_name VARCHAR(100),
+    city VARCHAR(100),
+    latitude DECIMAL(10, 8),  -- Rounded to the rollup coordinate precision
+    longitude DECIMAL(11, 8),
+    url TEXT NOT NULL,
+    visit_count INTEGER NOT NULL,
+    visitors BYTEA NOT NULL  -- HyperLogLog sketch of session_id
+);
+
+CREATE INDEX IF NOT EXISTS idx_visitor_hourly_rollups_hour ON visitor_hourly_rollups(hour);
+
+-- Rollup progress: every hour before rolled_up_until has been aggregated
+CREATE TABLE IF NOT EXISTS analytics_rollup_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    rolled_up_until TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMIT;
@@ -0,0 +1,188 @@
+-- Migration: 009_partition_event_tables.sql
+-- Description: Monthly range partitioning for views, visitor_logs, share_clicks and ad_clicks
+--
+-- Each table is rebuilt as a table partitioned by its event timestamp, with one partition
+-- per UTC month ({table}_pYYYYMM) and a {table}_default partition as a safety net.
+-- Existing rows are copied into the new partitions (one-off; takes a while on large tables).
+-- The primary key becomes (id, <timestamp>) because a partitioned table's unique
+-- constraints must include the partition key.
+--
+-- Future partitions are created and expired ones detached/dropped by the partition
+-- maintenance job (backend/app/services/partition_maintenance.py).
+--
+-- This migration is idempotent - tables that are already partitioned are skipped
+
+BEGIN;
+
+-- Create monthly partitions {parent}_pYYYYMM for every month from from_month to to_month
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, from_month DATE, to_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_month)::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= to_month LOOP
+        partition_name := format('%s_p%s', parent, to_char(month_start, 'YYYYMM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                parent,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Views
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('views')) THEN
+        ALTER TABLE views RENAME TO views_unpartitioned;
+        ALTER TABLE views_unpartitioned RENAME CONSTRAINT views_pkey TO views_unpartitioned_pkey;
+
+        CREATE TABLE views (
+            id UUID NOT NULL DEFAULT uuid_generate_v4(),
+            video_id UUID NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+            watched_seconds INTEGER DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+        CREATE TABLE views_default PARTITION OF views DEFAULT;
+
+        PERFORM create_monthly_partitions(
+            'views',
+            COALESCE((SELECT min(created_at) AT TIME ZONE 'UTC' FROM views_unpartitioned), now() AT TIME ZONE 'UTC')::date,
+            (now() AT TIME ZONE 'UTC' + interval '3 months')::date
+        );
+        INSERT INTO views (id, video_id, user_id, watched_seconds, created_at, updated_at)
+        SELECT id, video_id, user_id, watched_seconds, COALESCE(created_at, CURRENT_TIMESTAMP), updated_at
+        FROM views_unpartitioned;
+        DROP TABLE views_unpartitioned;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_views_video_id ON views(video_id);
+CREATE INDEX IF NOT EXISTS idx_views_user_id ON views(user_id);
+CREATE INDEX IF NOT EXISTS idx_views_created_at ON views(created_at);
+
+DROP TRIGGER IF EXISTS update_views_updated_at ON views;
+CREATE TRIGGER update_views_updated_at BEFORE UPDATE ON views
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Visitor logs
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('visitor_logs')) THEN
+        ALTER TABLE visitor_logs RENAME TO visitor_logs_unpartitioned;
+        ALTER TABLE visitor_logs_unpartitioned RENAME CONSTRAINT visitor_logs_pkey TO visitor_logs_unpartitioned_pkey;
+
+        CREATE TABLE visitor_logs (
+            id UUID NOT NULL DEFAULT uuid_generate_v4(),
+            session_id UUID NOT NULL,
+            user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+            url TEXT NOT NULL,
+            ip_address INET,
+            user_agent TEXT,
+            country VARCHAR(2),
+            country_name VARCHAR(100),
+            city VARCHAR(100),
+            latitude DECIMAL(10, 8),
+            longitude DECIMAL(11, 8),
+            visited_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, visited_at)
+        ) PARTITION BY RANGE (visited_at);
+        CREATE TABLE visitor_logs_default PARTITION OF visitor_logs DEFAULT;
+
+        PERFORM create_monthly_partitions(
+            'visitor_logs',
+            COALESCE((SELECT min(visited_at) AT TIME ZONE 'UTC' FROM visitor_logs_unpartitioned), now() AT TIME ZONE 'UTC')::date,
+            (now() AT TIME ZONE 'UTC' + interval '3 months')::date
+        );
+        INSERT INTO visitor_logs (id, session_id, user_id, url, ip_address, user_agent,
+                                  country, country_name, city, latitude, longitude, visited_at)
+        SELECT id, session_id, user_id, url, ip_address, user_agent,
+               country, country_name, city, latitude, longitude, COALESCE(visited_at, CURRENT_TIMESTAMP)
+        FROM visitor_logs_unpartitioned;
+        DROP TABLE visitor_logs_unpartitioned;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_visitor_logs_visited_at ON visitor_logs(visited_at DESC);
+CREATE INDEX IF NOT EXISTS idx_visitor_logs_url ON visitor_logs(url);
+CREATE INDEX IF NOT EXISTS idx_visitor_logs_country ON visitor_logs(country);
+CREATE INDEX IF NOT EXISTS idx_visitor_logs_coordinates ON visitor_logs(latitude, longitude) WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+
+-- Share clicks
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('share_clicks')) THEN
+        ALTER TABLE share_clicks RENAME TO share_clicks_unpartitioned;
+        ALTER TABLE share_clicks_unpartitioned RENAME CONSTRAINT share_clicks_pkey TO share_clicks_unpartitioned_pkey;
+
+        CREATE TABLE share_clicks (
+            id UUID NOT NULL DEFAULT uuid_generate_v4(),
+            share_link_id UUID NOT NULL REFERENCES share_links(id) ON DELETE CASCADE,
+            clicker_session_id UUID NOT NULL,
+            video_id UUID NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            clicked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, clicked_at)
+        ) PARTITION BY RANGE (clicked_at);
+        CREATE TABLE share_clicks_default PARTITION OF share_clicks DEFAULT;
+
+        PERFORM create_monthly_partitions(
+            'share_clicks',
+            COALESCE((SELECT min(clicked_at) AT TIME ZONE 'UTC' FROM share_clicks_unpartitioned), now() AT TIME ZONE 'UTC')::date,
+            (now() AT TIME ZONE 'UTC' + interval '3 months')::date
+        );
+        INSERT INTO share_clicks (id, share_link_id, clicker_session_id, video_id, clicked_at)
+        SELECT id, share_link_id, clicker_session_id, video_id, COALESCE(clicked_at, CURRENT_TIMESTAMP)
+        FROM share_clicks_unpartitioned;
+        DROP TABLE share_clicks_unpartitioned;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_share_clicks_share_link_id ON share_clicks(share_link_id);
+CREATE INDEX IF NOT EXISTS idx_share_clicks_clicker_session_id ON share_clicks(clicker_session_id);
+CREATE INDEX IF NOT EXISTS idx_share_clicks_video_id ON share_clicks(video_id);
+CREATE INDEX IF NOT EXISTS idx_share_clicks_clicked_at ON share_clicks(clicked_at);
+
+-- Ad clicks
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('ad_clicks')) THEN
+        ALTER TABLE ad_clicks RENAME TO ad_clicks_unpartitioned;
+        ALTER TABLE ad_clicks_unpartitioned RENAME CONSTRAINT ad_clicks_pkey TO ad_clicks_unpartitioned_pkey;
+
+        CREATE TABLE ad_clicks (
+            id UUID NOT NULL DEFAULT uuid_generate_v4(),
+            video_id UUID NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            clicker_session_id UUID,
+            user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+            clicked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, clicked_at)
+        ) PARTITION BY RANGE (clicked_at);
+        CREATE TABLE ad_clicks_default PARTITION OF ad_clicks DEFAULT;
+
+        PERFORM create_monthly_partitions(
+            'ad_clicks',
+            COALESCE((SELECT min(clicked_at) AT TIME ZONE 'UTC' FROM ad_clicks_unpartitioned), now() AT TIME ZONE 'UTC')::date,
+            (now() AT TIME ZONE 'UTC' + interval '3 months')::date
+        );
+        INSERT INTO ad_clicks (id, video_id, clicker_session_id, user_id, clicked_at)
+        SELECT id, video_id, clicker_session_id, user_id, COALESCE(clicked_at, CURRENT_TIMESTAMP)
+        FROM ad_clicks_unpartitioned;
+        DROP TABLE ad_clicks_unpartitioned;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_ad_clicks_video_id ON ad_clicks(video_id);
+CREATE INDEX IF NOT EXISTS idx_ad_clicks_clicker_session_id ON ad_clicks(clicker_session_id) WHERE clicker_session_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_ad_clicks_user_id ON ad_clicks(user_id) WHERE user_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_ad_clicks_clicked_at ON ad_clicks(clicked_at);
+
+COMMIT;
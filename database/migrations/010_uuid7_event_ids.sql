@@ -0,0 +1,34 @@
+-- Migration: 010_uuid7_event_ids.sql
+-- Description: Time-ordered UUIDv7 defaults for the high-insert event tables
+--
+-- The API generates UUIDv7 ids itself (backend/app/core/uuid7.py); these column
+-- defaults cover rows inserted from SQL. Existing visitor_logs ids are rewritten to
+-- UUIDv7 derived from visited_at, so id order matches time order and /recent can page
+-- by id. Nothing references visitor_logs.id.
+--
+-- This migration is idempotent - rows that already have v7 ids are left alone
+
+BEGIN;
+
+-- UUIDv7 for a timestamp: 48-bit Unix milliseconds, version 7, random remainder
+CREATE OR REPLACE FUNCTION uuid_generate_v7(ts TIMESTAMPTZ DEFAULT clock_timestamp())
+RETURNS UUID AS $$
+DECLARE
+    value BYTEA := uuid_send(gen_random_uuid());
+BEGIN
+    value := overlay(value PLACING substring(int8send(floor(extract(epoch FROM ts) * 1000)::BIGINT) FROM 3) FROM 1 FOR 6);
+    value := set_byte(value, 6, (get_byte(value, 6) & 15) | 112);  -- version 7 (variant bits stay 10)
+    RETURN encode(value, 'hex')::UUID;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+ALTER TABLE views ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE votes ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE visitor_logs ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE share_clicks ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE ad_clicks ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+
+UPDATE visitor_logs SET id = uuid_generate_v7(visited_at)
+WHERE substring(id::text FROM 15 FOR 1) <> '7';
+
+COMMIT;
@@ -0,0 +1,68 @@
+-- Migration: 011_dictionary_encode_visitor_logs.sql
+-- Description: Lookup tables for visitor URL paths and user agents; visitor_logs stores integer ids
+--
+-- URLs are stored as their path (query string dropped) and user agents with whitespace
+-- collapsed, both cut to 512 characters (see VisitorTrackingService). Dropping the text
+-- columns does not shrink existing partitions until they are rewritten or expire; new
+-- monthly partitions are written compact.
+--
+-- This migration is idempotent - the backfill only runs while the text columns exist
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS visitor_urls (
+    id SERIAL PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS visitor_user_agents (
+    id SERIAL PRIMARY KEY,
+    user_agent TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE visitor_logs ADD COLUMN IF NOT EXISTS url_id INTEGER REFERENCES visitor_urls(id);
+ALTER TABLE visitor_logs ADD COLUMN IF NOT EXISTS user_agent_id INTEGER REFERENCES visitor_user_agents(id);
+ALTER TABLE visitor_hourly_rollups ADD COLUMN IF NOT EXISTS url_id INTEGER REFERENCES visitor_urls(id);
+
+DO $$ BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'visitor_logs' AND column_name = 'url') THEN
+        INSERT INTO visitor_urls (path)
+        SELECT DISTINCT left(split_part(url, '?', 1), 512) FROM visitor_logs
+        ON CONFLICT (path) DO NOTHING;
+
+        INSERT INTO visitor_user_agents (user_agent)
+        SELECT DISTINCT left(btrim(regexp_replace(user_agent, '\s+', ' ', 'g')), 512) FROM visitor_logs
+        WHERE btrim(coalesce(user_agent, '')) <> ''
+        ON CONFLICT (user_agent) DO NOTHING;
+
+        UPDATE visitor_logs SET
+            url_id = (SELECT id FROM visitor_urls WHERE path = left(split_part(visitor_logs.url, '?', 1), 512)),
+            user_agent_id = (
+                SELECT id FROM visitor_user_agents
+                WHERE user_agent = left(btrim(regexp_replace(visitor_logs.user_agent, '\s+', ' ', 'g')), 512)
+            );
+
+        ALTER TABLE visitor_logs DROP COLUMN url;
+        ALTER TABLE visitor_logs DROP COLUMN user_agent;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'visitor_hourly_rollups' AND column_name = 'url') THEN
+        INSERT INTO visitor_urls (path)
+        SELECT DISTINCT left(split_part(url, '?', 1), 512) FROM visitor_hourly_rollups
+        ON CONFLICT (path) DO NOTHING;
+
+        UPDATE visitor_hourly_rollups SET
+            url_id = (SELECT id FROM visitor_urls WHERE path = left(split_part(visitor_hourly_rollups.url, '?', 1), 512));
+
+        ALTER TABLE visitor_hourly_rollups DROP COLUMN url;
+    END IF;
+END $$;
+
+ALTER TABLE visitor_logs ALTER COLUMN url_id SET NOT NULL;
+ALTER TABLE visitor_hourly_rollups ALTER COLUMN url_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_visitor_logs_url_id ON visitor_logs(url_id);
+
+COMMIT;
@@ -0,0 +1,24 @@
+-- Migration: 012_add_visitor_daily_rollups.sql
+-- Description: Daily visitor analytics rollups (hourly rollups merged per UTC day)
+
+BEGIN;
+
+-- Same dimensions as visitor_hourly_rollups, one row per UTC day. Written by the rollup
+-- job once a day is fully rolled up into hours, so long analytics windows read at most
+-- one row per group and day. Progress is tracked by the 'visitor_daily' watermark.
+CREATE TABLE IF NOT EXISTS visitor_daily_rollups (
+    id BIGSERIAL PRIMARY KEY,
+    day DATE NOT NULL,
+    country VARCHAR(2),
+    country_name VARCHAR(100),
+    city VARCHAR(100),
+    latitude DECIMAL(10, 8),  -- Rounded to the rollup coordinate precision
+    longitude DECIMAL(11, 8),
+    url_id INTEGER NOT NULL REFERENCES visitor_urls(id),
+    visit_count INTEGER NOT NULL,
+    visitors BYTEA NOT NULL  -- HyperLogLog sketch of session_id (merged hourly sketches)
+);
+
+CREATE INDEX IF NOT EXISTS idx_visitor_daily_rollups_day ON visitor_daily_rollups(day);
+
+COMMIT;
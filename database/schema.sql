@@ -24,3 +24,11 @@
 \i /docker-entrypoint-initdb.d/migrations/002_visitor_analytics.sql
 \i /docker-entrypoint-initdb.d/migrations/003_add_ad_link_to_videos.sql
 \i /docker-entrypoint-initdb.d/migrations/004_add_ad_clicks_table.sql
+\i /docker-entrypoint-initdb.d/migrations/005_add_url_hls_to_videos.sql
+\i /docker-entrypoint-initdb.d/migrations/006_add_thumbnail_variants_to_videos.sql
+\i /docker-entrypoint-initdb.d/migrations/007_add_video_fingerprints.sql
+\i /docker-entrypoint-initdb.d/migrations/008_add_visitor_hourly_rollups.sql
+\i /docker-entrypoint-initdb.d/migrations/009_partition_event_tables.sql
+\i /docker-entrypoint-initdb.d/migrations/010_uuid7_event_ids.sql
+\i /docker-entrypoint-initdb.d/migrations/011_dictionary_encode_visitor_logs.sql
+\i /docker-entrypoint-initdb.d/migrations/012_add_visitor_daily_rollups.sql
@@ -22,7 +22,10 @@ export interface Video {
   description?: string
   status: VideoStatus
   thumbnail: string // Required - fail fast if missing
+  thumbnail_variants?: Record<string, string> | null // Width (px) -> WebP URL, for srcset
+  thumbnail_placeholder?: string | null // Tiny inline preview (data URI) shown while loading
   url_mp4: string // Required - fail fast if missing
+  url_hls?: string | null // HLS master playlist (adaptive bitrate), if generated
   duration_seconds?: number | null
   error_reason?: string | null
   ad_link?: string | null  // External link for ad videos
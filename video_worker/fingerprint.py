@@ -0,0 +1,114 @@
+"""
+Perceptual video fingerprints for near-duplicate detection
+A fingerprint is one 64-bit pHash per frame at fixed relative positions (10%, 30%, ...
+of the duration), so a re-encoded, rescaled or recompressed repost hashes to nearly
+the same bits while an exact-bytes hash would not match at all.
+
+Lookups use multi-index hashing: each frame hash is split into 4 bands of 16 bits and
+every (band, value) pair is stored as an indexed integer bucket. Two hashes within
+Hamming distance 3 always share at least one band exactly, and in practice re-encodes
+at larger distances still share one band on at least one frame. Candidates found via
+the buckets are verified on the full hashes.
+"""
+import math
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+FRAME_POSITIONS = (0.1, 0.3, 0.5, 0.7, 0.9)
+HASH_INPUT_SIZE = 32  # Frames are reduced to 32x32 gray before the DCT
+HASH_DCT_SIZE = 8  # Low-frequency 8x8 block -> 64 bits
+BAND_BITS = 16
+BANDS = 64 // BAND_BITS
+
+# DCT-II basis for the low-frequency coefficients only
+_DCT_COS = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * HASH_INPUT_SIZE)) for x in range(HASH_INPUT_SIZE)]
+    for u in range(HASH_DCT_SIZE)
+]
+
+
+def phash(pixels: bytes) -> int:
+    """
+    64-bit perceptual hash of a HASH_INPUT_SIZE x HASH_INPUT_SIZE gray frame
+
+    Bit set = DCT coefficient above the median of the 8x8 low-frequency block (DC excluded
+    from the median). Flat frames (black, single colour) hash to 0, which never matches.
+    """
+    size = HASH_INPUT_SIZE
+    rows = [pixels[y * size:(y + 1) * size] for y in range(size)]
+    # Separable DCT: rows first (8 coefficients each), then columns
+    row_coeffs = [[sum(c * p for c, p in zip(basis, row)) for basis in _DCT_COS] for row in rows]
+    coeffs = [
+        sum(_DCT_COS[v][y] * row_coeffs[y][u] for y in range(size))
+        for v in range(HASH_DCT_SIZE)
+        for u in range(HASH_DCT_SIZE)
+    ]
+    if max(abs(c) for c in coeffs[1:]) < 1e-3:
+        return 0
+    median = sorted(coeffs[1:])[len(coeffs) // 2 - 1]
+    value = 0
+    for coefficient in coeffs:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed64(value: int) -> int:
+    """Unsigned 64-bit hash -> Postgres BIGINT"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned64(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+def hash_buckets(hashes: list[int]) -> set[int]:
+    """Bucket ids (band << BAND_BITS | band value) for all non-flat frame hashes"""
+    mask = (1 << BAND_BITS) - 1
+    return {
+        (band << BAND_BITS) | ((value >> (band * BAND_BITS)) & mask)
+        for value in hashes if value
+        for band in range(BANDS)
+    }
+
+
+def frame_distances(a: list[int], b: list[int]) -> list[int]:
+    """Per-frame Hamming distances (64 for frames that are flat in either fingerprint)"""
+    return [hamming(x, y) if x and y else 64 for x, y in zip(a, b)]
+
+
+def extract_fingerprint(input_path: Path, duration: float, timeout: int = 60) -> Optional[list[int]]:
+    """
+    Decode one frame at each FRAME_POSITIONS point and hash it
+
+    A single FFmpeg run with one fast-seeked input per position, so only the GOPs around
+    those points are decoded. Returns None if not every frame could be decoded.
+    """
+    size = HASH_INPUT_SIZE
+    ffmpeg_cmd = ["ffmpeg", "-hide_banner", "-nostdin"]
+    for position in FRAME_POSITIONS:
+        ffmpeg_cmd += ["-threads", "1", "-ss", f"{duration * position:.3f}", "-i", str(input_path)]
+    filters = [
+        f"[{index}:v]trim=end_frame=1,scale={size}:{size}:flags=area,format=gray,setpts=PTS-STARTPTS[f{index}]"
+        for index in range(len(FRAME_POSITIONS))
+    ]
+    labels = "".join(f"[f{index}]" for index in range(len(FRAME_POSITIONS)))
+    filters.append(f"{labels}concat=n={len(FRAME_POSITIONS)}:v=1:a=0[out]")
+    ffmpeg_cmd += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[out]",
+        "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1",
+    ]
+    result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, timeout=timeout)
+
+    frame_size = size * size
+    if len(result.stdout) < frame_size * len(FRAME_POSITIONS):
+        return None
+    return [
+        phash(result.stdout[index * frame_size:(index + 1) * frame_size])
+        for index in range(len(FRAME_POSITIONS))
+    ]
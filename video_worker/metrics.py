@@ -0,0 +1,180 @@
+"""
+Video Worker Metrics
+Prometheus-style counters and histograms for the processing pipeline
+
+Celery runs tasks in prefork child processes, so metrics are aggregated in Redis
+(one hash per worker, HINCRBYFLOAT per sample) instead of in process memory. Each
+worker serves only its own hash in Prometheus text format on METRICS_PORT (/metrics),
+so a scrape is a single HGETALL and every series is ingested once; aggregate across
+workers with sum() in Prometheus. Series carry a `worker` label (hostname).
+
+The hash expires METRICS_TTL_SECONDS after the last sample or heartbeat, so the
+series of a retired worker disappear instead of living in Redis forever.
+
+Recording is best-effort: Redis errors are logged and never fail a task.
+"""
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9808"))  # 0 disables the HTTP endpoint
+WORKER_NAME = os.getenv("WORKER_NAME", socket.gethostname())
+METRICS_KEY = f"video_worker:metrics:{WORKER_NAME}"
+METRICS_TTL_SECONDS = int(os.getenv("METRICS_TTL_SECONDS", "900"))
+METRICS_HEARTBEAT_SECONDS = 60  # Refreshes the TTL while the worker is up (idle or not)
+
+# Seconds: covers quick probes (0.05s) up to the 25 minute transcode limit
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1500)
+FPS_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "video_worker_tasks_total": (
+        "counter", "Processed videos by final status", None),
+    "video_worker_failures_total": (
+        "counter", "Failed videos by error category", None),
+    "video_worker_transcode_total": (
+        "counter", "Videos by MP4 path (transcoded or copied)", None),
+    "video_worker_duplicates_total": (
+        "counter", "Near-duplicate uploads detected, by configured action", None),
+    "video_worker_queue_wait_seconds": (
+        "histogram", "Time between upload enqueue and task start", DURATION_BUCKETS),
+    "video_worker_task_duration_seconds": (
+        "histogram", "Total processing time per video", DURATION_BUCKETS),
+    "video_worker_stage_duration_seconds": (
+        "histogram", "Processing time per pipeline stage", DURATION_BUCKETS),
+    "video_worker_encode_fps": (
+        "histogram", "Transcode throughput in frames per second", FPS_BUCKETS),
+}
+
+_redis_client = None
+
+
+def _get_redis():
+    """Get (lazily created) Redis client for metrics"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        redis_url = os.getenv("REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+        _redis_client = redis.Redis.from_url(redis_url, socket_timeout=2, socket_connect_timeout=2)
+    return _redis_client
+
+
+def _series(name: str, labels: dict) -> str:
+    """Format a series key: name{worker="...",label="value"}"""
+    all_labels = {"worker": WORKER_NAME, **labels}
+    label_str = ",".join(f'{key}="{value}"' for key, value in sorted(all_labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+def _format_le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Increment a counter"""
+    try:
+        pipe = _get_redis().pipeline(transaction=False)
+        pipe.hincrbyfloat(METRICS_KEY, _series(name, labels), value)
+        pipe.expire(METRICS_KEY, METRICS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        print(f"  ⚠ Could not record metric {name}: {e}")
+
+
+def observe(name: str, value: float, **labels):
+    """Record one histogram observation (cumulative buckets, sum and count)"""
+    buckets = METRICS[name][2]
+    try:
+        pipe = _get_redis().pipeline(transaction=False)
+        for bound in (*buckets, float("inf")):
+            if value <= bound:
+                pipe.hincrbyfloat(METRICS_KEY, _series(f"{name}_bucket", {**labels, "le": _format_le(bound)}), 1)
+        pipe.hincrbyfloat(METRICS_KEY, _series(f"{name}_sum", labels), value)
+        pipe.hincrbyfloat(METRICS_KEY, _series(f"{name}_count", labels), 1)
+        pipe.expire(METRICS_KEY, METRICS_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        print(f"  ⚠ Could not record metric {name}: {e}")
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a pipeline stage into video_worker_stage_duration_seconds"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe("video_worker_stage_duration_seconds", time.monotonic() - started, stage=stage)
+
+
+def render() -> str:
+    """Render this worker's recorded series in Prometheus text exposition format"""
+    raw = _get_redis().hgetall(METRICS_KEY)
+    series = sorted((key.decode(), float(value)) for key, value in raw.items())
+
+    lines = []
+    for name, (metric_type, help_text, _) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        prefixes = (f"{name}{{",) if metric_type == "counter" else (
+            f"{name}_bucket{{", f"{name}_sum{{", f"{name}_count{{")
+        for key, value in series:
+            if key.startswith(prefixes):
+                lines.append(f"{key} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        try:
+            body = render().encode()
+        except Exception as e:
+            self.send_error(503, f"Metrics unavailable: {e}")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Don't spam worker logs with scrape requests
+
+
+def _heartbeat():
+    while True:
+        try:
+            _get_redis().expire(METRICS_KEY, METRICS_TTL_SECONDS)
+        except Exception as e:
+            print(f"  ⚠ Could not refresh metrics TTL: {e}")
+        time.sleep(METRICS_HEARTBEAT_SECONDS)
+
+
+def start_heartbeat() -> threading.Thread:
+    """Keep this worker's metrics hash alive from a daemon thread (main worker process)"""
+    thread = threading.Thread(target=_heartbeat, name="metrics-heartbeat", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_http_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a daemon thread (call once, in the main worker process)"""
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠ Could not start metrics endpoint on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📈 Metrics endpoint: http://0.0.0.0:{port}/metrics")
+    return server
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Storage backend smoke test
+
+Uploads a small file and a file large enough to force a parallel multipart upload
+through the configured storage backend (STORAGE_BACKEND), verifies both, reports
+upload throughput and deletes everything again.
+
+Usage (from video_worker directory, e.g. against a local MinIO):
+    STORAGE_BACKEND=s3 S3_BUCKET=short5 S3_ENDPOINT_URL=http://localhost:9000 \\
+        S3_ACCESS_KEY_ID=minioadmin S3_SECRET_ACCESS_KEY=minioadmin \\
+        python scripts/check_storage_backend.py --size-mb 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Add parent directory to path to import storage
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from storage import get_storage  # noqa: E402
+
+
+def write_random_file(path: Path, size_mb: int):
+    """Write size_mb of random bytes (incompressible, like encoded video)"""
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+
+def verify(storage, key: str, expected_size: int):
+    """Check the stored object/file has the expected size"""
+    if storage.name == "s3":
+        head = storage.client.head_object(Bucket=storage.bucket, Key=storage.object_key(key))
+        actual_size = head["ContentLength"]
+        content_type = head.get("ContentType")
+    else:
+        actual_size = storage.local_path(key).stat().st_size
+        content_type = None
+    if actual_size != expected_size:
+        raise RuntimeError(f"{key}: expected {expected_size} bytes, found {actual_size}")
+    print(f"  ✓ Verified {key} ({actual_size} bytes{f', {content_type}' if content_type else ''})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smoke test the configured storage backend")
+    parser.add_argument("--size-mb", type=int, default=40, help="Size of the multipart test file")
+    parser.add_argument("--keep", action="store_true", help="Keep uploaded test objects")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    prefix = f"_storage_check_{uuid.uuid4().hex[:8]}"
+    print(f"Storage backend: {storage.name}, test prefix: {prefix}/")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        small_path = Path(tmp) / "master.m3u8"
+        small_path.write_text("#EXTM3U\n")
+        large_path = Path(tmp) / "video.mp4"
+        write_random_file(large_path, args.size_mb)
+
+        try:
+            url, method = storage.put_file(small_path, f"{prefix}/hls/master.m3u8")
+            print(f"  ✓ Small file stored ({method}): {url}")
+            verify(storage, f"{prefix}/hls/master.m3u8", small_path.stat().st_size)
+
+            started = time.perf_counter()
+            url, method = storage.put_file(large_path, f"{prefix}/video.mp4")
+            elapsed = time.perf_counter() - started
+            print(f"  ✓ {args.size_mb}MB file stored ({method}) in {elapsed:.2f}s "
+                  f"({args.size_mb / elapsed:.1f} MB/s): {url}")
+            verify(storage, f"{prefix}/video.mp4", large_path.stat().st_size)
+        finally:
+            if not args.keep:
+                removed = storage.delete_prefix(f"{prefix}/")
+                print(f"  ✓ Cleaned up {removed} test file(s)")
+
+    print("✓ Storage backend OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Storage backends for processed media
+Local Docker volume (default) or any S3-compatible object store (AWS S3, MinIO, R2)
+
+Select with STORAGE_BACKEND=local|s3. Keys are relative to the processed root and
+sharded by a hash of the video id, e.g. "3f/a2/{video_id}/video.mp4" (see video_key_prefix).
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+
+# Local storage
+PROCESSED_DIR = Path(os.getenv("PROCESSED_DIR", "/app/uploads/processed"))
+
+# S3-compatible storage
+S3_BUCKET = os.getenv("S3_BUCKET") or None
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://minio:9000
+S3_REGION = os.getenv("S3_REGION") or "us-east-1"
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or None  # Falls back to AWS_* env / instance role
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or None
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL") or None  # CDN or public bucket URL
+S3_PREFIX = os.getenv("S3_PREFIX", "processed").strip("/")
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "8"))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "16"))
+
+# Processed files are sharded two levels deep (256 x 256 directories) so no single
+# directory grows with the number of videos
+SHARD_LEVELS = 2
+
+
+def video_key_prefix(video_id: str) -> str:
+    """
+    Storage key prefix for a video's processed files: "ab/cd/{video_id}"
+    
+    Shards come from a hash of the id rather than its leading characters, so they
+    stay evenly filled for time-ordered ids too. Must match the backend
+    (app.services.storage.video_key_prefix).
+    """
+    video_id = str(video_id).lower()
+    digest = hashlib.sha1(video_id.encode()).hexdigest()
+    shards = [digest[level * 2:level * 2 + 2] for level in range(SHARD_LEVELS)]
+    return "/".join([*shards, video_id])
+
+
+# Types mimetypes does not know about
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".webp": "image/webp",
+}
+
+
+def copy_file_data(src: Path, dest: Path):
+    """
+    Copy file contents in the kernel where possible
+    
+    Uses copy_file_range (reflink/server-side copy on supporting filesystems),
+    then sendfile, then a userspace copy as the last resort.
+    """
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+        
+        copied_in_kernel = False
+        for copy_func in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+            if copy_func is None:
+                continue
+            remaining = size
+            try:
+                while remaining > 0:
+                    if copy_func is os.sendfile:
+                        sent = os.sendfile(out_fd, in_fd, None, min(remaining, 1 << 30))
+                    else:
+                        sent = copy_func(in_fd, out_fd, min(remaining, 1 << 30))
+                    if sent == 0:
+                        # Some filesystem pairs (overlay, FUSE, older kernels across
+                        # devices) return 0 instead of failing
+                        break
+                    remaining -= sent
+            except OSError:
+                pass
+            if remaining == 0:
+                copied_in_kernel = True
+                break
+            # Not supported for this pair of files - rewind and try the next method
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        
+        if not copied_in_kernel:
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+    
+    shutil.copystat(src, dest)
+
+
+def publish_file(src: Path, dest: Path, move: bool = False) -> str:
+    """
+    Publish a file to its final location without copying data when possible
+    
+    - Same filesystem, move=True: os.replace (rename)
+    - Same filesystem, move=False: os.link (hard link, source is kept)
+    - Different filesystems: kernel copy (copy_file_range/sendfile), source removed if move=True
+    
+    The destination appears atomically (temp name + os.replace), so readers never
+    see a partially written file.
+    
+    Returns:
+        Method used: "rename", "link" or "copy"
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    same_device = src.stat().st_dev == dest.parent.stat().st_dev
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    
+    if same_device:
+        try:
+            if move:
+                os.replace(src, dest)
+                return "rename"
+            os.link(src, tmp_path)
+            os.replace(tmp_path, dest)
+            return "link"
+        except OSError:
+            # Separate mount points of one filesystem (EXDEV) or no hard link
+            # support - fall back to copying
+            tmp_path.unlink(missing_ok=True)
+    
+    try:
+        copy_file_data(src, tmp_path)
+        copied_size, expected_size = tmp_path.stat().st_size, src.stat().st_size
+        if copied_size != expected_size:
+            raise OSError(f"Incomplete copy of {src}: {copied_size} of {expected_size} bytes")
+        os.replace(tmp_path, dest)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    if move:
+        src.unlink(missing_ok=True)
+    return "copy"
+
+
+class LocalStorage:
+    """Processed media on the shared uploads volume, served by the backend at /uploads"""
+    
+    name = "local"
+    
+    def __init__(self, root: Path = PROCESSED_DIR):
+        self.root = root
+    
+    def url(self, key: str) -> str:
+        return f"/uploads/processed/{key}"
+    
+    def put_file(self, local_path: Path, key: str, move: bool = False) -> tuple[str, str]:
+        """
+        Store a file under key
+        
+        Returns:
+            (url, method) - method is "rename", "link" or "copy"
+        """
+        dest_path = self.root / key
+        method = publish_file(local_path, dest_path, move=move)
+        
+        if not dest_path.exists():
+            raise FileNotFoundError(f"Failed to store file at {dest_path}")
+        
+        return self.url(key), method
+    
+    def local_path(self, key: str) -> Optional[Path]:
+        """Filesystem path of a stored key"""
+        return self.root / key
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete everything stored under prefix (e.g. "ab/cd/{video_id}/"). Returns number of files removed."""
+        target = self.root / prefix.strip("/")
+        if target.is_file():
+            target.unlink()
+            return 1
+        if not target.is_dir():
+            return 0
+        count = sum(1 for path in target.rglob("*") if path.is_file())
+        shutil.rmtree(target, ignore_errors=True)
+        return count
+
+
+class S3Storage:
+    """
+    Processed media in an S3-compatible bucket
+    
+    Large files use concurrent multipart uploads (boto3 transfer manager).
+    URLs are absolute: S3_PUBLIC_BASE_URL (CDN) if set, otherwise the bucket URL.
+    """
+    
+    name = "s3"
+    
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: str = "us-east-1",
+        public_base_url: Optional[str] = None,
+        prefix: str = "processed",
+        max_concurrency: int = 8,
+        chunk_mb: int = 16,
+    ):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+        
+        if not bucket:
+            raise ValueError("S3_BUCKET is required when STORAGE_BACKEND=s3")
+        
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.prefix = prefix
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=S3_ACCESS_KEY_ID,
+            aws_secret_access_key=S3_SECRET_ACCESS_KEY,
+            config=Config(
+                signature_version="s3v4",
+                # Path-style addressing works with MinIO and other S3-compatible stores
+                s3={"addressing_style": "path" if endpoint_url else "auto"},
+                max_pool_connections=max_concurrency * 2,
+                retries={"max_attempts": 5, "mode": "standard"},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_mb * 1024 * 1024,
+            multipart_chunksize=chunk_mb * 1024 * 1024,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+    
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+    
+    def url(self, key: str) -> str:
+        object_key = self.object_key(key)
+        if self.public_base_url:
+            return f"{self.public_base_url}/{object_key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{object_key}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{object_key}"
+    
+    def put_file(self, local_path: Path, key: str, move: bool = False) -> tuple[str, str]:
+        """
+        Upload a file under key (parallel multipart above the chunk size)
+        
+        Returns:
+            (url, method) - method is always "upload"
+        """
+        suffix = local_path.suffix.lower()
+        content_type = CONTENT_TYPES.get(suffix) or mimetypes.guess_type(local_path.name)[0] or "application/octet-stream"
+        
+        self.client.upload_file(
+            str(local_path),
+            self.bucket,
+            self.object_key(key),
+            ExtraArgs={
+                "ContentType": content_type,
+                # Keys are stable per video but can be rewritten by reprocessing
+                "CacheControl": "public, max-age=86400",
+            },
+            Config=self.transfer_config,
+        )
+        
+        if move:
+            local_path.unlink(missing_ok=True)
+        
+        return self.url(key), "upload"
+    
+    def local_path(self, key: str) -> Optional[Path]:
+        """Objects have no local path"""
+        return None
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every object under prefix (e.g. "ab/cd/{video_id}/"). Returns number of objects removed."""
+        deleted = 0
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.object_key(prefix)):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            # list_objects_v2 pages are at most 1000 keys, the delete_objects limit
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+                deleted += len(objects)
+        return deleted
+
+
+_storage = None
+
+
+def get_storage():
+    """Get the configured storage backend (created once per process)"""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            _storage = S3Storage(
+                bucket=S3_BUCKET,
+                endpoint_url=S3_ENDPOINT_URL,
+                region=S3_REGION,
+                public_base_url=S3_PUBLIC_BASE_URL,
+                prefix=S3_PREFIX,
+                max_concurrency=S3_UPLOAD_CONCURRENCY,
+                chunk_mb=S3_MULTIPART_CHUNK_MB,
+            )
+        elif STORAGE_BACKEND == "local":
+            _storage = LocalStorage()
+        else:
+            raise ValueError(f"Invalid STORAGE_BACKEND: {STORAGE_BACKEND} (expected 'local' or 's3')")
+    return _storage
@@ -1,18 +1,28 @@
 """
 FFmpeg Video Processing Worker
-Processes videos: transcodes to MP4, creates thumbnails, stores in local Docker volume
+Processes videos: transcodes to MP4, creates thumbnails, stores via the configured storage backend (local volume or S3)
 """
 import os
+import re
+import base64
 import subprocess
 import json
+import tempfile
+import threading
+import time
 from pathlib import Path
 from typing import Optional
-# boto3 removed - using local storage only
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 from dotenv import load_dotenv
 
+import metrics
+from fingerprint import extract_fingerprint, frame_distances, hash_buckets, to_signed64, to_unsigned64
+from mp4_boxes import Mp4ParseError, parse_mp4
+from storage import get_storage, video_key_prefix
+
 load_dotenv()
 
 # Celery app
@@ -65,62 +75,485 @@ elif DATABASE_URL.startswith("postgresql+psycopg2://"):
 else:
     raise ValueError(f"Invalid DATABASE_URL format: {DATABASE_URL}")
 
-engine = create_engine(DATABASE_URL)
+# Each prefork child runs one task at a time (worker_prefetch_multiplier=1), and a task
+# holds at most one connection, so a small per-process pool is enough. Overflow covers
+# short bursts (e.g. metadata scripts importing this module).
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "2")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "3")),
+    pool_pre_ping=True,  # Verify connections before using them (Postgres restarts, idle timeouts)
+    pool_recycle=3600,  # Recycle connections after 1 hour
+    connect_args={"application_name": "short5_video_worker"},
+)
 SessionLocal = sessionmaker(bind=engine)
 
-# Local storage only - no S3/R2
-# All files stored in /app/uploads/processed/ directory structure
-print("📦 Using local file storage (Docker volume)")
 
-# Processing settings
-TEMP_DIR = Path("/tmp/video_processing")
-TEMP_DIR.mkdir(exist_ok=True)
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    """Drop connections inherited from the parent process after Celery forks a child"""
+    engine.dispose(close=False)
 
-def update_video_status(video_id: str, status: str, **kwargs):
-    """Update video status in database"""
-    from uuid import UUID
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Serve /metrics from the main worker process (children record into Redis)"""
+    metrics.start_heartbeat()
+    metrics.start_http_server()
+
+# Redis for live progress reporting (read by the API at /videos/{id}/progress)
+REDIS_URL = os.getenv("REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("PROGRESS_INTERVAL_SECONDS", "2"))
+PROGRESS_TTL_SECONDS = 60 * 60  # Keep last progress for 1 hour
+_redis_client = None
+
+
+def get_redis_client():
+    """Get (lazily created) Redis client used for progress reporting"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _redis_client
+
+
+def publish_progress(video_id: str, stage: str, percent: Optional[float] = None, **extra):
+    """
+    Publish processing progress for a video to Redis
+    
+    Stored as JSON under video_progress:{video_id} (with TTL) and also published on
+    the channel of the same name. Progress reporting is best-effort: errors are
+    logged and never fail the task.
+    """
+    payload = {
+        "video_id": video_id,
+        "stage": stage,
+        "percent": round(percent, 1) if percent is not None else None,
+        "updated_at": time.time(),
+    }
+    payload.update(extra)
     
     try:
-        with SessionLocal() as session:
-            update_fields = {"status": status}
-            update_fields.update(kwargs)
-            
-            print(f"  → Updating video {video_id}: status={status}")
-            
-            # Convert video_id to UUID
-            video_uuid = UUID(video_id) if isinstance(video_id, str) else video_id
-            
-            # Build SQL with explicit parameter binding for each field
-            # This avoids issues with dynamic SQL generation
-            set_clauses = []
-            params = {"video_id": str(video_uuid)}
-            
-            for key, value in update_fields.items():
-                param_name = f"val_{key}"
-                set_clauses.append(f"{key} = :{param_name}")
-                params[param_name] = value
-            
-            # Build the UPDATE query
-            set_clause = ", ".join(set_clauses)
-            query = text(f"""
-                UPDATE videos 
-                SET {set_clause}, updated_at = CURRENT_TIMESTAMP
-                WHERE id = CAST(:video_id AS uuid)
-            """)
-            
-            result = session.execute(query, params)
-            session.commit()
+        client = get_redis_client()
+        key = f"video_progress:{video_id}"
+        data = json.dumps(payload)
+        client.set(key, data, ex=PROGRESS_TTL_SECONDS)
+        client.publish(key, data)
+    except Exception as e:
+        print(f"  ⚠ Could not publish progress: {e}")
+
+
+def run_ffmpeg(
+    ffmpeg_cmd: list[str],
+    timeout_seconds: int,
+    video_id: Optional[str] = None,
+    duration: Optional[float] = None,
+    stage: str = "transcoding",
+) -> subprocess.CompletedProcess:
+    """
+    Run FFmpeg, optionally reporting live progress
+    
+    When video_id and duration are given, FFmpeg runs with -progress pipe:1 and
+    out_time_ms is compared to the probed duration. Progress is published at most
+    once every PROGRESS_INTERVAL_SECONDS.
+    
+    Raises:
+        subprocess.CalledProcessError: FFmpeg exited with a non-zero code
+        subprocess.TimeoutExpired: FFmpeg ran longer than timeout_seconds
+    """
+    if not video_id or not duration:
+        return subprocess.run(
+            ffmpeg_cmd,
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=timeout_seconds
+        )
+    
+    # Insert progress flags right after "ffmpeg"
+    cmd = [ffmpeg_cmd[0], "-progress", "pipe:1", "-nostats"] + ffmpeg_cmd[1:]
+    
+    started = time.monotonic()
+    last_published = 0.0
+    out_time_seconds = 0.0
+    speed = None
+    
+    timed_out = threading.Event()
+    
+    # stderr goes to a temp file so a chatty FFmpeg can never block on a full pipe
+    with tempfile.TemporaryFile(mode="w+") as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        
+        def kill_at_deadline():
+            if process.poll() is None:
+                timed_out.set()
+                process.kill()
+        
+        # Watchdog: a stalled FFmpeg writes no progress lines, so the read loop below
+        # would never get to check the deadline itself
+        watchdog = threading.Timer(timeout_seconds, kill_at_deadline)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                if key == "out_time_ms":
+                    # Despite the name, FFmpeg reports microseconds here
+                    try:
+                        out_time_seconds = int(value) / 1_000_000
+                    except ValueError:
+                        pass
+                elif key == "speed":
+                    speed = value.rstrip("x") or None
+                elif key == "progress":
+                    now = time.monotonic()
+                    if value == "end" or now - last_published >= PROGRESS_INTERVAL_SECONDS:
+                        last_published = now
+                        percent = min(100.0, max(0.0, out_time_seconds / duration * 100))
+                        publish_progress(
+                            video_id,
+                            stage,
+                            percent,
+                            out_time_seconds=round(out_time_seconds, 2),
+                            duration_seconds=round(duration, 2),
+                            speed=speed,
+                            elapsed_seconds=round(now - started, 1),
+                        )
             
-            if result.rowcount == 0:
-                print(f"  ⚠ No rows updated for video {video_id}")
-            else:
-                print(f"  ✓ Database updated")
-                
+            returncode = process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout_seconds, stderr=stderr)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=None, stderr=stderr)
+    
+    return subprocess.CompletedProcess(cmd, returncode, stdout=None, stderr=stderr)
+
+
+# Processed files go to the configured storage backend (see storage.py)
+# Local: /app/uploads/processed/ab/cd/{video_id}/..., S3: {S3_PREFIX}/ab/cd/{video_id}/...
+print(f"📦 Using {get_storage().name} storage for processed files")
+
+# Processing settings
+# Put TEMP_DIR on the same volume as PROCESSED_DIR (e.g. /app/uploads/.processing) so
+# finished outputs are published with a rename instead of a full-file copy
+TEMP_DIR = Path(os.getenv("VIDEO_TEMP_DIR", "/tmp/video_processing"))
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+
+# Output caps for mobile delivery
+# Width/height describe a portrait bounding box (short side x long side) and are
+# applied orientation-aware, so a 1080x1920 cap also limits landscape to 1920x1080
+TRANSCODE_MAX_WIDTH = int(os.getenv("TRANSCODE_MAX_WIDTH", "1080"))
+TRANSCODE_MAX_HEIGHT = int(os.getenv("TRANSCODE_MAX_HEIGHT", "1920"))
+TRANSCODE_MAXRATE = os.getenv("TRANSCODE_MAXRATE", "4M")  # VBV peak video bitrate
+TRANSCODE_BUFSIZE = os.getenv("TRANSCODE_BUFSIZE", "8M")  # VBV buffer size
+TRANSCODE_KEYFRAME_SECONDS = float(os.getenv("TRANSCODE_KEYFRAME_SECONDS", "2"))  # Short GOP for quick start
+
+# Thumbnails: full-size JPEG plus WebP variants (by width) and a tiny inline placeholder
+THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "160,320,640").split(",") if w.strip()]
+THUMBNAIL_WEBP_QUALITY = int(os.getenv("THUMBNAIL_WEBP_QUALITY", "75"))
+PLACEHOLDER_WIDTH = 16  # LQIP: ~16x28 WebP, a few hundred bytes as a data URI
+
+# Thumbnail frame selection: candidates are decoded keyframes in the first
+# THUMBNAIL_SEARCH_SECONDS, downscaled to a gray 64x64 grid and scored in Python.
+# Decoding is single-threaded and capped by candidate count and a timeout.
+THUMBNAIL_SEARCH_SECONDS = float(os.getenv("THUMBNAIL_SEARCH_SECONDS", "15"))
+THUMBNAIL_MAX_CANDIDATES = int(os.getenv("THUMBNAIL_MAX_CANDIDATES", "12"))
+THUMBNAIL_SELECT_TIMEOUT = int(os.getenv("THUMBNAIL_SELECT_TIMEOUT", "20"))
+THUMBNAIL_SAMPLE_FPS = 2  # Fallback sampling rate when the window has fewer than 2 keyframes
+CANDIDATE_SIZE = 64  # Candidate frames are CANDIDATE_SIZE x CANDIDATE_SIZE gray pixels
+
+# Near-duplicate detection (perceptual fingerprints, see fingerprint.py)
+# DUPLICATE_ACTION: "flag" records duplicate_of and keeps processing, "reject" fails the
+# upload before transcoding. Ad videos are fingerprinted but never rejected.
+FINGERPRINT_ENABLED = os.getenv("FINGERPRINT_ENABLED", "true").lower() in ("1", "true", "yes")
+DUPLICATE_ACTION = os.getenv("DUPLICATE_ACTION", "flag").lower()
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "10"))  # Per-frame Hamming distance
+DUPLICATE_MIN_FRAMES = int(os.getenv("DUPLICATE_MIN_FRAMES", "4"))  # Frames that must be within it
+DUPLICATE_MAX_CANDIDATES = 50
+
+# Optional adaptive-bitrate HLS output (CMAF/fMP4 segments) in addition to the MP4
+HLS_ENABLED = os.getenv("HLS_ENABLED", "false").lower() in ("1", "true", "yes")
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+
+# Rendition ladder (height = short side for landscape, long side is derived from aspect ratio)
+HLS_PROFILES = {
+    "720p": {
+        "height": 720,
+        "bitrate": "2500k",
+        "audio_bitrate": "128k",
+    },
+    "480p": {
+        "height": 480,
+        "bitrate": "1000k",
+        "audio_bitrate": "96k",
+    },
+    "360p": {
+        "height": 360,
+        "bitrate": "600k",
+        "audio_bitrate": "64k",
+    },
+}
+
+
+def parse_bitrate(bitrate_str: str) -> int:
+    """Convert bitrate string (e.g., '2500k', '4M') to bits per second (integer)"""
+    bitrate_str = bitrate_str.strip()
+    if bitrate_str.endswith('k'):
+        return int(float(bitrate_str[:-1]) * 1000)
+    elif bitrate_str.endswith('M'):
+        return int(float(bitrate_str[:-1]) * 1000000)
+    else:
+        return int(bitrate_str)
+
+
+def get_capped_dimensions(width: int, height: int) -> Optional[tuple[int, int]]:
+    """
+    Compute output dimensions that fit inside the configured caps
+    
+    The cap box is rotated to match the video orientation (portrait or landscape)
+    and the aspect ratio is preserved. Dimensions are rounded down to even numbers
+    as required by YUV420P.
+    
+    Returns:
+        (width, height) to scale to, or None if the video already fits
+    """
+    if not width or not height:
+        return None
+    
+    short_cap = min(TRANSCODE_MAX_WIDTH, TRANSCODE_MAX_HEIGHT)
+    long_cap = max(TRANSCODE_MAX_WIDTH, TRANSCODE_MAX_HEIGHT)
+    if width <= height:
+        max_w, max_h = short_cap, long_cap
+    else:
+        max_w, max_h = long_cap, short_cap
+    
+    if width <= max_w and height <= max_h:
+        return None
+    
+    scale = min(max_w / width, max_h / height)
+    capped_w = max(2, int(width * scale) // 2 * 2)
+    capped_h = max(2, int(height * scale) // 2 * 2)
+    return capped_w, capped_h
+
+
+# Columns the worker is allowed to write (field names are interpolated into SQL)
+VIDEO_UPDATE_COLUMNS = frozenset({
+    "status",
+    "error_reason",
+    "url_mp4",
+    "url_hls",
+    "thumbnail",
+    "duration_seconds",
+    "video_metadata_json",
+    "thumbnail_variants_json",
+    "thumbnail_placeholder",
+})
+
+
+def execute_video_update(video_id: str, fields: dict, returning: Optional[list[str]] = None):
+    """
+    Apply all fields to a video row in a single UPDATE statement
+    
+    Args:
+        video_id: UUID of the video record
+        fields: Column -> value mapping (must be in VIDEO_UPDATE_COLUMNS)
+        returning: Optional columns to return from the updated row
+    
+    Returns:
+        Row with the returning columns, or None
+    """
+    unknown = set(fields) - VIDEO_UPDATE_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown video columns: {', '.join(sorted(unknown))}")
+    
+    # Build SQL with explicit parameter binding for each field
+    set_clauses = [f"{key} = :val_{key}" for key in fields]
+    set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+    params = {f"val_{key}": value for key, value in fields.items()}
+    params["video_id"] = str(video_id)
+    
+    returning_clause = f" RETURNING {', '.join(returning)}" if returning else ""
+    query = text(f"""
+        UPDATE videos 
+        SET {', '.join(set_clauses)}
+        WHERE id = CAST(:video_id AS uuid){returning_clause}
+    """)
+    
+    # engine.begin() borrows a pooled connection and commits on exit
+    with engine.begin() as conn:
+        result = conn.execute(query, params)
+        row = result.fetchone() if returning else None
+        rowcount = result.rowcount
+    
+    if rowcount == 0:
+        print(f"  ⚠ No rows updated for video {video_id}")
+    else:
+        print(f"  ✓ Database updated ({', '.join(fields)})")
+    
+    return row
+
+
+def update_video_status(video_id: str, status: str, **kwargs):
+    """Update video status in database (single immediate UPDATE)"""
+    try:
+        print(f"  → Updating video {video_id}: status={status}")
+        execute_video_update(video_id, {"status": status, **kwargs})
     except Exception as e:
         print(f"✗ ERROR updating video status: {e}")
         raise
 
 
+class VideoStatusWriter:
+    """
+    Batches status writes for one processing job
+    
+    Intermediate updates are buffered and written at most once per flush interval.
+    The final READY/FAILED update is merged with anything still pending and issued
+    as one statement with all fields, so a successful job costs two UPDATEs in total
+    (start + finish).
+    """
+    
+    def __init__(self, video_id: str, flush_interval: float = 10.0):
+        self.video_id = video_id
+        self.flush_interval = flush_interval
+        self.pending: dict = {}
+        self.last_flush = time.monotonic()
+    
+    def start(self) -> Optional[str]:
+        """
+        Mark the video as processing and clear previous errors
+        
+        Returns:
+            The video's ad_link (read in the same statement via RETURNING),
+            or None if the video is not an ad
+        """
+        print(f"  → Updating video {self.video_id}: status=processing")
+        row = execute_video_update(
+            self.video_id,
+            {"status": "processing", "error_reason": None},
+            returning=["ad_link"],
+        )
+        self.last_flush = time.monotonic()
+        return row[0] if row else None
+    
+    def update(self, **fields):
+        """Buffer intermediate fields, flushing if the interval has elapsed"""
+        self.pending.update(fields)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """Write buffered fields now (no-op if nothing is pending)"""
+        if not self.pending:
+            return
+        fields, self.pending = self.pending, {}
+        execute_video_update(self.video_id, fields)
+        self.last_flush = time.monotonic()
+    
+    def finish(self, status: str, **fields):
+        """Write the terminal status together with all pending and final fields"""
+        final_fields = {**self.pending, **fields, "status": status}
+        self.pending = {}
+        try:
+            print(f"  → Updating video {self.video_id}: status={status}")
+            execute_video_update(self.video_id, final_fields)
+        except Exception as e:
+            print(f"✗ ERROR updating video status: {e}")
+            raise
+
+
+def find_near_duplicate(video_id: str, hashes: list[int], duration: float) -> Optional[tuple[str, float]]:
+    """
+    Find the closest earlier video with a matching fingerprint
+    
+    Candidates were uploaded before this video, share at least one hash bucket and
+    have a similar duration (reposts are often trimmed slightly). The ones sharing the
+    most buckets are verified on the full frame hashes.
+    
+    Returns:
+        (video_id, mean Hamming distance) of the best match, or None
+    """
+    buckets = sorted(hash_buckets(hashes))
+    if not buckets:
+        return None
+    tolerance = max(1.0, duration * 0.05)
+    query = text("""
+        SELECT f.video_id, f.frame_hashes
+        FROM (
+            SELECT video_id, count(*) AS shared_buckets
+            FROM video_fingerprint_buckets
+            WHERE bucket = ANY(:buckets)
+            GROUP BY video_id
+        ) matches
+        JOIN video_fingerprints f ON f.video_id = matches.video_id
+        JOIN videos v ON v.id = f.video_id
+        WHERE f.video_id <> CAST(:video_id AS uuid)
+          AND v.created_at < (SELECT created_at FROM videos WHERE id = CAST(:video_id AS uuid))
+          AND f.duration_seconds BETWEEN :min_duration AND :max_duration
+          AND v.status IN ('processing', 'ready')
+        ORDER BY matches.shared_buckets DESC, v.created_at
+        LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {
+            "buckets": buckets,
+            "video_id": str(video_id),
+            "min_duration": duration - tolerance,
+            "max_duration": duration + tolerance,
+            "limit": DUPLICATE_MAX_CANDIDATES,
+        }).fetchall()
+    
+    best = None
+    for candidate_id, candidate_hashes in rows:
+        distances = frame_distances(hashes, [to_unsigned64(value) for value in candidate_hashes])
+        if sum(distance <= DUPLICATE_MAX_DISTANCE for distance in distances) < DUPLICATE_MIN_FRAMES:
+            continue
+        mean_distance = sum(distances) / len(distances)
+        if best is None or mean_distance < best[1]:
+            best = (str(candidate_id), mean_distance)
+    return best
+
+
+def save_fingerprint(
+    video_id: str,
+    hashes: list[int],
+    duration: float,
+    duplicate: Optional[tuple[str, float]] = None,
+):
+    """Store (or replace, on reprocessing) a video's fingerprint and its hash buckets"""
+    params = {"video_id": str(video_id)}
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO video_fingerprints (video_id, frame_hashes, duration_seconds, duplicate_of, duplicate_distance)
+            VALUES (CAST(:video_id AS uuid), :frame_hashes, :duration, CAST(:duplicate_of AS uuid), :distance)
+            ON CONFLICT (video_id) DO UPDATE SET
+                frame_hashes = EXCLUDED.frame_hashes,
+                duration_seconds = EXCLUDED.duration_seconds,
+                duplicate_of = EXCLUDED.duplicate_of,
+                duplicate_distance = EXCLUDED.duplicate_distance
+        """), {
+            **params,
+            "frame_hashes": [to_signed64(value) for value in hashes],
+            "duration": duration,
+            "duplicate_of": duplicate[0] if duplicate else None,
+            "distance": duplicate[1] if duplicate else None,
+        })
+        conn.execute(text("DELETE FROM video_fingerprint_buckets WHERE video_id = CAST(:video_id AS uuid)"), params)
+        conn.execute(
+            text("INSERT INTO video_fingerprint_buckets (bucket, video_id) VALUES (:bucket, CAST(:video_id AS uuid))"),
+            [{"bucket": bucket, **params} for bucket in sorted(hash_buckets(hashes))],
+        )
+
+
 def cleanup_failed_video(video_id: str, file_path: Path):
     """
     Clean up files for a failed video
@@ -142,26 +575,20 @@ def cleanup_failed_video(video_id: str, file_path: Path):
     except Exception as e:
         print(f"  ⚠ Could not clean up original file {file_path}: {e}")
     
-    # Clean up processed files (look for files with video_id in name)
+    # Clean up processed files at their exact locations (no scan of the processed tree)
+    storage = get_storage()
     try:
-        processed_dir = Path(f"/app/uploads/processed")
-        if processed_dir.exists():
-            for processed_file in processed_dir.glob(f"*{video_id}*"):
-                try:
-                    if processed_file.is_file():
-                        processed_file.unlink()
-                        cleaned.append(f"processed file: {processed_file.name}")
-                    elif processed_file.is_dir():
-                        shutil.rmtree(processed_file, ignore_errors=True)
-                        cleaned.append(f"processed directory: {processed_file.name}")
-                except Exception as e:
-                    print(f"  ⚠ Could not clean up {processed_file}: {e}")
+        removed = storage.delete_prefix(f"{video_key_prefix(video_id)}/")
+        # Pre-sharding layout: processed/{video_id}/
+        removed += storage.delete_prefix(f"{video_id}/")
+        if removed:
+            cleaned.append(f"processed files: {removed}")
     except Exception as e:
         print(f"  ⚠ Could not clean up processed files: {e}")
     
     # Clean up temp directory
     try:
-        temp_dir = Path(f"/tmp/video_processing/{video_id}")
+        temp_dir = TEMP_DIR / video_id
         if temp_dir.exists() and temp_dir.is_dir():
             shutil.rmtree(temp_dir, ignore_errors=True)
             cleaned.append(f"temp directory: {temp_dir}")
@@ -180,51 +607,166 @@ def check_mp4_faststart(file_path: Path) -> bool:
     Check if MP4 file has faststart (moov atom before mdat atom)
     Faststart means the metadata is at the beginning, allowing streaming without full download
     
+    Walks the top-level boxes by size (see mp4_boxes), so large ftyp/free boxes
+    or 'moov' bytes inside the payload cannot confuse it.
+    
     Returns:
         True if faststart is enabled (moov before mdat), False otherwise
     """
     try:
-        # Read first 64KB to check atom order (moov should appear early if faststart is enabled)
-        with open(file_path, 'rb') as f:
-            header = f.read(65536)  # 64KB should be enough to find moov atom if it's at the start
-        
-        # Find positions of key atoms
-        moov_pos = header.find(b'moov')
-        mdat_pos = header.find(b'mdat')
-        
-        # If moov is not found, file might be corrupted or not a valid MP4
-        if moov_pos == -1:
-            return False
-        
-        # Faststart means moov comes before mdat
-        # If mdat is not found in header, moov is definitely at the start (good sign)
-        if mdat_pos == -1:
-            return True
-        
-        # Check if moov comes before mdat
-        return moov_pos < mdat_pos
-        
-    except Exception as e:
+        return parse_mp4(file_path)["faststart"]
+    except (OSError, Mp4ParseError) as e:
         print(f"  ⚠ Could not check faststart: {e}")
         return False
 
 
+def build_video_metadata(
+    file_path: Path,
+    format_name: str,
+    duration: float,
+    video_codec: Optional[str],
+    audio_codec: Optional[str],
+    pixel_format: Optional[str],
+    width: Optional[int],
+    height: Optional[int],
+    fps: Optional[float],
+    bit_rate: Optional[int],
+    has_faststart: Optional[bool] = None,
+) -> dict:
+    """
+    Derive output caps and web optimization status from probed stream info
+    (shared by the MP4 box pre-probe and the ffprobe path)
+    
+    Args:
+        has_faststart: Already known from a box walk; checked from the file if None
+    """
+    # Check if it's MP4 format
+    is_mp4 = "mp4" in format_name or "mov" in format_name
+    
+    # Check output caps (resolution and bitrate)
+    capped_dimensions = get_capped_dimensions(width, height) if width and height else None
+    exceeds_bitrate_cap = bool(
+        bit_rate and bit_rate > parse_bitrate(TRANSCODE_MAXRATE) + 128000  # Allow for audio
+    )
+    exceeds_output_caps = capped_dimensions is not None or exceeds_bitrate_cap
+    
+    # Check faststart for MP4 files
+    if is_mp4 and file_path.suffix.lower() == ".mp4":
+        if has_faststart is None:
+            has_faststart = check_mp4_faststart(file_path)
+    else:
+        has_faststart = False
+    
+    # Check web optimization criteria:
+    # 1. MP4 container
+    # 2. H.264/AVC video codec
+    # 3. AAC audio codec (or MP3 as fallback)
+    # 4. Faststart enabled
+    # 5. YUV420P pixel format (for maximum compatibility)
+    is_web_optimized = (
+        is_mp4 and
+        video_codec in ["h264", "avc", "libx264"] and
+        audio_codec in ["aac", "mp3"] and
+        has_faststart and
+        pixel_format in ["yuv420p", "yuvj420p"]  # yuvj420p is also compatible
+    )
+    
+    return {
+        "format_name": format_name,
+        "duration": duration,
+        "is_mp4": is_mp4,
+        "has_faststart": has_faststart,
+        "is_web_optimized": is_web_optimized,
+        "video_codec": video_codec,
+        "audio_codec": audio_codec,
+        "pixel_format": pixel_format,
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "bit_rate": bit_rate,
+        "capped_dimensions": capped_dimensions,
+        "exceeds_output_caps": exceeds_output_caps,
+    }
+
+
+def probe_mp4_metadata(file_path: Path) -> Optional[dict]:
+    """
+    Fast pre-probe for MP4/MOV uploads: reads moov directly instead of running ffprobe
+    
+    Returns:
+        Same dict as get_video_metadata, or None if the box walk cannot answer
+        everything the remux-vs-transcode decision needs (caller falls back to ffprobe)
+    """
+    if file_path.suffix.lower() not in (".mp4", ".mov", ".m4v"):
+        return None
+    try:
+        info = parse_mp4(file_path)
+    except (OSError, Mp4ParseError) as e:
+        print(f"  ⚠ MP4 pre-probe failed, using ffprobe: {e}")
+        return None
+    
+    # Fragmented or truncated files keep part of their index outside moov
+    if info["truncated"] or info["fragmented"] or not info["duration"]:
+        return None
+    
+    video = next((track for track in info["tracks"] if track["type"] == "video"), None)
+    audio = next((track for track in info["tracks"] if track["type"] == "audio"), None)
+    if not video or not video["codec"] or not video["width"] or not video["height"] or not video["frame_rate"]:
+        return None
+    if audio and not audio["codec"]:
+        return None
+    # Pixel format only matters (and is only inferred from avcC) for H.264
+    if video["codec"] == "h264" and not video["pixel_format"]:
+        return None
+    
+    width, height = video["width"], video["height"]
+    # Same display-orientation swap as the ffprobe path
+    if video["rotation"] % 180 == 90:
+        width, height = height, width
+    
+    duration = info["duration"]
+    bit_rate = int(file_path.stat().st_size * 8 / duration)
+    
+    return build_video_metadata(
+        file_path,
+        format_name="mov,mp4,m4a,3gp,3g2,mj2",  # ffprobe's name for the ISO BMFF demuxer
+        duration=duration,
+        video_codec=video["codec"],
+        audio_codec=audio["codec"] if audio else None,
+        pixel_format=video["pixel_format"],
+        width=width,
+        height=height,
+        fps=video["frame_rate"],
+        bit_rate=bit_rate,
+        has_faststart=info["faststart"],
+    )
+
+
 def get_video_metadata(file_path: Path) -> tuple[Optional[dict], Optional[str]]:
     """
     Get all video metadata in a single ffprobe call
     Checks format, codecs, and web optimization status
     
+    MP4/MOV files are first read with the box parser (probe_mp4_metadata); ffprobe
+    only runs when that cannot answer.
+    
     Returns:
         (metadata_dict, error_message)
-        metadata_dict contains: format_name, duration, is_mp4, has_faststart, is_web_optimized, video_codec, audio_codec
+        metadata_dict contains: format_name, duration, is_mp4, has_faststart, is_web_optimized, video_codec, audio_codec,
+        width, height, fps, bit_rate, capped_dimensions, exceeds_output_caps
     """
+    metadata = probe_mp4_metadata(file_path)
+    if metadata:
+        return metadata, None
+    
     try:
         # Single ffprobe call to get format, codecs, and pixel format
         ffprobe_cmd = [
             "ffprobe",
             "-v", "error",
-            "-show_entries", "format=format_name:format=duration",
-            "-show_entries", "stream=codec_name:stream=codec_type:stream=pix_fmt",
+            "-show_entries", "format=format_name:format=duration:format=bit_rate",
+            "-show_entries", "stream=codec_name:stream=codec_type:stream=pix_fmt:stream=width:stream=height:stream=bit_rate:stream=avg_frame_rate",
+            "-show_entries", "stream_tags=rotate:stream_side_data=rotation",
             "-of", "json",  # Use JSON for structured output
             str(file_path),
         ]
@@ -258,13 +800,13 @@ def get_video_metadata(file_path: Path) -> tuple[Optional[dict], Optional[str]]:
             except (ValueError, TypeError):
                 return None, "Could not parse video duration"
             
-            # Check if it's MP4 format
-            is_mp4 = "mp4" in format_name or "mov" in format_name
-            
             # Extract video and audio codecs
             video_codec = None
             audio_codec = None
             pixel_format = None
+            width = None
+            height = None
+            fps = None
             
             for stream in streams:
                 codec_type = stream.get("codec_type", "").lower()
@@ -273,39 +815,50 @@ def get_video_metadata(file_path: Path) -> tuple[Optional[dict], Optional[str]]:
                 if codec_type == "video" and video_codec is None:
                     video_codec = codec_name
                     pixel_format = stream.get("pix_fmt", "").lower()
+                    width = stream.get("width")
+                    height = stream.get("height")
+                    
+                    # Parse frame rate (e.g., "30000/1001" -> 29.97)
+                    try:
+                        num, _, den = stream.get("avg_frame_rate", "").partition("/")
+                        fps = float(num) / float(den or 1) or None
+                    except (ValueError, ZeroDivisionError):
+                        pass
+                    
+                    # Phones store portrait video as landscape + rotation metadata.
+                    # FFmpeg autorotates on decode, so swap to the displayed dimensions.
+                    rotation = stream.get("tags", {}).get("rotate")
+                    for side_data in stream.get("side_data_list", []):
+                        if "rotation" in side_data:
+                            rotation = side_data["rotation"]
+                    try:
+                        if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+                            width, height = height, width
+                    except (ValueError, TypeError):
+                        pass
                 elif codec_type == "audio" and audio_codec is None:
                     audio_codec = codec_name
             
-            # Check faststart for MP4 files
-            has_faststart = False
-            if is_mp4 and file_path.suffix.lower() == ".mp4":
-                has_faststart = check_mp4_faststart(file_path)
+            # Overall bitrate (used to detect uploads above the VBV cap)
+            bit_rate = None
+            try:
+                bit_rate = int(format_info["bit_rate"]) if format_info.get("bit_rate") else None
+            except (ValueError, TypeError):
+                pass
             
-            # Check web optimization criteria:
-            # 1. MP4 container
-            # 2. H.264/AVC video codec
-            # 3. AAC audio codec (or MP3 as fallback)
-            # 4. Faststart enabled
-            # 5. YUV420P pixel format (for maximum compatibility)
-            is_web_optimized = (
-                is_mp4 and
-                video_codec in ["h264", "avc", "libx264"] and
-                audio_codec in ["aac", "mp3"] and
-                has_faststart and
-                pixel_format in ["yuv420p", "yuvj420p"]  # yuvj420p is also compatible
+            metadata = build_video_metadata(
+                file_path,
+                format_name=format_name,
+                duration=duration,
+                video_codec=video_codec,
+                audio_codec=audio_codec,
+                pixel_format=pixel_format,
+                width=width,
+                height=height,
+                fps=fps,
+                bit_rate=bit_rate,
             )
             
-            metadata = {
-                "format_name": format_name,
-                "duration": duration,
-                "is_mp4": is_mp4,
-                "has_faststart": has_faststart,
-                "is_web_optimized": is_web_optimized,
-                "video_codec": video_codec,
-                "audio_codec": audio_codec,
-                "pixel_format": pixel_format,
-            }
-            
             return metadata, None
             
         except json.JSONDecodeError as e:
@@ -466,17 +1019,42 @@ def get_detailed_video_metadata(file_path: Path) -> tuple[Optional[dict], Option
         return None, f"Error getting detailed video metadata: {str(e)[:200]}"
 
 
-def transcode_to_mp4(input_path: Path, output_path: Path):
+def transcode_to_mp4(
+    input_path: Path,
+    output_path: Path,
+    dimensions: Optional[tuple[int, int]] = None,
+    video_id: Optional[str] = None,
+    duration: Optional[float] = None,
+):
     """
     Transcode video to MP4 format optimized for web playback
     Uses H.264 video codec and AAC audio codec for maximum browser compatibility
+    
+    Output is capped for mobile delivery: CRF quality limited by a VBV maxrate/bufsize,
+    and a fixed keyframe interval so playback can start quickly.
+    
+    Args:
+        input_path: Path to input video file
+        output_path: Path where MP4 will be saved
+        dimensions: Optional (width, height) to scale to (see get_capped_dimensions)
+        video_id: If set together with duration, live progress is published to Redis
+        duration: Probed source duration in seconds
     """
     ffmpeg_cmd = [
         "ffmpeg",
         "-i", str(input_path),
+    ]
+    
+    if dimensions:
+        ffmpeg_cmd += ["-vf", f"scale={dimensions[0]}:{dimensions[1]}"]
+    
+    ffmpeg_cmd += [
         "-c:v", "libx264",
         "-preset", "medium",
         "-crf", "23",  # Good quality/size balance
+        "-maxrate", TRANSCODE_MAXRATE,  # Cap peak bitrate (VBV)
+        "-bufsize", TRANSCODE_BUFSIZE,
+        "-force_key_frames", f"expr:gte(t,n_forced*{TRANSCODE_KEYFRAME_SECONDS})",  # Keyframe every N seconds
         "-c:a", "aac",
         "-b:a", "128k",  # Audio bitrate
         "-movflags", "+faststart",  # Optimize for web streaming (metadata at beginning)
@@ -489,13 +1067,7 @@ def transcode_to_mp4(input_path: Path, output_path: Path):
     # This ensures we have time for cleanup before hard timeout
     timeout_seconds = 25 * 60
     
-    result = subprocess.run(
-        ffmpeg_cmd,
-        check=True,
-        capture_output=True,
-        text=True,
-        timeout=timeout_seconds
-    )
+    result = run_ffmpeg(ffmpeg_cmd, timeout_seconds, video_id, duration, stage="transcoding")
     
     if result.stderr and "error" in result.stderr.lower():
         print(f"    FFmpeg warning/error: {result.stderr[:200]}")
@@ -503,6 +1075,235 @@ def transcode_to_mp4(input_path: Path, output_path: Path):
     return output_path
 
 
+def get_hls_renditions(width: Optional[int], height: Optional[int]) -> list[dict]:
+    """
+    Select the HLS renditions for a video
+    
+    Renditions larger than the source are skipped (no upscaling), but the smallest
+    profile is always kept so every video gets at least one variant.
+    Output sizes are computed for the displayed orientation.
+    
+    Returns:
+        List of dicts with name, width, height, bitrate, audio_bitrate
+    """
+    profiles = sorted(HLS_PROFILES.items(), key=lambda item: item[1]["height"], reverse=True)
+    short_side = min(width, height) if width and height else None
+    
+    renditions = []
+    for name, profile in profiles:
+        if short_side and profile["height"] > short_side:
+            continue
+        
+        # Scale the short side to the profile height, preserving aspect ratio
+        if width and height:
+            scale = profile["height"] / min(width, height)
+            out_w = max(2, int(width * scale) // 2 * 2)
+            out_h = max(2, int(height * scale) // 2 * 2)
+        else:
+            out_w, out_h = -2, profile["height"]
+        
+        renditions.append({**profile, "name": name, "width": out_w, "height": out_h})
+    
+    if not renditions:
+        name, profile = profiles[-1]
+        # Source is smaller than every profile - keep its own size
+        out_w = width // 2 * 2 if width else -2
+        out_h = height // 2 * 2 if height else profile["height"]
+        renditions.append({**profile, "name": name, "width": out_w, "height": out_h})
+    
+    return renditions
+
+
+def create_hls_ladder(
+    input_path: Path,
+    output_dir: Path,
+    renditions: list[dict],
+    has_audio: bool = True,
+    video_id: Optional[str] = None,
+    duration: Optional[float] = None,
+) -> Path:
+    """
+    Encode an HLS rendition ladder from a single decode
+    
+    The source is decoded once and split into one scaled stream per rendition.
+    Segments are fragmented MP4 (CMAF) with aligned keyframes so players can switch
+    between renditions at every segment boundary.
+    
+    Layout:
+        output_dir/master.m3u8
+        output_dir/v0/index.m3u8, output_dir/v0/init.mp4, output_dir/v0/seg_000.m4s, ...
+    
+    Returns:
+        Path to the master playlist
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    count = len(renditions)
+    
+    # [0:v]split=N[s0][s1]...;[s0]scale=W:H[v0];[s1]scale=W:H[v1];...
+    split_outputs = "".join(f"[s{i}]" for i in range(count))
+    filters = [f"[0:v]split={count}{split_outputs}"]
+    for i, rendition in enumerate(renditions):
+        filters.append(f"[s{i}]scale={rendition['width']}:{rendition['height']}[v{i}]")
+    
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-i", str(input_path),
+        "-filter_complex", ";".join(filters),
+    ]
+    
+    stream_map = []
+    for i, rendition in enumerate(renditions):
+        maxrate = parse_bitrate(rendition["bitrate"]) * 107 // 100  # 7% headroom
+        ffmpeg_cmd += [
+            "-map", f"[v{i}]",
+            f"-c:v:{i}", "libx264",
+            f"-b:v:{i}", rendition["bitrate"],
+            f"-maxrate:v:{i}", str(maxrate),
+            f"-bufsize:v:{i}", str(maxrate * 2),
+        ]
+        if has_audio:
+            ffmpeg_cmd += [
+                "-map", "a:0",
+                f"-c:a:{i}", "aac",
+                f"-b:a:{i}", rendition["audio_bitrate"],
+            ]
+            stream_map.append(f"v:{i},a:{i},name:{rendition['name']}")
+        else:
+            stream_map.append(f"v:{i},name:{rendition['name']}")
+    
+    ffmpeg_cmd += [
+        "-preset", "medium",
+        "-pix_fmt", "yuv420p",
+        # Keyframe at every segment boundary, identical across renditions
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        "-sc_threshold", "0",
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_flags", "independent_segments",
+        "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", str(output_dir / "v%v" / "seg_%03d.m4s"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", " ".join(stream_map),
+        "-y",
+        str(output_dir / "v%v" / "index.m3u8"),
+    ]
+    
+    # Same budget as the MP4 transcode
+    timeout_seconds = 25 * 60
+    
+    run_ffmpeg(ffmpeg_cmd, timeout_seconds, video_id, duration, stage="hls")
+    
+    master_path = output_dir / "master.m3u8"
+    if not master_path.exists():
+        raise FileNotFoundError(f"HLS master playlist was not created at {master_path}")
+    
+    return master_path
+
+
+def decode_thumbnail_candidates(input_path: Path, keyframes_only: bool = True) -> list[tuple[float, bytes]]:
+    """
+    Decode candidate frames as (pts_time, gray pixels) from the start of the video
+    
+    keyframes_only skips decoding of all non-key frames (-skip_frame nokey), which is
+    what keeps selection cheap; otherwise frames are sampled at THUMBNAIL_SAMPLE_FPS.
+    """
+    filters = f"scale={CANDIDATE_SIZE}:{CANDIDATE_SIZE}:flags=fast_bilinear,format=gray,showinfo"
+    ffmpeg_cmd = ["ffmpeg", "-hide_banner", "-nostdin", "-threads", "1"]
+    if keyframes_only:
+        ffmpeg_cmd += ["-skip_frame", "nokey"]
+    else:
+        filters = f"fps={THUMBNAIL_SAMPLE_FPS}," + filters
+    ffmpeg_cmd += [
+        "-t", str(THUMBNAIL_SEARCH_SECONDS),
+        "-i", str(input_path),
+        "-an", "-sn",
+        "-vf", filters,
+        "-fps_mode", "passthrough",
+        "-frames:v", str(THUMBNAIL_MAX_CANDIDATES),
+        "-threads", "1",
+        "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1",
+    ]
+    result = subprocess.run(ffmpeg_cmd, check=True, capture_output=True, timeout=THUMBNAIL_SELECT_TIMEOUT)
+    
+    # showinfo logs one line per frame in output order: "... n:   0 pts: 0 pts_time:0 ..."
+    pts_times = [
+        float(match.group(1))
+        for match in re.finditer(rb"pts_time:\s*(-?[0-9.]+)", result.stderr)
+    ]
+    frame_size = CANDIDATE_SIZE * CANDIDATE_SIZE
+    frames = [result.stdout[i:i + frame_size] for i in range(0, len(result.stdout) - frame_size + 1, frame_size)]
+    return list(zip(pts_times, frames))
+
+
+def score_thumbnail_candidates(frames: list[bytes]) -> list[float]:
+    """
+    Score candidate frames (higher is better)
+    
+    - brightness: mean luma close to mid-gray; near-black or blown-out frames are rejected
+    - sharpness: mean gradient magnitude (blur and motion blur flatten gradients)
+    - scene change: mean difference to the neighbouring candidate, so frames showing
+      new content beat repeats of the same shot
+    Flat frames (fades, title cards in one colour) are rejected by their contrast.
+    """
+    size = CANDIDATE_SIZE
+    stats = []
+    for pixels in frames:
+        count = len(pixels)
+        mean = sum(pixels) / count
+        variance = sum((p - mean) ** 2 for p in pixels) / count
+        gradient = 0
+        for row in range(size - 1):
+            offset = row * size
+            line, below = pixels[offset:offset + size], pixels[offset + size:offset + 2 * size]
+            gradient += sum(abs(a - b) for a, b in zip(line, line[1:]))
+            gradient += sum(abs(a - b) for a, b in zip(line, below))
+        stats.append((mean, variance ** 0.5, gradient / (2 * (size - 1) * size)))
+    
+    scene = []
+    for index, pixels in enumerate(frames):
+        neighbour = frames[index - 1] if index > 0 else frames[index + 1] if len(frames) > 1 else pixels
+        scene.append(sum(abs(a - b) for a, b in zip(pixels, neighbour)) / len(pixels))
+    
+    max_sharpness = max((stat[2] for stat in stats), default=0) or 1
+    max_scene = max(scene, default=0) or 1
+    scores = []
+    for (mean, contrast, sharpness), change in zip(stats, scene):
+        score = (
+            0.3 * (1 - abs(mean - 128) / 128)
+            + 0.5 * sharpness / max_sharpness
+            + 0.2 * change / max_scene
+        )
+        if mean < 24 or mean > 235 or contrast < 10:
+            score -= 1  # Only chosen if every candidate is unusable
+        scores.append(score)
+    return scores
+
+
+def select_thumbnail_timestamp(input_path: Path) -> Optional[float]:
+    """
+    Pick the best thumbnail frame near the start of the video
+    
+    Returns the chosen frame's time in seconds, or None if no candidates could be
+    decoded (the caller then falls back to a fixed timestamp).
+    """
+    try:
+        candidates = decode_thumbnail_candidates(input_path, keyframes_only=True)
+        if len(candidates) < 2:
+            # Long GOP (or a very short clip): sample the window instead
+            candidates = decode_thumbnail_candidates(input_path, keyframes_only=False) or candidates
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        print(f"  ⚠ Thumbnail frame selection failed: {type(e).__name__}")
+        return None
+    if not candidates:
+        return None
+    
+    scores = score_thumbnail_candidates([pixels for _, pixels in candidates])
+    best = max(range(len(candidates)), key=scores.__getitem__)
+    return max(candidates[best][0], 0.0)
+
+
 def create_thumbnail(input_path: Path, output_path: Path, timestamp: str = "00:00:03"):
     """
     Create thumbnail from video
@@ -539,39 +1340,91 @@ def create_thumbnail(input_path: Path, output_path: Path, timestamp: str = "00:0
     return output_path
 
 
-def store_file(local_path: Path, storage_key: str) -> str:
+def create_thumbnail_set(
+    input_path: Path,
+    output_dir: Path,
+    timestamp: str = "00:00:03",
+    source_width: Optional[int] = None,
+) -> dict:
+    """
+    Create the full-size JPEG thumbnail, sized WebP variants and an LQIP placeholder
+    from one decoded frame (single FFmpeg run, the frame is split and scaled per output)
+    
+    Variants wider than the source are skipped. If the combined run fails (e.g. FFmpeg
+    built without libwebp), only the JPEG is created.
+    
+    Returns:
+        {"jpeg": Path, "variants": {width: Path}, "placeholder": data URI or None}
+    """
+    jpeg_path = output_dir / "thumbnail.jpg"
+    widths = [w for w in THUMBNAIL_WIDTHS if not source_width or w < source_width]
+    variant_paths = {width: output_dir / f"thumb_{width}.webp" for width in widths}
+    placeholder_path = output_dir / "placeholder.webp"
+    
+    # [0:v] -> split -> full JPEG, one scaled WebP per width, tiny placeholder
+    outputs = len(widths) + 2
+    filters = [f"[0:v]split={outputs}[full]{''.join(f'[s{w}]' for w in widths)}[lqip]"]
+    filters += [f"[s{w}]scale={w}:-1[o{w}]" for w in widths]
+    filters.append(f"[lqip]scale={PLACEHOLDER_WIDTH}:-1[olqip]")
+    
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-y",
+        "-ss", timestamp,  # Seek before input (faster)
+        "-i", str(input_path),
+        "-filter_complex", ";".join(filters),
+        "-map", "[full]", "-frames:v", "1", "-q:v", "2", str(jpeg_path),
+    ]
+    for width, path in variant_paths.items():
+        ffmpeg_cmd += [
+            "-map", f"[o{width}]", "-frames:v", "1",
+            "-c:v", "libwebp", "-quality", str(THUMBNAIL_WEBP_QUALITY), str(path),
+        ]
+    ffmpeg_cmd += [
+        "-map", "[olqip]", "-frames:v", "1",
+        "-c:v", "libwebp", "-quality", "30", str(placeholder_path),
+    ]
+    
+    try:
+        subprocess.run(ffmpeg_cmd, check=True, capture_output=True, timeout=120)
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors="replace") if e.stderr else ""
+        print(f"  ⚠ Thumbnail variants failed, creating JPEG only: {stderr[-300:]}")
+        create_thumbnail(input_path, jpeg_path, timestamp)
+        return {"jpeg": jpeg_path, "variants": {}, "placeholder": None}
+    
+    if not jpeg_path.exists():
+        raise FileNotFoundError(f"Thumbnail was not created at {jpeg_path}")
+    
+    placeholder = None
+    if placeholder_path.exists():
+        placeholder = "data:image/webp;base64," + base64.b64encode(placeholder_path.read_bytes()).decode("ascii")
+        placeholder_path.unlink()
+    
+    return {
+        "jpeg": jpeg_path,
+        "variants": {width: path for width, path in variant_paths.items() if path.exists()},
+        "placeholder": placeholder,
+    }
+
+
+def store_file(local_path: Path, storage_key: str, move: bool = False) -> str:
     """
-    Store file in local storage (Docker volume)
+    Store file in the configured storage backend (local Docker volume or S3)
     
     Args:
         local_path: Path to source file
-        storage_key: Storage path key (e.g., "{video_id}/video.mp4")
+        storage_key: Storage path key (e.g., "ab/cd/{video_id}/video.mp4", see video_key_prefix)
+        move: Source is a temp file that may be consumed (renamed) instead of linked/copied
     
     Returns:
-        URL path that backend can serve (e.g., "/uploads/processed/{video_id}/video.mp4")
+        URL the API can serve or redirect to
+        (local: "/uploads/processed/ab/cd/{video_id}/video.mp4", S3: absolute object/CDN URL)
     """
     try:
-        # Store files in processed directory
-        # Structure: processed/{video_id}/video.mp4
-        #           processed/{video_id}/thumbnail.jpg
-        local_storage = Path("/app/uploads/processed")
-        local_storage.mkdir(parents=True, exist_ok=True)
-        
-        # Create destination path preserving directory structure
-        dest_path = local_storage / storage_key
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        import shutil
-        shutil.copy2(local_path, dest_path)
-        
-        # Verify file was copied
-        if not dest_path.exists():
-            raise FileNotFoundError(f"Failed to copy file to {dest_path}")
-        
-        # Return a path that backend can serve (backend mounts /uploads)
-        url_path = f"/uploads/processed/{storage_key}"
-        print(f"  ✓ File stored: {dest_path} → {url_path}")
-        return url_path
+        url, method = get_storage().put_file(local_path, storage_key, move=move)
+        print(f"  ✓ File stored ({method}): {storage_key} → {url}")
+        return url
     except Exception as e:
         print(f"✗ ERROR storing file: {e}")
         import traceback
@@ -579,9 +1432,29 @@ def store_file(local_path: Path, storage_key: str) -> str:
         raise
 
 
+def store_directory(local_dir: Path, storage_prefix: str, move: bool = False) -> str:
+    """
+    Store every file under a directory, preserving the layout
+    
+    Args:
+        local_dir: Directory to store (e.g., HLS output)
+        storage_prefix: Storage path prefix (e.g., "ab/cd/{video_id}/hls")
+        move: Files may be consumed (renamed) instead of linked/copied
+    
+    Returns:
+        URL of the stored directory (e.g., "/uploads/processed/ab/cd/{video_id}/hls")
+    """
+    for file_path in sorted(local_dir.rglob("*")):
+        if file_path.is_file():
+            relative = file_path.relative_to(local_dir).as_posix()
+            store_file(file_path, f"{storage_prefix}/{relative}", move=move)
+    
+    return get_storage().url(storage_prefix)
+
+
 # Register the task with multiple names to handle cross-app task sending
 @celery_app.task(name="process_video", bind=True, max_retries=0)
-def process_video(self, video_id: str, file_path: str):
+def process_video(self, video_id: str, file_path: str, enqueued_at: Optional[float] = None):
     """
     Main video processing task with comprehensive error handling
     
@@ -593,7 +1466,12 @@ def process_video(self, video_id: str, file_path: str):
     Args:
         video_id: UUID of the video record
         file_path: Path to the uploaded video file
+        enqueued_at: Unix timestamp when the backend queued the task (for queue wait metrics)
     """
+    task_started = time.monotonic()
+    if enqueued_at:
+        metrics.observe("video_worker_queue_wait_seconds", max(0.0, time.time() - enqueued_at))
+    
     # IMPORTANT: Print immediately to verify task is being called
     # Use both stdout and stderr, and flush immediately
     import sys
@@ -630,6 +1508,7 @@ def process_video(self, video_id: str, file_path: str):
     
     error_category = None
     user_friendly_error = None
+    status_writer = VideoStatusWriter(video_id)
     
     try:
         print(f"\n{'='*60}")
@@ -646,11 +1525,14 @@ def process_video(self, video_id: str, file_path: str):
             print(f"   ⚠ WARNING: File does not exist at {input_path}")
         
         # Update status to processing (in case it wasn't already)
-        update_video_status(video_id, "processing", error_reason=None)
+        # The same statement returns ad_link for the ad duration check below
+        ad_link = status_writer.start()
+        publish_progress(video_id, "probing")
         
         # Step 1: Get all video metadata in one ffprobe call
         print("  → Getting video metadata (format, duration, faststart check)...")
-        metadata, metadata_error = get_video_metadata(input_path)
+        with metrics.stage_timer("probe"):
+            metadata, metadata_error = get_video_metadata(input_path)
         if metadata_error:
             error_category = "VALIDATION_ERROR"
             user_friendly_error = f"Video file validation failed: {metadata_error}"
@@ -673,31 +1555,48 @@ def process_video(self, video_id: str, file_path: str):
         print(f"     Pixel format: {metadata.get('pixel_format', 'unknown')}")
         print(f"     Has faststart: {metadata['has_faststart']}")
         print(f"     Web optimized: {metadata['is_web_optimized']}")
+        print(f"     Resolution: {metadata.get('width')}x{metadata.get('height')}")
+        print(f"     Exceeds output caps: {metadata['exceeds_output_caps']}")
         
         # Store duration for later use
         duration = metadata["duration"]
+        status_writer.update(duration_seconds=int(duration))
         is_mp4 = metadata["is_mp4"]
         has_faststart = metadata["has_faststart"]
         is_web_optimized = metadata["is_web_optimized"]
         
         # Check if this is an ad video and validate minimum duration
-        with SessionLocal() as session:
-            video_check = session.execute(
-                text("SELECT ad_link FROM videos WHERE id = :video_id"),
-                {"video_id": video_id}
-            ).fetchone()
-            
-            if video_check and video_check[0]:  # ad_link is set
-                if duration < 5.0:
-                    error_category = "VALIDATION_ERROR"
-                    user_friendly_error = f"Ad videos must be at least 5 seconds long. This video is {duration:.1f} seconds."
-                    print(f"✗ {user_friendly_error}")
-                    update_video_status(
-                        video_id, 
-                        "failed", 
-                        error_reason=user_friendly_error
-                    )
-                    raise ValueError(user_friendly_error)
+        # (FAILED status is written by the error handler below)
+        if ad_link and duration < 5.0:
+            error_category = "VALIDATION_ERROR"
+            user_friendly_error = f"Ad videos must be at least 5 seconds long. This video is {duration:.1f} seconds."
+            print(f"✗ {user_friendly_error}")
+            raise ValueError(user_friendly_error)
+        
+        # Step 1b: Near-duplicate check (before the expensive encode)
+        # Failures here are not fatal - the video is processed without a fingerprint
+        if FINGERPRINT_ENABLED:
+            publish_progress(video_id, "fingerprinting")
+            try:
+                with metrics.stage_timer("fingerprint"):
+                    hashes = extract_fingerprint(input_path, duration)
+                    duplicate = find_near_duplicate(video_id, hashes, duration) if hashes else None
+            except Exception as e:
+                print(f"  ⚠ Fingerprinting failed, skipping duplicate check: {e}")
+                hashes, duplicate = None, None
+            if duplicate:
+                metrics.inc("video_worker_duplicates_total", action=DUPLICATE_ACTION)
+                print(f"  ⚠ Near-duplicate of {duplicate[0]} (mean distance {duplicate[1]:.1f})")
+                if DUPLICATE_ACTION == "reject" and not ad_link:
+                    error_category = "DUPLICATE_ERROR"
+                    user_friendly_error = "This video has already been uploaded."
+                    raise ValueError(f"Near-duplicate of video {duplicate[0]}")
+            if hashes:
+                try:
+                    save_fingerprint(video_id, hashes, duration, duplicate)
+                    print("  ✓ Fingerprint stored")
+                except Exception as e:
+                    print(f"  ⚠ Could not store fingerprint: {e}")
         
         # Create output directory
         output_dir = TEMP_DIR / video_id
@@ -709,17 +1608,18 @@ def process_video(self, video_id: str, file_path: str):
         # - MP4 but missing faststart, OR
         # - Wrong video codec (not H.264), OR
         # - Wrong audio codec (not AAC/MP3), OR
-        # - Wrong pixel format (not YUV420P)
-        needs_transcoding = not is_web_optimized
+        # - Wrong pixel format (not YUV420P), OR
+        # - Resolution or bitrate above the mobile delivery caps
+        exceeds_output_caps = metadata["exceeds_output_caps"]
+        needs_transcoding = not is_web_optimized or exceeds_output_caps
         
         if not needs_transcoding:
             print("  ✓ File is already web-optimized - no transcoding needed")
             print("     (MP4, H.264, AAC/MP3, faststart, YUV420P)")
-            # Copy file directly to output directory (no transcoding needed)
-            mp4_path = output_dir / f"{video_id}.mp4"
-            import shutil
-            shutil.copy2(input_path, mp4_path)
-            print("  ✓ MP4 file copied (transcoding skipped)")
+            # Publish the original directly (hard link on the same volume, no temp copy)
+            mp4_path = input_path
+            metrics.inc("video_worker_transcode_total", path="copy")
+            print("  ✓ Original will be published as MP4 (transcoding skipped)")
         else:
             # Provide detailed reason for transcoding
             reasons = []
@@ -733,33 +1633,114 @@ def process_video(self, video_id: str, file_path: str):
                 reasons.append(f"audio codec is {metadata.get('audio_codec', 'unknown')} (needs AAC/MP3)")
             if metadata.get('pixel_format') not in ["yuv420p", "yuvj420p"]:
                 reasons.append(f"pixel format is {metadata.get('pixel_format', 'unknown')} (needs YUV420P)")
+            if metadata.get('capped_dimensions'):
+                capped_w, capped_h = metadata['capped_dimensions']
+                reasons.append(f"resolution {metadata['width']}x{metadata['height']} exceeds cap (scaling to {capped_w}x{capped_h})")
+            elif exceeds_output_caps:
+                reasons.append(f"bitrate {metadata.get('bit_rate')} bps exceeds cap ({TRANSCODE_MAXRATE})")
             
             print(f"  → File is not web-optimized - transcoding required")
             print(f"     Reasons: {', '.join(reasons)}")
             
             # Transcode to MP4 (web-optimized format) with faststart
             mp4_path = output_dir / f"{video_id}.mp4"
-            transcode_to_mp4(input_path, mp4_path)
+            publish_progress(video_id, "transcoding", 0.0, duration_seconds=round(duration, 2))
+            transcode_started = time.monotonic()
+            with metrics.stage_timer("transcode"):
+                transcode_to_mp4(
+                    input_path,
+                    mp4_path,
+                    metadata.get("capped_dimensions"),
+                    video_id=video_id,
+                    duration=duration,
+                )
+            metrics.inc("video_worker_transcode_total", path="transcode")
+            transcode_elapsed = time.monotonic() - transcode_started
+            if metadata.get("fps") and transcode_elapsed > 0:
+                metrics.observe("video_worker_encode_fps", duration * metadata["fps"] / transcode_elapsed)
             print("  ✓ MP4 transcoding complete (web-optimized with H.264, AAC, faststart, YUV420P)")
         
         # Step 3: Create thumbnail
         print("  → Creating thumbnail...")
-        thumbnail_path = output_dir / f"{video_id}_thumb.jpg"
-        create_thumbnail(input_path, thumbnail_path)
-        print("  ✓ Thumbnail created")
+        publish_progress(video_id, "thumbnail")
+        thumbnail_dir = output_dir / "thumbnails"
+        thumbnail_dir.mkdir(exist_ok=True)
+        with metrics.stage_timer("thumbnail_select"):
+            thumbnail_time = select_thumbnail_timestamp(input_path)
+        if thumbnail_time is None:
+            # Fixed fallback, kept inside clips shorter than 3 seconds
+            thumbnail_time = min(3.0, duration / 2)
+        with metrics.stage_timer("thumbnail"):
+            thumbnails = create_thumbnail_set(
+                input_path,
+                thumbnail_dir,
+                timestamp=f"{thumbnail_time:.3f}",
+                source_width=metadata.get("width"),
+            )
+        thumbnail_path = thumbnails["jpeg"]
+        print(f"  ✓ Thumbnail created at {thumbnail_time:.2f}s (+ {len(thumbnails['variants'])} WebP variant(s)"
+              f"{', placeholder' if thumbnails['placeholder'] else ''})")
+        
+        # Step 3b: Optional HLS rendition ladder (encoded from the final MP4)
+        # Failures here are not fatal - the progressive MP4 is always available
+        hls_dir = None
+        if HLS_ENABLED:
+            try:
+                renditions = get_hls_renditions(
+                    *(metadata.get("capped_dimensions") or (metadata.get("width"), metadata.get("height")))
+                )
+                print(f"  → Creating HLS ladder: {', '.join(r['name'] for r in renditions)}...")
+                hls_dir = output_dir / "hls"
+                with metrics.stage_timer("hls"):
+                    create_hls_ladder(
+                        mp4_path,
+                        hls_dir,
+                        renditions,
+                        has_audio=metadata.get("audio_codec") is not None,
+                        video_id=video_id,
+                        duration=duration,
+                    )
+                print("  ✓ HLS ladder created")
+            except Exception as e:
+                print(f"  ⚠ HLS ladder failed, continuing with MP4 only: {e}")
+                hls_dir = None
         
-        # Step 4: Store processed files in local storage
+        # Step 4: Store processed files in the storage backend
         print("  → Storing processed files...")
+        publish_progress(video_id, "storing")
+        store_started = time.monotonic()
+        storage = get_storage()
+        key_prefix = video_key_prefix(video_id)
         try:
-            # Store MP4 file: processed/{video_id}/video.mp4
-            mp4_url = store_file(mp4_path, f"{video_id}/video.mp4")
+            # Store MP4 file: processed/ab/cd/{video_id}/video.mp4
+            # Local: transcoded output is a temp file (rename); an untouched original is linked
+            # S3: keep the local file for metadata extraction (temp dir is removed at the end)
+            stored_mp4_path = storage.local_path(f"{key_prefix}/video.mp4")
+            mp4_url = store_file(
+                mp4_path,
+                f"{key_prefix}/video.mp4",
+                move=mp4_path != input_path and stored_mp4_path is not None,
+            )
+            mp4_path = stored_mp4_path or mp4_path
             
-            # Store thumbnail: processed/{video_id}/thumbnail.jpg
+            # Store thumbnail: processed/ab/cd/{video_id}/thumbnail.jpg
             thumbnail_url = None
             if thumbnail_path and thumbnail_path.exists():
-                thumbnail_url = store_file(thumbnail_path, f"{video_id}/thumbnail.jpg")
+                thumbnail_url = store_file(thumbnail_path, f"{key_prefix}/thumbnail.jpg", move=True)
+            
+            # Store WebP variants: processed/ab/cd/{video_id}/thumb_{width}.webp
+            thumbnail_variants = {
+                str(width): store_file(path, f"{key_prefix}/thumb_{width}.webp", move=True)
+                for width, path in thumbnails["variants"].items()
+            }
             
-            print(f"  ✓ Storage complete (MP4 + thumbnail)")
+            # Store HLS ladder: processed/ab/cd/{video_id}/hls/master.m3u8 (+ variant playlists/segments)
+            hls_url = None
+            if hls_dir:
+                hls_url = store_directory(hls_dir, f"{key_prefix}/hls", move=True) + "/master.m3u8"
+            
+            metrics.observe("video_worker_stage_duration_seconds", time.monotonic() - store_started, stage="store")
+            print(f"  ✓ Storage complete (MP4 + thumbnail{' + HLS' if hls_url else ''})")
         except Exception as e:
             error_category = "STORAGE_ERROR"
             user_friendly_error = "Failed to store processed video files."
@@ -781,7 +1762,8 @@ def process_video(self, video_id: str, file_path: str):
             print(f"  ⚠ ERROR: Processed video file not found at {mp4_path}")
             detailed_metadata = {"error": "Processed video file not found"}
         else:
-            detailed_metadata, metadata_error = get_detailed_video_metadata(mp4_path)
+            with metrics.stage_timer("metadata"):
+                detailed_metadata, metadata_error = get_detailed_video_metadata(mp4_path)
             
             # Ensure we always have a dict (never None)
             if detailed_metadata is None:
@@ -802,6 +1784,15 @@ def process_video(self, video_id: str, file_path: str):
         if thumbnail_url:
             update_data["thumbnail"] = thumbnail_url
         
+        if thumbnail_variants:
+            update_data["thumbnail_variants_json"] = json.dumps(thumbnail_variants)
+        
+        if thumbnails["placeholder"]:
+            update_data["thumbnail_placeholder"] = thumbnails["placeholder"]
+        
+        if hls_url:
+            update_data["url_hls"] = hls_url
+        
         # ALWAYS save metadata as JSON (even if empty dict or contains error)
         # This ensures video_metadata_json is never NULL in the database
         metadata_json = json.dumps(detailed_metadata, indent=2)
@@ -814,16 +1805,23 @@ def process_video(self, video_id: str, file_path: str):
             print(f"     Warning: Metadata may be incomplete or contain errors")
         
         print(f"  → Updating database with processed video info")
-        update_video_status(video_id, "ready", **update_data)
+        with metrics.stage_timer("db"):
+            status_writer.finish("ready", **update_data)
+        publish_progress(video_id, "ready", 100.0)
         
         print(f"✓ Video {video_id} processed successfully")
         print(f"  MP4 URL: {mp4_url}")
         print(f"  Thumbnail: {thumbnail_url}")
+        if hls_url:
+            print(f"  HLS URL: {hls_url}")
         
         # Cleanup temp files
         import shutil
         shutil.rmtree(output_dir, ignore_errors=True)
         
+        metrics.inc("video_worker_tasks_total", status="ready")
+        metrics.observe("video_worker_task_duration_seconds", time.monotonic() - task_started, status="ready")
+        
         return {"status": "success", "video_id": video_id}
         
     except Exception as e:
@@ -852,12 +1850,17 @@ def process_video(self, video_id: str, file_path: str):
         
         # Update database with failure status and error reason
         error_message = user_friendly_error or str(e)[:500]  # Limit error message length
-        update_video_status(video_id, "failed", error_reason=error_message)
+        status_writer.finish("failed", error_reason=error_message)
+        publish_progress(video_id, "failed", error_category=error_category)
         
         # Cleanup files for failed video
         print(f"  → Cleaning up files for failed video...")
         cleanup_failed_video(video_id, input_path)
         
+        metrics.inc("video_worker_tasks_total", status="failed")
+        metrics.inc("video_worker_failures_total", category=error_category)
+        metrics.observe("video_worker_task_duration_seconds", time.monotonic() - task_started, status="failed")
+        
         # Don't re-raise - we've handled the error and cleaned up
         return {"status": "failed", "video_id": video_id, "error": error_message}
 